@@ -7,8 +7,8 @@ Evaluate parameter filling accuracy using semantic similarity.
 
 import numpy as np
 from typing import Dict, List
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+
+from n8n_workflow_recommender.utils.embedding_service import get_embedding_service
 
 
 class ParameterEvaluator:
@@ -28,7 +28,9 @@ class ParameterEvaluator:
             model_name: SentenceTransformer model name
             threshold: Similarity threshold for matching (default: 0.8)
         """
-        self.model = SentenceTransformer(model_name)
+        # Shared per-process embedding service (same model instance as the recommender)
+        self.embedding_service = get_embedding_service(model_name)
+        self.embedding_service.model  # load eagerly so missing deps surface here
         self.threshold = threshold
 
     def evaluate_parameters(self, matching_result: Dict) -> Dict:
@@ -183,10 +185,10 @@ class ParameterEvaluator:
         if text1 == text2:
             return 1.0
 
-        # Compute embeddings
-        embeddings = self.model.encode([text1, text2])
+        # Compute embeddings (L2-normalized, cached across calls)
+        embeddings = self.embedding_service.encode([text1, text2])
 
-        # Compute cosine similarity
-        similarity = cosine_similarity([embeddings[0]], [embeddings[1]])[0][0]
+        # Cosine similarity of normalized vectors is their dot product
+        similarity = np.dot(embeddings[0], embeddings[1])
 
         return float(similarity)
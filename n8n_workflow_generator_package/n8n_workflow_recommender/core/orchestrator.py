@@ -6,7 +6,9 @@
 """
 
 import json
+import logging
 import os
+import time
 from pathlib import Path
 from typing import Dict, List, Optional
 import yaml
@@ -19,8 +21,14 @@ from ..models.chain_recommender import ChainRecommender
 from ..generation.n8n_json_generator import N8nWorkflowGenerator
 from ..generation.parameter_filler import ParameterFiller
 from ..adapters.node_type_mapper import NodeTypeMapper
-from ..utils.file_loader import load_json, load_yaml
+from ..utils.file_loader import load_json, load_yaml, resolve_config_path
 from ..utils.logger import setup_logger
+from ..utils.component_registry import ComponentRegistry
+from .snapshot import compute_source_hashes, read_snapshot, write_snapshot
+
+
+# 元件初始化方式
+STARTUP_MODES = ('eager', 'lazy', 'background')
 
 
 class WorkflowOrchestrator:
@@ -33,7 +41,8 @@ class WorkflowOrchestrator:
     def __init__(
         self,
         openai_key: Optional[str] = None,
-        config_path: Optional[str] = None
+        config_path: Optional[str] = None,
+        startup_mode: Optional[str] = None
     ):
         """
         初始化協調器
@@ -41,6 +50,10 @@ class WorkflowOrchestrator:
         Args:
             openai_key: OpenAI API 密鑰（可選，如果為 None 或空字串，會從 config.yaml 讀取）
             config_path: 配置檔案路徑（可選）
+            startup_mode: 元件初始化方式（可選，預設讀取 config.yaml 的 startup.mode）
+                - eager: 在 __init__ 中建立所有元件
+                - lazy: 每個元件在第一次使用時才建立
+                - background: 立即返回，在背景執行緒中預熱所有元件
         """
         print("\n" + "=" * 80)
         print("Initializing n8n Workflow Recommender Orchestrator")
@@ -94,47 +107,265 @@ class WorkflowOrchestrator:
         # 節點映射路徑
         self.node_mappings_path = base_dir / "data" / "node_mappings.json"
         
-        # 載入數據
-        print("\n📥 Loading data...")
+        # 快照：從 JSON 推導出的結構直接還原，任一來源檔案變動時自動失效
+        startup_config = self.config.get('startup', {})
+        snapshot_config = startup_config.get('snapshot', {})
+        self.snapshot_path = resolve_config_path(
+            snapshot_config.get('path', "../data/orchestrator_snapshot.pkl"), base_dir
+        )
+        self.auto_snapshot = bool(snapshot_config.get('enabled', False))
+        self._snapshot: Optional[Dict] = None
+        if self.auto_snapshot:
+            self.load_snapshot()
+        
+        # 排序參數（建立評分器時使用）
+        self.mf_config = self.config.get('model', {}).get('matrix_factorization', {})
+        scoring_config = self.config.get('scoring', {})
+        self.ranking_top_k = scoring_config.get('top_k', 5)
+        ranking_log_level = logging.getLevelName(str(scoring_config.get('log_level', 'INFO')).upper())
+        if not isinstance(ranking_log_level, int):
+            ranking_log_level = logging.INFO
+        self.ranking_log_level = ranking_log_level
+        self.openai_key = openai_key
         
-        # 載入知識圖
+        # 各元件在第一次使用（或預熱）時才建立，並記錄載入時間
+        self.components = ComponentRegistry()
+        self.components.register('knowledge_graph', self._load_knowledge_graph)
+        self.components.register('node_mapper', self._load_node_mapper)
+        self.components.register('scorer', self._create_scorer)
+        self.components.register('generator', self._create_generator)
+        self.components.register('parameter_filler', self._create_parameter_filler)
+        self.components.register('json_generator', self._create_json_generator)
+        
+        startup_mode = startup_mode or startup_config.get('mode', 'eager')
+        if startup_mode not in STARTUP_MODES:
+            print(f"⚠️  未知的 startup.mode: {startup_mode}，改用 eager")
+            startup_mode = 'eager'
+        self.startup_mode = startup_mode
+        
+        if startup_mode == 'eager':
+            self.components.warm_up()
+            self._auto_save_snapshot()
+            print("\n✅ Orchestrator initialized successfully!")
+        elif startup_mode == 'background':
+            self.components.warm_up(background=True, on_complete=self._auto_save_snapshot)
+            print("\n⏳ Orchestrator accepting requests; components are warming up in the background")
+        else:
+            print("\n⏳ Orchestrator created; components will be initialized on first use")
+    
+    @property
+    def knowledge_graph(self) -> Dict:
+        return self.components.get('knowledge_graph')
+    
+    @property
+    def node_mapper(self) -> NodeTypeMapper:
+        return self.components.get('node_mapper')
+    
+    @property
+    def generator(self) -> HybridWorkflowSystem:
+        return self.components.get('generator')
+    
+    @property
+    def scorer(self) -> ChainRecommender:
+        return self.components.get('scorer')
+    
+    @property
+    def parameter_filler(self) -> ParameterFiller:
+        return self.components.get('parameter_filler')
+    
+    @property
+    def json_generator(self) -> N8nWorkflowGenerator:
+        return self.components.get('json_generator')
+    
+    def _load_knowledge_graph(self) -> Dict:
+        """載入知識圖（三元組 + ontology）"""
+        if self._snapshot:
+            knowledge_graph = self._snapshot['knowledge_graph']
+            print(f"   ✅ Restored {len(knowledge_graph['triples'])} triples and "
+                  f"{len(knowledge_graph['ontology'])} node types from snapshot")
+            return knowledge_graph
+        print("\n📥 Loading data...")
         print(f"   - Loading knowledge graph: {self.kg_path}")
         kg_data = load_json(str(self.kg_path))
         triples = kg_data.get('triples', [])
         ontology = kg_data.get('ontology', {})
         print(f"   ✅ Loaded {len(triples)} triples and {len(ontology)} node types")
-        
-        # 載入節點映射
+        return {'triples': triples, 'ontology': ontology}
+    
+    def _load_node_mapper(self) -> NodeTypeMapper:
+        """載入節點映射"""
+        if self._snapshot:
+            node_mapper = self._snapshot['node_mapper']
+            print(f"   ✅ Restored {len(node_mapper.name_to_type)} mappings from snapshot")
+            return node_mapper
         print(f"   - Loading node mappings: {self.node_mappings_path}")
-        self.node_mapper = NodeTypeMapper(str(self.node_mappings_path))
-        print(f"   ✅ Loaded {len(self.node_mapper.name_to_type)} mappings")
-        
-        # 初始化生成器（Vincent）
+        node_mapper = NodeTypeMapper(str(self.node_mappings_path))
+        print(f"   ✅ Loaded {len(node_mapper.name_to_type)} mappings")
+        return node_mapper
+    
+    def _create_generator(self) -> HybridWorkflowSystem:
+        """初始化生成器（Vincent）"""
+        knowledge_graph = self.knowledge_graph
         print("\n🔧 Initializing Generator (Vincent)...")
         # 使用處理後的 openai_key（已經從 config 讀取過了）
-        self.generator = HybridWorkflowSystem(
-            triples=triples,
-            ontology=ontology,
+        generator = HybridWorkflowSystem(
+            triples=knowledge_graph['triples'],
+            ontology=knowledge_graph['ontology'],
             taxonomy_path=str(self.taxonomy_path),
-            openai_api_key=openai_key
+            openai_api_key=self.openai_key,
+            config=self.config,
+            snapshot=self._snapshot['generator'] if self._snapshot else None
         )
-        
-        # 初始化評分器（Daniel）
+        # A* 路徑搜索以 MF 轉換分數作為邊成本
+        generator.composer.set_transition_scorer(self.scorer)
+        return generator
+    
+    def _create_scorer(self) -> ChainRecommender:
+        """初始化評分器（Daniel）"""
         print("\n🔧 Initializing Scorer (Daniel)...")
-        self.scorer = ChainRecommender(
+        return ChainRecommender(
             model_dir=str(self.matrix_model_dir),
-            use_type_model=True
+            use_type_model=True,
+            scoring_mode=self.mf_config.get('scoring_mode', 'dense'),
+            row_cache_size=int(self.mf_config.get('row_cache_size', 256)),
+            top_k_cache=int(self.mf_config.get('top_k_cache', 32)),
+            log_level=self.ranking_log_level,
+            mapping=self._snapshot['mf_mapping'] if self._snapshot else None
         )
-        
-        # 初始化參數填充器
+    
+    def _create_parameter_filler(self) -> ParameterFiller:
+        """初始化參數填充器"""
+        ontology = self.knowledge_graph['ontology']
         print("\n🔧 Initializing Parameter Filler...")
-        self.parameter_filler = ParameterFiller(ontology)
-        
-        # 初始化 JSON 生成器
+        return ParameterFiller(ontology)
+    
+    def _create_json_generator(self) -> N8nWorkflowGenerator:
+        """初始化 JSON 生成器"""
+        node_mapper = self.node_mapper
         print("\n🔧 Initializing JSON Generator...")
-        self.json_generator = N8nWorkflowGenerator(self.node_mapper)
+        return N8nWorkflowGenerator(node_mapper)
+    
+    def warm_up(self, background: bool = False):
+        """
+        建立所有尚未建立的元件
         
-        print("\n✅ Orchestrator initialized successfully!")
+        Args:
+            background: 是否在背景執行緒中建立
+            
+        Returns:
+            thread: 背景預熱執行緒（前景模式返回 None）
+        """
+        return self.components.warm_up(background=background)
+    
+    def is_ready(self) -> bool:
+        """所有元件是否都已建立完成（readiness）"""
+        return self.components.is_ready()
+    
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待背景預熱完成
+        
+        Args:
+            timeout: 最長等待秒數（None 表示不限）
+            
+        Returns:
+            ready: 所有元件是否都已就緒
+        """
+        return self.components.wait_until_ready(timeout)
+    
+    def get_health(self) -> Dict:
+        """
+        取得健康狀態（每個元件的狀態與載入時間）
+        
+        Returns:
+            health: {
+                "status": "ready" | "starting" | "failed",
+                "ready": bool,
+                "startup_mode": "eager" | "lazy" | "background",
+                "uptime_seconds": float,
+                "components": {name: {"status", "load_seconds", "error"}}
+            }
+        """
+        health = self.components.status()
+        health["startup_mode"] = self.startup_mode
+        health["snapshot"] = {"path": str(self.snapshot_path), "loaded": self._snapshot is not None}
+        return health
+    
+    def _snapshot_sources(self) -> Dict[str, Path]:
+        """快照的來源檔案（任一變動都會使快照失效）"""
+        return {
+            'knowledge_graph': self.kg_path,
+            'node_mappings': self.node_mappings_path,
+            'taxonomy': self.taxonomy_path,
+            'mf_mapping': self.matrix_model_dir / "type_type_mapping.json",
+        }
+    
+    def _snapshot_fingerprint(self) -> str:
+        """影響推導結構、但不在來源檔案中的設定"""
+        reach_config = self.config.get('generation', {}).get('reachability_index', {})
+        return json.dumps({'reachability_index': reach_config}, sort_keys=True, default=str)
+    
+    def save_snapshot(self, path: Optional[str] = None) -> Path:
+        """
+        把從 JSON 推導出、與模型無關的結構寫入快照（尚未建立的元件會先建立）
+        
+        包含：知識圖（三元組、ontology、CSR / 縮點 / 可達性陣列）、節點映射、
+        taxonomy 樹與 node database（含查找索引）、function categories、mapped nodes、MF 節點索引。
+        embedding 與 MF 矩陣本身不在快照中（各自已有磁碟索引 / .npy）。
+        
+        Args:
+            path: 快照路徑（預設為 startup.snapshot.path）
+            
+        Returns:
+            path: 寫入的快照路徑
+        """
+        path = Path(path) if path else self.snapshot_path
+        components = {
+            'knowledge_graph': self.knowledge_graph,
+            'node_mapper': self.node_mapper,
+            'generator': self.generator.snapshot_state(),
+            'mf_mapping': self.scorer.scorer.mapping,
+        }
+        write_snapshot(
+            path,
+            compute_source_hashes(self._snapshot_sources()),
+            components,
+            fingerprint=self._snapshot_fingerprint()
+        )
+        print(f"💾 Snapshot saved to: {path}")
+        return path
+    
+    def load_snapshot(self, path: Optional[str] = None) -> bool:
+        """
+        載入快照；之後建立的元件直接從快照還原（已建立的元件不受影響）
+        
+        Args:
+            path: 快照路徑（預設為 startup.snapshot.path）
+            
+        Returns:
+            loaded: 快照是否存在且有效（來源檔案雜湊、格式版本與設定皆一致）
+        """
+        path = Path(path) if path else self.snapshot_path
+        start = time.perf_counter()
+        snapshot = read_snapshot(
+            path,
+            compute_source_hashes(self._snapshot_sources()),
+            fingerprint=self._snapshot_fingerprint()
+        )
+        if snapshot is None:
+            return False
+        self._snapshot = snapshot
+        print(f"   ✅ 載入快照: {path} ({(time.perf_counter() - start) * 1000:.0f} ms)")
+        return True
+    
+    def _auto_save_snapshot(self):
+        """startup.snapshot.enabled 時，從來源檔案建立完成後自動寫入快照"""
+        if not self.auto_snapshot or self._snapshot is not None or not self.components.is_ready():
+            return
+        try:
+            self.save_snapshot()
+        except Exception as e:
+            print(f"⚠️  Warning: Could not save snapshot: {e}")
     
     def process_user_request(self, user_query: str) -> Dict:
         """
@@ -166,7 +397,7 @@ class WorkflowOrchestrator:
         
         # Phase 2: Scoring (Daniel)
         print("\n📊 Phase 2: Workflow Scoring")
-        ranked_candidates = self.scorer.rank_candidates(candidates)
+        ranked_candidates = self.scorer.rank_candidates(candidates, top_k=self.ranking_top_k)
         
         if not ranked_candidates:
             return {
@@ -174,6 +405,72 @@ class WorkflowOrchestrator:
                 "candidates": []
             }
         
+        result = self._build_result(ranked_candidates)
+        
+        print("\n✅ Workflow generation completed!")
+        return result
+    
+    def process_batch(self, user_queries: List[str], max_workers: Optional[int] = None) -> List[Dict]:
+        """
+        批次處理多個用戶請求
+        
+        - 生成：原始查詢與 goal_description 各一次批次編碼，NLU 與 MCTS 在執行緒池中逐查詢進行，
+          LLM 呼叫共用 llm_fanout（總並行數受 llm.max_concurrency 限制）
+        - 評分：所有查詢的候選一次向量化 MF 評分後各自排序
+        - 參數填充與 JSON 生成逐查詢進行
+        
+        Args:
+            user_queries: 用戶查詢列表
+            max_workers: 同時處理的查詢數（預設讀取 config.yaml 的 batch.max_workers）
+        
+        Returns:
+            results: 與輸入順序對應的結果，格式與 process_user_request 相同；
+                失敗的查詢為 {"error": ..., "candidates": []}，不影響其他查詢
+        """
+        max_workers = max_workers or int(self.config.get('batch', {}).get('max_workers', 4))
+        print("\n" + "=" * 80)
+        print(f"Processing Batch of {len(user_queries)} User Requests")
+        print("=" * 80)
+        
+        # Phase 1: Generation (Vincent)
+        print("\n📝 Phase 1: Workflow Generation (batch)")
+        generated = self.generator.generate_workflow_batch(user_queries, max_workers=max_workers)
+        
+        # Phase 2: Scoring (Daniel) — 所有候選一次評分
+        print("\n📊 Phase 2: Workflow Scoring (batch)")
+        ranked_lists = self.scorer.rank_candidates_batch(
+            [g["candidates"] for g in generated], top_k=self.ranking_top_k
+        )
+        
+        results = []
+        for i, (gen, ranked_candidates) in enumerate(zip(generated, ranked_lists)):
+            if gen["error"] is not None:
+                results.append({"error": f"工作流程生成失敗: {gen['error']}", "candidates": []})
+            elif not gen["candidates"]:
+                results.append({"error": "無法生成工作流程候選", "candidates": []})
+            elif not ranked_candidates:
+                results.append({"error": "無法評分工作流程候選", "candidates": []})
+            else:
+                print(f"\n--- Query #{i + 1}: {user_queries[i][:60]} ---")
+                try:
+                    results.append(self._build_result(ranked_candidates))
+                except Exception as e:
+                    results.append({"error": f"工作流程輸出失敗: {type(e).__name__}: {e}", "candidates": []})
+        
+        failed = sum(1 for r in results if "error" in r)
+        print(f"\n✅ Batch completed: {len(results) - failed} succeeded, {failed} failed")
+        return results
+    
+    def _build_result(self, ranked_candidates: List[Dict]) -> Dict:
+        """
+        Phase 3-5：選出最佳候選、填充參數並生成 n8n JSON
+        
+        Args:
+            ranked_candidates: 排序後的候選（非空）
+        
+        Returns:
+            result: {"best_workflow", "candidates", "workflow_json"}
+        """
         # Phase 3: Select Best
         print("\n🏆 Phase 3: Selecting Best Workflow")
         best_candidate = ranked_candidates[0]
@@ -182,22 +479,10 @@ class WorkflowOrchestrator:
         print(f"   - Best path: {' -> '.join(best_path)}")
         print(f"   - Score: {best_candidate.get('mf_score', 0.0):.4f}")
         
-        # Phase 4: Fill Parameters
-        print("\n🔧 Phase 4: Filling Parameters")
-        extracted_params = best_candidate.get('params', {})
-        chain_params = self.parameter_filler.fill_chain_parameters(
-            best_path,
-            extracted_params,
-            strict=False
-        )
-        
-        # Phase 5: Generate n8n JSON
-        print("\n📄 Phase 5: Generating n8n Workflow JSON")
-        workflow_json = self.json_generator.generate_workflow_json(
-            node_type_chain=best_path,
-            workflow_name="Generated Workflow",
-            node_params=chain_params
-        )
+        # Phase 4-5: Fill Parameters + Generate n8n JSON
+        filled = self.fill_workflow(best_path, best_candidate.get('params', {}))
+        chain_params = filled["params"]
+        workflow_json = filled["workflow_json"]
         
         # 構建結果
         result = {
@@ -218,9 +503,87 @@ class WorkflowOrchestrator:
             "workflow_json": workflow_json
         }
         
-        print("\n✅ Workflow generation completed!")
         return result
     
+    def fill_workflow(
+        self,
+        node_type_chain: List[str],
+        extracted_params: Dict,
+        workflow_name: str = "Generated Workflow"
+    ) -> Dict:
+        """
+        Phase 4-5：為節點鏈填充參數並生成 n8n JSON
+        
+        Args:
+            node_type_chain: 節點類型列表
+            extracted_params: NLU 提取的參數字典
+            workflow_name: 工作流程名稱
+        
+        Returns:
+            filled: {"params": {node_type: {param: value}}, "workflow_json": {...}}
+        """
+        print("\n🔧 Phase 4: Filling Parameters")
+        chain_params = self.parameter_filler.fill_chain_parameters(
+            node_type_chain,
+            extracted_params,
+            strict=False
+        )
+        
+        print("\n📄 Phase 5: Generating n8n Workflow JSON")
+        workflow_json = self.json_generator.generate_workflow_json(
+            node_type_chain=node_type_chain,
+            workflow_name=workflow_name,
+            node_params=chain_params
+        )
+        return {"params": chain_params, "workflow_json": workflow_json}
+    
+    def analyze_request(self, user_query: str) -> Dict:
+        """
+        請求的 LLM 階段：NLU 分析，以及 trigger / end 的 LLM 選擇（與 NLU 並行發出）
+        
+        本請求的所有 LLM 呼叫都在這裡完成，complete_request 不會再等待 LLM；
+        呼叫端可以把兩個階段放在不同的執行緒池（例如 HTTP 服務），
+        等待 LLM 的請求不會佔用 CPU 階段的執行緒。
+        
+        Args:
+            user_query: 用戶查詢字符串
+        
+        Returns:
+            nlu_result: HybridWorkflowSystem.run_nlu_stage 的結果
+        """
+        return self.generator.run_nlu_stage(user_query, resolve_endpoint_llm=True)
+    
+    def complete_request(self, user_query: str, nlu_result: Dict) -> Dict:
+        """
+        請求的 CPU 階段：MCTS 搜索、trigger / end 選擇、路徑組合、評分、參數填充與 JSON 生成
+        （使用 analyze_request 的結果時不呼叫 LLM）
+        
+        Args:
+            user_query: 用戶查詢字符串
+            nlu_result: analyze_request 的結果
+        
+        Returns:
+            result: 格式與 process_user_request 相同
+        """
+        self.generator.prefetch_embeddings(
+            [nlu_result['goal_description'], " ".join(nlu_result['keywords'])]
+        )
+        candidates = self.generator.generate_from_nlu(user_query, nlu_result)
+        if not candidates:
+            return {
+                "error": "無法生成工作流程候選",
+                "candidates": []
+            }
+        
+        ranked_candidates = self.scorer.rank_candidates(candidates, top_k=self.ranking_top_k)
+        if not ranked_candidates:
+            return {
+                "error": "無法評分工作流程候選",
+                "candidates": []
+            }
+        
+        return self._build_result(ranked_candidates)
+    
     def save_result(self, result: Dict, output_path: str):
         """
         保存結果到檔案
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Orchestrator 快照
+
+把從 JSON 推導出、與模型無關的結構（taxonomy 樹、node database、分類、知識圖陣列、
+MF 索引等）序列化成單一版本化的二進位檔，下次啟動直接還原。
+
+檔案內容依序為兩個 pickle：
+    1. header：格式名稱、格式版本、來源檔案雜湊、程式碼雜湊、額外指紋
+    2. payload：各元件的狀態
+讀取時先只解析 header，任一來源檔案或被快照類別所在模組的原始碼雜湊不一致即視為過期
+（修改類別的欄位或方法後不需要手動遞增 SNAPSHOT_FORMAT_VERSION）。
+快照只應由本機程式寫入（pickle 不可用於不受信任的資料）。
+"""
+
+import importlib.util
+import io
+import pickle
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from ..search.embedding_index import hash_file
+from ..utils.file_loader import atomic_write_bytes
+
+
+SNAPSHOT_FORMAT = "n8n-orchestrator-snapshot"
+
+# 快照格式版本（header 或 payload 的組成方式變動時遞增，舊快照會自動失效）
+SNAPSHOT_FORMAT_VERSION = 3
+
+# 只追蹤本套件內的類別（第三方套件的類別以安裝版本為準）
+_PACKAGE = __name__.split('.')[0]
+
+
+def compute_source_hashes(source_files: Dict[str, Path]) -> Dict[str, Optional[str]]:
+    """
+    計算來源檔案的 SHA-256
+
+    Args:
+        source_files: {名稱: 檔案路徑}
+
+    Returns:
+        hashes: {名稱: 雜湊}（檔案不存在時為 None）
+    """
+    return {
+        name: hash_file(str(path)) if Path(path).exists() else None
+        for name, path in source_files.items()
+    }
+
+
+def compute_code_hashes(modules) -> Dict[str, Optional[str]]:
+    """
+    計算模組原始碼的 SHA-256
+
+    Args:
+        modules: 模組名稱
+
+    Returns:
+        hashes: {模組名稱: 雜湊}（找不到原始碼時為 None）
+    """
+    hashes = {}
+    for module in sorted(modules):
+        try:
+            spec = importlib.util.find_spec(module)
+        except (ImportError, ValueError):
+            spec = None
+        origin = spec.origin if spec is not None else None
+        hashes[module] = hash_file(origin) if origin and Path(origin).is_file() else None
+    return hashes
+
+
+class _RecordingPickler(pickle.Pickler):
+    """記錄 payload 中出現的本套件類別所在模組"""
+
+    def __init__(self, file, **kwargs):
+        super().__init__(file, **kwargs)
+        self.modules = set()
+
+    def reducer_override(self, obj):
+        # 內建容器與純量不會經過這裡（pickle 的快速路徑），只會看到物件實例、類別與函式
+        module = getattr(obj, '__module__', None) if isinstance(obj, type) else type(obj).__module__
+        if isinstance(module, str) and module.startswith(_PACKAGE + '.'):
+            self.modules.add(module)
+        return NotImplemented
+
+
+def write_snapshot(
+    path: Path,
+    source_hashes: Dict[str, Optional[str]],
+    components: Dict,
+    fingerprint: str = ""
+):
+    """
+    寫入快照（先寫暫存檔再 rename）
+
+    Args:
+        path: 快照檔案路徑
+        source_hashes: compute_source_hashes() 的結果
+        components: 各元件的狀態
+        fingerprint: 其他影響推導結構的設定（例如 config 片段）
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # 先序列化 payload 才知道用到哪些類別
+    payload = io.BytesIO()
+    pickler = _RecordingPickler(payload, protocol=pickle.HIGHEST_PROTOCOL)
+    pickler.dump(components)
+
+    header = {
+        "format": SNAPSHOT_FORMAT,
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "source_hashes": source_hashes,
+        "code_hashes": compute_code_hashes(pickler.modules),
+        "fingerprint": fingerprint,
+        "created_at": time.time()
+    }
+
+    def write(f):
+        pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.write(payload.getbuffer())
+
+    atomic_write_bytes(path, write)
+
+
+def read_snapshot(
+    path: Path,
+    source_hashes: Dict[str, Optional[str]],
+    fingerprint: str = ""
+) -> Optional[Dict]:
+    """
+    讀取快照
+
+    Args:
+        path: 快照檔案路徑
+        source_hashes: 目前來源檔案的雜湊（與快照 header 比對）
+        fingerprint: 目前的設定指紋
+
+    Returns:
+        components: 各元件的狀態；檔案不存在、格式不符或已過期時返回 None
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+
+    try:
+        with open(path, 'rb') as f:
+            header = pickle.load(f)
+            if not isinstance(header, dict) or header.get("format") != SNAPSHOT_FORMAT:
+                print(f"   ⚠️  快照格式不符，忽略: {path}")
+                return None
+            if header.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+                print(f"   ⚠️  快照格式版本已變更，需要重建: {path}")
+                return None
+            stale = sorted(
+                name for name in set(source_hashes) | set(header.get("source_hashes", {}))
+                if source_hashes.get(name) != header.get("source_hashes", {}).get(name)
+            )
+            if stale:
+                print(f"   ⚠️  來源數據已變更（{', '.join(stale)}），快照需要重建: {path}")
+                return None
+            code_hashes = header.get("code_hashes", {})
+            changed = sorted(
+                module for module, digest in compute_code_hashes(code_hashes).items()
+                if digest is None or digest != code_hashes[module]
+            )
+            if changed:
+                print(f"   ⚠️  程式碼已變更（{', '.join(changed)}），快照需要重建: {path}")
+                return None
+            if header.get("fingerprint", "") != fingerprint:
+                print(f"   ⚠️  相關設定已變更，快照需要重建: {path}")
+                return None
+            return pickle.load(f)
+    except Exception as e:
+        print(f"   ⚠️  無法讀取快照 {path}: {e}")
+        return None
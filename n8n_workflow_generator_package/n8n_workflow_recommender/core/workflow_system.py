@@ -7,14 +7,29 @@
 
 import json
 import os
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import List, Dict, Set, Optional
 from pathlib import Path
-from sentence_transformers import SentenceTransformer, util
+
+import numpy as np
 
 from ..search.mcts_search_agent import TaxonomySearchAgent, MCTSNode
+from ..search.embedding_index import EmbeddingIndex, compute_index_key, hash_file
 from ..generation.workflow_composer import DomainKnowledgeGraph, ModuleAwareWorkflowComposer
+from ..generation.beam_composer import BeamSearchWorkflowComposer
 from ..nlu.intent_analyzer import IntentAnalyzer
 from ..nlu.keyword_extractor import KeywordExtractor
+from ..nlu.nlu_cache import NLUCache
+from ..utils.file_loader import resolve_config_path
+from ..utils.embedding_service import get_embedding_service
+from ..utils.concurrency import LLMFanOut
+
+
+# trigger / end node 描述檔：kind -> (data/ 下的檔名, 列表鍵)
+ENDPOINT_DESCRIPTOR_FILES = {
+    'trigger': ("top10_trigger_nodes_info.json", 'top10_trigger_nodes'),
+    'end': ("top10_end_nodes_info.json", 'top10_end_nodes'),
+}
 
 
 class HybridWorkflowSystem:
@@ -29,7 +44,9 @@ class HybridWorkflowSystem:
         triples: List[tuple],
         ontology: Dict,
         taxonomy_path: str,
-        openai_api_key: str
+        openai_api_key: str,
+        config: Optional[Dict] = None,
+        snapshot: Optional[Dict] = None
     ):
         """
         初始化系統
@@ -39,35 +56,112 @@ class HybridWorkflowSystem:
             ontology: Ontology 字典
             taxonomy_path: MCTS taxonomy 檔案路徑
             openai_api_key: OpenAI API 密鑰
+            config: config.yaml 的內容（可選，用於搜索與生成參數）
+            snapshot: snapshot_state() 的結果（可選，提供時直接還原 taxonomy 結構、知識圖與分類，
+                不再從 JSON 重建）
         """
         print("\n=== Initializing Hybrid Workflow System ===")
+        self.config = config or {}
+        base_dir = Path(__file__).resolve().parent.parent.parent
+        taxonomy_config = self.config.get('search', {}).get('taxonomy', {})
+        embedding_cache_dir = taxonomy_config.get('embedding_cache_dir')
+        
+        # 進程內共享的 embedding 服務（MCTS、trigger / end 選擇共用同一份模型與快取）
+        self.embedding_service = get_embedding_service(
+            taxonomy_config.get('semantic_model', "paraphrase-multilingual-mpnet-base-v2"),
+            device=taxonomy_config.get('embedding_device'),
+            cache_max_bytes=int(taxonomy_config.get('embedding_lru_max_mb', 64)) * 1024 * 1024
+        )
         
         # 初始化組件
         print("1. Initializing Taxonomy Search Agent (MCTS)...")
-        self.search_agent = TaxonomySearchAgent(taxonomy_path)
+        self.search_agent = TaxonomySearchAgent(
+            taxonomy_path,
+            embedding_cache_dir=str(resolve_config_path(embedding_cache_dir, base_dir)) if embedding_cache_dir else None,
+            embedding_dtype=taxonomy_config.get('embedding_dtype', "float32"),
+            embedding_service=self.embedding_service,
+            snapshot_state=snapshot['search_agent'] if snapshot else None
+        )
         
         print("2. Initializing Domain Knowledge Graph (A*)...")
         aux_keywords = ['通知', '發送', 'Email', 'SMS', '記錄', '日誌', '提醒', '確認']
-        self.domain_graph = DomainKnowledgeGraph(triples, ontology, auxiliary_keywords=aux_keywords)
+        # 可達性 / 距離索引與知識圖放在一起，知識圖變動時自動重建
+        reach_config = self.config.get('generation', {}).get('reachability_index', {})
+        reach_path = None
+        if reach_config.get('enabled', True):
+            reach_path = str(resolve_config_path(
+                reach_config.get('path', "../data/adapted_knowledge_graph.reachability.npz"), base_dir
+            ))
+        if snapshot:
+            self.domain_graph = snapshot['domain_graph']
+            print(f"   ✅ Restored knowledge graph from snapshot ({len(self.domain_graph.csr)} nodes)")
+        else:
+            self.domain_graph = DomainKnowledgeGraph(
+                triples,
+                ontology,
+                auxiliary_keywords=aux_keywords,
+                reachability_index_path=reach_path,
+                reachability_max_hops=int(reach_config.get('max_hops', 10))
+            )
         
         print("3. Initializing Workflow Composer...")
-        self.composer = ModuleAwareWorkflowComposer(
-            self.domain_graph,
-            self.search_agent,
-            ontology
+        generation_config = self.config.get('generation', {})
+        astar_config = generation_config.get('astar', {})
+        # 邊成本 / 覆蓋懲罰參數由 A* 與 beam search 共用
+        composer_kwargs = dict(
+            max_expansions=int(astar_config.get('max_expansions', 5000)),
+            max_path_nodes=int(astar_config.get('max_path_nodes', 10)),
+            length_cost=float(astar_config.get('length_cost', 0.1)),
+            mf_weight=float(astar_config.get('mf_weight', 0.5)),
+            miss_penalty=float(astar_config.get('miss_penalty', 2.0))
         )
+        engine = generation_config.get('engine', 'astar')
+        if engine == 'beam':
+            beam_config = generation_config.get('beam', {})
+            self.composer = BeamSearchWorkflowComposer(
+                self.domain_graph,
+                self.search_agent,
+                ontology,
+                beam_width=int(beam_config.get('beam_width', 8)),
+                max_depth=int(beam_config.get('max_depth', 8)),
+                diversity_weight=float(beam_config.get('diversity_weight', 0.5)),
+                **composer_kwargs
+            )
+        else:
+            if engine != 'astar':
+                print(f"   ⚠️  未知的 generation.engine: {engine}，改用 astar")
+            self.composer = ModuleAwareWorkflowComposer(
+                self.domain_graph,
+                self.search_agent,
+                ontology,
+                **composer_kwargs
+            )
+        print(f"   - Composition engine: {type(self.composer).__name__}")
         
         print("4. Building Function Categories from Taxonomy...")
         # 從 taxonomy 動態構建 function_categories（像原本的程式碼）
-        self.function_categories = self._build_categories_from_taxonomy(taxonomy_path)
+        if snapshot:
+            self.function_categories = snapshot['function_categories']
+        else:
+            self.function_categories = self._build_categories_from_taxonomy(taxonomy_path)
         print(f"   - Loaded {len(self.function_categories)} function categories.")
         
         print("5. Initializing NLU Components...")
+        # 獨立的 LLM 呼叫以共用 client 並行發出（max_concurrency = 0 表示循序）
+        llm_config = self.config.get('llm', {})
+        call_timeout = llm_config.get('call_timeout', 60)
+        self.llm_fanout = LLMFanOut(
+            max_workers=int(llm_config.get('max_concurrency', 4)),
+            call_timeout=call_timeout
+        )
+        self.prefetch_llm_fallbacks = bool(llm_config.get('prefetch_fallbacks', False))
         # 傳入 ontology 和 function_categories 以提供更好的上下文
         self.intent_analyzer = IntentAnalyzer(
             openai_api_key,
             ontology=ontology,
-            function_categories=self.function_categories
+            function_categories=self.function_categories,
+            cache=self._create_nlu_cache(base_dir),
+            request_timeout=call_timeout
         )
         self.keyword_extractor = KeywordExtractor()
         
@@ -75,15 +169,66 @@ class HybridWorkflowSystem:
         
         # === 新增：提取所有 mapped_nodes 資訊 ===
         print("6. Extracting all mapped_nodes from taxonomy...")
-        self.all_mapped_nodes_info = self._extract_all_mapped_nodes(taxonomy_path)
-        
-        # === 新增：初始化 embedding model 用於 trigger node 選擇 ===
-        print("7. Initializing embedding model for trigger node selection...")
-        self.embedding_model = SentenceTransformer('paraphrase-multilingual-mpnet-base-v2')
-        print("   ✅ Embedding model loaded.")
+        if snapshot:
+            self.all_mapped_nodes_info = snapshot['all_mapped_nodes_info']
+        else:
+            self.all_mapped_nodes_info = self._extract_all_mapped_nodes(taxonomy_path)
+        
+        # === trigger / end node 選擇與 MCTS 共用 embedding 服務（不再另外載入模型）===
+        print("7. Sharing embedding service for trigger/end node selection...")
+        print(f"   ✅ Using shared embedding model: {self.embedding_service.model_name}")
+        # top 10 trigger / end node 描述只在初始化時讀取與編碼一次
+        self.endpoint_descriptors = {
+            kind: self._load_endpoint_descriptors(kind, base_dir / "data" / file_name, list_key)
+            for kind, (file_name, list_key) in ENDPOINT_DESCRIPTOR_FILES.items()
+        }
         
         print("✅ All components initialized successfully.")
     
+    def snapshot_state(self) -> Dict:
+        """
+        取得從 JSON 推導出、與 embedding 模型無關的結構（供 orchestrator snapshot 使用）
+        
+        Returns:
+            state: {search_agent, domain_graph, function_categories, all_mapped_nodes_info}
+        """
+        return {
+            'search_agent': self.search_agent.snapshot_state(),
+            'domain_graph': self.domain_graph,
+            'function_categories': self.function_categories,
+            'all_mapped_nodes_info': self.all_mapped_nodes_info,
+        }
+    
+    def _create_nlu_cache(self, base_dir: Path) -> Optional[NLUCache]:
+        """
+        依 config 建立 NLU 持久化快取（nlu.cache.enabled 為 false 時返回 None）
+        
+        Args:
+            base_dir: 相對路徑的基準目錄
+        
+        Returns:
+            cache: NLUCache 或 None
+        """
+        cache_config = self.config.get('nlu', {}).get('cache', {})
+        if not cache_config.get('enabled', True):
+            return None
+        
+        cache_path = resolve_config_path(
+            cache_config.get('path', "../data/nlu_cache/nlu_cache.sqlite"), base_dir
+        )
+        ttl_hours = cache_config.get('ttl_hours', 168)
+        try:
+            cache = NLUCache(
+                str(cache_path),
+                ttl_seconds=float(ttl_hours) * 3600 if ttl_hours else None,
+                max_entries=int(cache_config.get('max_entries', 10000))
+            )
+        except Exception as e:
+            print(f"   ⚠️  NLU cache disabled: {e}")
+            return None
+        print(f"   ✅ NLU cache: {cache_path}")
+        return cache
+    
     def generate_workflow(self, user_query: str) -> List[Dict]:
         """
         生成工作流程候選
@@ -98,15 +243,60 @@ class HybridWorkflowSystem:
         print(f"Received User Query: '{user_query}'")
         print("=" * 80)
         
-        # STAGE 0: NLU Analysis
+        # 可選：與 NLU 同時預先發出只依賴原始查詢的 trigger / end LLM fallback
+        llm_prefetch = {}
+        if self.prefetch_llm_fallbacks and self.llm_fanout.enabled:
+            llm_prefetch = {
+                'trigger': self.llm_fanout.submit(self._select_trigger_with_llm, user_query),
+                'end': self.llm_fanout.submit(self._select_end_with_llm, user_query)
+            }
+        
+        try:
+            return self._generate_workflow(user_query, llm_prefetch)
+        finally:
+            # 未使用的預取呼叫：尚未開始的直接取消
+            for future in llm_prefetch.values():
+                self.llm_fanout.cancel(future)
+    
+    def run_nlu_stage(self, user_query: str, resolve_endpoint_llm: bool = False) -> Dict:
+        """
+        STAGE 0：NLU 分析
+        
+        analyze 完成後，keyword 提取與 mapped_nodes 選擇只依賴分析結果，
+        兩者以共用 client 並行發出；逾時或失敗時使用各自的備用結果。
+        與 generate_from_nlu 合起來即為 generate_workflow，呼叫端可以把兩個階段分開排程
+        （例如批次處理或 HTTP 服務）。
+        
+        Args:
+            user_query: 用戶查詢字符串
+            resolve_endpoint_llm: 是否在此階段一併取得 trigger / end 的 LLM 選擇（只依賴原始查詢，
+                與 NLU 並行發出）。generate_from_nlu 在 mapped_nodes 沒有熱門 trigger / end 時直接使用，
+                不再等待 LLM；代價是兩者在不需要時也會被呼叫
+        
+        Returns:
+            nlu_result: {"analysis", "goal_description", "parameters", "function_categories",
+                         "keywords", "llm_selected_nodes", "endpoint_llm"?}
+        """
         print("\nSTAGE 0: NLU Analysis")
-        analysis = self.intent_analyzer.analyze(user_query)
+        endpoint_futures = {}
+        if resolve_endpoint_llm:
+            endpoint_futures = {
+                'trigger': self.llm_fanout.submit(self._select_trigger_with_llm, user_query),
+                'end': self.llm_fanout.submit(self._select_end_with_llm, user_query)
+            }
+        analysis_future = self.llm_fanout.submit(self.intent_analyzer.analyze, user_query)
+        analysis = self.llm_fanout.result(
+            analysis_future, "analyze", lambda: self.intent_analyzer.fallback_analysis(user_query)
+        )
         goal_description = analysis.get('goal_description', user_query)
-        extracted_params = analysis.get('parameters', {})
-        function_categories = analysis.get('function_categories', [])
         
-        # 提取關鍵字（使用 LLM，像原本的程式碼）
-        keywords = self.intent_analyzer.extract_keywords(user_query, analysis)
+        # 提取關鍵字（使用 LLM，像原本的程式碼）與 LLM 選擇 mapped_nodes 同時進行
+        keywords_future = self.llm_fanout.submit(self.intent_analyzer.extract_keywords, user_query, analysis)
+        selection_future = self.llm_fanout.submit(self._select_mapped_nodes_with_llm, user_query, goal_description)
+        
+        keywords = self.llm_fanout.result(
+            keywords_future, "extract_keywords", lambda: self.intent_analyzer.fallback_keywords(user_query)
+        )
         # 也添加一些技術術語作為補充
         tech_terms = self.keyword_extractor.extract_technical_terms(user_query)
         keywords.update(tech_terms)
@@ -114,12 +304,119 @@ class HybridWorkflowSystem:
         print(f" - Extracted Keywords: {keywords}")
         
         # === 新增：讓 LLM 直接選擇相關的 mapped_nodes ===
-        llm_selected_nodes = self._select_mapped_nodes_with_llm(user_query, goal_description)
-        llm_selected_nodes_set = set(llm_selected_nodes)
-        print(f" - LLM Selected mapped_nodes: {llm_selected_nodes_set}")
+        llm_selected_nodes = self.llm_fanout.result(selection_future, "select_mapped_nodes", list)
+        print(f" - LLM Selected mapped_nodes: {set(llm_selected_nodes)}")
+        
+        nlu_result = {
+            "analysis": analysis,
+            "goal_description": goal_description,
+            "parameters": analysis.get('parameters', {}),
+            "function_categories": analysis.get('function_categories', []),
+            "keywords": keywords,
+            "llm_selected_nodes": llm_selected_nodes
+        }
+        if endpoint_futures:
+            nlu_result["endpoint_llm"] = {
+                'trigger': self.llm_fanout.result(endpoint_futures['trigger'], "trigger_llm", self._fallback_trigger_node),
+                'end': self.llm_fanout.result(endpoint_futures['end'], "end_llm", self._fallback_end_node)
+            }
+        return nlu_result
+    
+    def generate_workflow_batch(self, user_queries: List[str], max_workers: int = 4) -> List[Dict]:
+        """
+        批次生成多個查詢的工作流程候選
+        
+        1. 所有原始查詢一次編碼（填入共享 embedding 服務的快取，trigger / end 選擇直接命中）
+        2. 各查詢的 NLU 在執行緒池中進行；LLM 呼叫共用 llm_fanout，總並行數受 llm.max_concurrency 限制
+        3. 所有 goal_description 與關鍵字查詢文字一次編碼（MCTS 語義與關鍵字獎勵直接命中快取）
+        4. MCTS、trigger / end 選擇與路徑組合在執行緒池中逐查詢進行
+        
+        單一查詢失敗只記錄在該查詢的結果中，不影響其他查詢。
+        
+        Args:
+            user_queries: 用戶查詢列表
+            max_workers: 同時處理的查詢數
+        
+        Returns:
+            results: 與輸入順序對應的 {"candidates": [...], "nlu": {...} | None, "error": None | str}
+        """
+        results = [{"candidates": [], "nlu": None, "error": None} for _ in user_queries]
+        if not user_queries:
+            return results
+        print(f"\n=== Batch generation: {len(user_queries)} queries ({max_workers} workers) ===")
+        
+        self.prefetch_embeddings(user_queries)
+        
+        def run_stage(stage_fn, indices):
+            with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="workflow-batch") as executor:
+                futures = {i: executor.submit(stage_fn, i) for i in indices}
+                for i, future in futures.items():
+                    try:
+                        future.result()
+                    except Exception as e:
+                        results[i]["error"] = f"{type(e).__name__}: {e}"
+                        print(f"   ⚠️  Query #{i + 1} failed: {results[i]['error']}")
+        
+        # STAGE 0：NLU（LLM 為主）
+        def nlu_stage(i):
+            results[i]["nlu"] = self.run_nlu_stage(user_queries[i])
+        
+        run_stage(nlu_stage, range(len(user_queries)))
+        
+        ok = [i for i, r in enumerate(results) if r["error"] is None]
+        self.prefetch_embeddings(
+            [results[i]["nlu"]["goal_description"] for i in ok]
+            + [" ".join(results[i]["nlu"]["keywords"]) for i in ok]
+        )
+        
+        # STAGE 1-2：MCTS + trigger / end 選擇 + 路徑組合（不使用 LLM 預取，避免 llm_fanout 中的呼叫互相等待）
+        def generation_stage(i):
+            results[i]["candidates"] = self.generate_from_nlu(user_queries[i], results[i]["nlu"])
+        
+        run_stage(generation_stage, ok)
+        
+        failed = sum(1 for r in results if r["error"] is not None)
+        print(f"=== Batch generation done: {len(user_queries) - failed} succeeded, {failed} failed ===")
+        return results
+    
+    def prefetch_embeddings(self, texts: List[str]):
+        """以一次批次編碼填入共享 embedding 服務的快取（失敗時各查詢照常個別編碼）"""
+        texts = list(dict.fromkeys(t for t in texts if t))
+        if not texts:
+            return
+        try:
+            self.embedding_service.encode(texts)
+        except Exception as e:
+            print(f"   ⚠️  Warning: Batch embedding prefetch failed: {e}")
+    
+    def _generate_workflow(self, user_query: str, llm_prefetch: Dict) -> List[Dict]:
+        """generate_workflow 的主體（llm_prefetch：預先發出的 trigger / end LLM 呼叫）"""
+        # STAGE 0: NLU Analysis
+        nlu_result = self.run_nlu_stage(user_query)
+        return self.generate_from_nlu(user_query, nlu_result, llm_prefetch)
+    
+    def generate_from_nlu(self, user_query: str, nlu_result: Dict, llm_prefetch: Optional[Dict] = None) -> List[Dict]:
+        """
+        STAGE 1-2：由 NLU 結果進行 MCTS 搜索、trigger / end 選擇與路徑組合
+        
+        Args:
+            user_query: 用戶查詢字符串
+            nlu_result: run_nlu_stage 的結果
+            llm_prefetch: 預先發出的 trigger / end LLM 呼叫（可選）
+        
+        Returns:
+            candidates: 候選工作流程列表
+        """
+        llm_prefetch = llm_prefetch or {}
+        goal_description = nlu_result['goal_description']
+        extracted_params = nlu_result['parameters']
+        function_categories = nlu_result['function_categories']
+        keywords = nlu_result['keywords']
+        llm_selected_nodes_set = set(nlu_result['llm_selected_nodes'])
         
         # STAGE 1: MCTS Search
         print("\nSTAGE 1: MCTS Taxonomy Search")
+        mcts_config = self.config.get('search', {}).get('mcts', {})
         # ✅ 根據 taxonomy 統計：92 個葉子節點，建議迭代次數為 92 * 3 = 276
         # 設定為 300 次，確保有足夠的探索空間，同時不會過度浪費時間
         matched_leaves = self.search_agent.search_with_categories(
@@ -127,8 +424,15 @@ class HybridWorkflowSystem:
             function_categories=function_categories,
             extracted_keywords=keywords,
             llm_selected_nodes=llm_selected_nodes_set,  # === 新增參數 ===
-            iterations=300,  # 優化：92 個葉子節點，300 次迭代足夠（約 3.3x 覆蓋率）
-            top_n=5
+            iterations=int(mcts_config.get('iterations', 300)),  # 上限：92 個葉子節點，300 次迭代足夠（約 3.3x 覆蓋率）
+            top_n=5,
+            workers=int(mcts_config.get('workers', 1)),
+            worker_noise=float(mcts_config.get('worker_noise', 0.05)),
+            seed=mcts_config.get('seed'),
+            early_stopping=bool(mcts_config.get('early_stopping', False)),  # top-5 訪問佔比穩定後提前停止
+            convergence_patience=int(mcts_config.get('convergence_patience', 3)),
+            convergence_check_every=int(mcts_config.get('convergence_check_every', 25)),
+            convergence_tolerance=float(mcts_config.get('convergence_tolerance', 0.01))
         )
         
         if not matched_leaves:
@@ -256,8 +560,27 @@ class HybridWorkflowSystem:
             print("⚠️  Warning: No concrete nodes extracted. Cannot generate workflow.")
             return []
         
-        # === 新增：選擇 trigger node ===
-        selected_trigger = self._select_trigger_node(user_query, initial_concrete_nodes)
+        # === 新增：選擇 trigger / end node ===
+        endpoint_llm = nlu_result.get('endpoint_llm')
+        if endpoint_llm is not None:
+            # LLM 選擇已在 NLU 階段取得：直接在目前執行緒選擇，不會等待 LLM
+            selected_trigger = self._select_trigger_node(
+                user_query, list(initial_concrete_nodes), LLMFanOut.resolved(endpoint_llm['trigger'])
+            )
+            selected_end = self._select_end_node(
+                user_query, list(initial_concrete_nodes), LLMFanOut.resolved(endpoint_llm['end'])
+            )
+        else:
+            # embedding 選擇在目前執行緒執行；只有需要 LLM fallback（情況 3）且沒有預取的一端才提交到 llm_fanout，
+            # 兩端的 LLM 呼叫仍可並行，且池內的工作不會等待同一個池的 future
+            llm_futures = {}
+            for kind, select_with_llm in (('trigger', self._select_trigger_with_llm), ('end', self._select_end_with_llm)):
+                llm_futures[kind] = llm_prefetch.get(kind)
+                if llm_futures[kind] is None and self._needs_endpoint_llm(kind, initial_concrete_nodes):
+                    llm_futures[kind] = self.llm_fanout.submit(select_with_llm, user_query)
+            selected_trigger = self._select_trigger_node(user_query, list(initial_concrete_nodes), llm_futures['trigger'])
+            selected_end = self._select_end_node(user_query, list(initial_concrete_nodes), llm_futures['end'])
+        
         if selected_trigger:
             # 確保選中的 trigger node 在 initial_concrete_nodes 中，並且放在最前面
             if selected_trigger in initial_concrete_nodes:
@@ -265,8 +588,6 @@ class HybridWorkflowSystem:
             initial_concrete_nodes.insert(0, selected_trigger)
             print(f"   ✅ Trigger node prioritized: {selected_trigger}")
         
-        # === 新增：選擇 end node ===
-        selected_end = self._select_end_node(user_query, initial_concrete_nodes)
         if selected_end:
             # 確保選中的 end node 在 initial_concrete_nodes 中
             if selected_end not in initial_concrete_nodes:
@@ -504,10 +825,140 @@ Example output: {{"selected_nodes": ["n8n-nodes-base.webhook", "n8n-nodes-base.h
             print(f"   -> LLM node selection failed: {e}. Returning empty list.")
             return []
     
+    def _load_endpoint_descriptors(self, kind: str, info_file: Path, list_key: str) -> Dict:
+        """
+        讀取 top 10 trigger / end node 描述檔，並把描述編碼成一個矩陣
+
+        矩陣以描述檔內容雜湊 + 模型名稱 + dtype 為鍵存放在 embedding 索引目錄，
+        描述檔或模型變動時自動重建；讀取或編碼失敗時選擇階段改為即時編碼。
+
+        Args:
+            kind: 'trigger' 或 'end'
+            info_file: 描述檔路徑
+            list_key: 描述檔中的列表鍵
+
+        Returns:
+            descriptors: {
+                'node_types': top 10 node types（依熱門程度排序）,
+                'texts': {node_type: "node_type: description"},
+                'rows': {node_type: 矩陣列},
+                'matrix': (N, dim) 已正規化的 float32 矩陣（不可用時為 None）
+            }
+        """
+        descriptors = {'node_types': [], 'texts': {}, 'rows': {}, 'matrix': None}
+        try:
+            with open(info_file, 'r', encoding='utf-8') as f:
+                info_data = json.load(f)
+        except Exception as e:
+            print(f"   ⚠️  Warning: Could not load {kind} node info: {e}")
+            return descriptors
+        
+        for info in info_data.get(list_key, []):
+            node_type = info.get('node_type', '')
+            description = info.get('description', info.get('display_name', node_type))
+            descriptors['node_types'].append(node_type)
+            # 構建文本：node name + description
+            descriptors['texts'][node_type] = f"{node_type}: {description}"
+        texts = list(descriptors['texts'].values())
+        if not texts:
+            return descriptors
+        
+        try:
+            dtype = self.search_agent.embedding_dtype
+            key = compute_index_key(hash_file(str(info_file)), self.embedding_service.model_name, dtype)
+            index = EmbeddingIndex.load_or_build(
+                index_dir=str(self.search_agent.embedding_cache_dir),
+                name=f"{kind}_node_embeddings",
+                key=key,
+                texts=texts,
+                encode_fn=lambda batch: self.embedding_service.encode(batch, use_cache=False),
+                dtype=dtype,
+                metadata={"model_name": self.embedding_service.model_name, "source": info_file.name}
+            )
+            # 只有 10 列，轉成常駐記憶體的 float32，之後每次選擇只做一次矩陣-向量乘法
+            descriptors['matrix'] = np.asarray(index.embeddings, dtype=np.float32)
+            descriptors['rows'] = {node_type: i for i, node_type in enumerate(descriptors['texts'])}
+        except Exception as e:
+            print(f"   ⚠️  Warning: Could not build {kind} node embeddings: {e}")
+        
+        return descriptors
+    
+    def _select_endpoint_by_embedding(
+        self,
+        kind: str,
+        user_query: str,
+        candidates: List[str]
+    ) -> Optional[str]:
+        """
+        使用 embedding similarity 從候選 trigger / end nodes 中選擇最適合的
+
+        候選都在 top 10 描述檔中時直接取預先編碼的矩陣列，
+        與查詢向量做一次批次內積；否則才即時編碼候選描述。
+
+        Args:
+            kind: 'trigger' 或 'end'
+            user_query: 用戶查詢
+            candidates: 候選的 node types
+
+        Returns:
+            最適合的 node type
+        """
+        try:
+            descriptors = self.endpoint_descriptors[kind]
+            rows = descriptors['rows']
+            query_embedding = self.embedding_service.encode_one(user_query)
+            
+            if descriptors['matrix'] is not None and all(node in rows for node in candidates):
+                candidate_embeddings = descriptors['matrix'][[rows[node] for node in candidates]]
+            else:
+                # 如果不在 top 10 列表中，使用 node type 名稱作為描述
+                candidate_embeddings = self.embedding_service.encode([
+                    descriptors['texts'].get(node, f"{node}: {node}") for node in candidates
+                ])
+            
+            # 計算相似度（向量已 L2 正規化，內積即餘弦相似度）
+            similarities = candidate_embeddings @ query_embedding
+            
+            # 找出最高相似度的候選
+            best_idx = int(similarities.argmax())
+            best_node = candidates[best_idx]
+            best_similarity = float(similarities[best_idx])
+            
+            print(f"   - Embedding similarity results:")
+            for i, node in enumerate(candidates):
+                sim = float(similarities[i])
+                print(f"      {node}: {sim:.4f}")
+            print(f"   ✅ Selected: {best_node} (similarity: {best_similarity:.4f})")
+            
+            return best_node
+            
+        except Exception as e:
+            print(f"   ⚠️  Error in embedding-based selection: {e}")
+            # Fallback: 返回第一個候選
+            if candidates:
+                print(f"   - Fallback: Using first candidate: {candidates[0]}")
+                return candidates[0]
+            return None
+    
+    def _needs_endpoint_llm(self, kind: str, mapped_nodes: List[str]) -> bool:
+        """
+        mapped_nodes 中是否沒有任何 top 10 popular endpoint node（即 _select_*_node 的情況 3，需要詢問 LLM）
+        
+        Args:
+            kind: 'trigger' 或 'end'
+            mapped_nodes: 從 MCTS 搜索得到的 mapped_nodes 列表
+        
+        Returns:
+            needs_llm: 是否需要 LLM fallback
+        """
+        top_10_nodes = self.endpoint_descriptors[kind]['node_types']
+        return not any(node in top_10_nodes for node in mapped_nodes)
+    
     def _select_trigger_node(
         self,
         user_query: str,
-        mapped_nodes: List[str]
+        mapped_nodes: List[str],
+        llm_future: Optional[Future] = None
     ) -> Optional[str]:
         """
         根據 mapping nodes 選擇最適合的 trigger node
@@ -520,29 +971,16 @@ Example output: {{"selected_nodes": ["n8n-nodes-base.webhook", "n8n-nodes-base.h
         Args:
             user_query: 用戶查詢
             mapped_nodes: 從 MCTS 搜索得到的 mapped_nodes 列表
+            llm_future: 預先發出的 _select_trigger_with_llm 呼叫（可選，情況 3 時使用）
             
         Returns:
             選擇的 trigger node type，如果無法選擇則返回 None
         """
         print("\n🔍 Selecting Trigger Node...")
         
-        # 加載 top 10 popular trigger nodes（從 package 內的數據文件）
-        trigger_info_file = Path(__file__).parent.parent.parent / "data" / "top10_trigger_nodes_info.json"
-        try:
-            with open(trigger_info_file, 'r', encoding='utf-8') as f:
-                trigger_info_data = json.load(f)
-            
-            # 從 top10_trigger_nodes_info.json 獲取 top 10 trigger nodes
-            top_10_trigger_nodes = [
-                info.get('node_type', '') 
-                for info in trigger_info_data.get('top10_trigger_nodes', [])
-            ]
-            
-            print(f"   - Top 10 popular trigger nodes: {top_10_trigger_nodes}")
-            
-        except Exception as e:
-            print(f"   ⚠️  Warning: Could not load trigger info: {e}")
-            top_10_trigger_nodes = []
+        # top 10 popular trigger nodes（初始化時已從 package 內的數據文件載入）
+        top_10_trigger_nodes = self.endpoint_descriptors['trigger']['node_types']
+        print(f"   - Top 10 popular trigger nodes: {top_10_trigger_nodes}")
         
         # 找出 mapped_nodes 中屬於 top 10 的 trigger nodes
         mapped_trigger_nodes = [
@@ -565,6 +1003,8 @@ Example output: {{"selected_nodes": ["n8n-nodes-base.webhook", "n8n-nodes-base.h
         # 情況 3：沒有 top 10 popular trigger nodes
         else:
             print(f"   🤖 Case 3: No top 10 trigger nodes found. Asking LLM...")
+            if llm_future is not None:
+                return self.llm_fanout.result(llm_future, "trigger_llm", self._fallback_trigger_node)
             return self._select_trigger_with_llm(user_query)
     
     def _select_trigger_by_embedding(
@@ -582,64 +1022,7 @@ Example output: {{"selected_nodes": ["n8n-nodes-base.webhook", "n8n-nodes-base.h
         Returns:
             最適合的 trigger node type
         """
-        try:
-            # 從 package 內的 top10_trigger_nodes_info.json 加載每個 trigger node 的 description
-            trigger_descriptions = {}
-            # 使用 package 內的數據文件
-            trigger_info_file = Path(__file__).parent.parent.parent / "data" / "top10_trigger_nodes_info.json"
-            
-            # 加載 top 10 trigger nodes 信息
-            trigger_info_map = {}
-            if trigger_info_file.exists():
-                with open(trigger_info_file, 'r', encoding='utf-8') as f:
-                    trigger_info_data = json.load(f)
-                    for info in trigger_info_data.get('top10_trigger_nodes', []):
-                        node_type = info.get('node_type', '')
-                        description = info.get('description', info.get('display_name', node_type))
-                        trigger_info_map[node_type] = description
-            
-            # 為每個候選 trigger 獲取 description
-            for trigger in candidate_triggers:
-                if trigger in trigger_info_map:
-                    trigger_descriptions[trigger] = trigger_info_map[trigger]
-                else:
-                    # 如果不在 top 10 列表中，使用 node type 名稱作為描述
-                    trigger_descriptions[trigger] = trigger
-            
-            # 構建文本：trigger node name + description
-            trigger_texts = []
-            for trigger in candidate_triggers:
-                desc = trigger_descriptions.get(trigger, trigger)
-                combined_text = f"{trigger}: {desc}"
-                trigger_texts.append(combined_text)
-            
-            # 計算 embedding
-            query_embedding = self.embedding_model.encode(user_query, convert_to_tensor=True)
-            trigger_embeddings = self.embedding_model.encode(trigger_texts, convert_to_tensor=True)
-            
-            # 計算相似度
-            similarities = util.cos_sim(query_embedding, trigger_embeddings)[0]
-            
-            # 找出最高相似度的 trigger
-            best_idx = similarities.argmax().item()
-            best_trigger = candidate_triggers[best_idx]
-            best_similarity = similarities[best_idx].item()
-            
-            print(f"   - Embedding similarity results:")
-            for i, trigger in enumerate(candidate_triggers):
-                sim = similarities[i].item()
-                print(f"      {trigger}: {sim:.4f}")
-            print(f"   ✅ Selected: {best_trigger} (similarity: {best_similarity:.4f})")
-            
-            return best_trigger
-            
-        except Exception as e:
-            print(f"   ⚠️  Error in embedding-based selection: {e}")
-            # Fallback: 返回第一個候選 trigger
-            if candidate_triggers:
-                print(f"   - Fallback: Using first candidate: {candidate_triggers[0]}")
-                return candidate_triggers[0]
-            return None
+        return self._select_endpoint_by_embedding('trigger', user_query, candidate_triggers)
     
     def _select_trigger_with_llm(self, user_query: str) -> Optional[str]:
         """
@@ -721,16 +1104,20 @@ Example output: {{"trigger_node_type": "n8n-nodes-base.gmailTrigger"}}
                 
         except Exception as e:
             print(f"   ⚠️  Error in LLM-based trigger selection: {e}")
-            # Fallback: 使用 manualTrigger
-            if "n8n-nodes-base.manualTrigger" in self.ontology:
-                print(f"   - Fallback: Using manualTrigger")
-                return "n8n-nodes-base.manualTrigger"
-            return None
+            return self._fallback_trigger_node()
+    
+    def _fallback_trigger_node(self) -> Optional[str]:
+        """trigger 選擇失敗（或逾時）時的備用方案：使用 manualTrigger"""
+        if "n8n-nodes-base.manualTrigger" in self.ontology:
+            print(f"   - Fallback: Using manualTrigger")
+            return "n8n-nodes-base.manualTrigger"
+        return None
     
     def _select_end_node(
         self,
         user_query: str,
-        mapped_nodes: List[str]
+        mapped_nodes: List[str],
+        llm_future: Optional[Future] = None
     ) -> Optional[str]:
         """
         根據 mapping nodes 選擇最適合的 end node
@@ -743,29 +1130,16 @@ Example output: {{"trigger_node_type": "n8n-nodes-base.gmailTrigger"}}
         Args:
             user_query: 用戶查詢
             mapped_nodes: 從 MCTS 搜索得到的 mapped_nodes 列表
+            llm_future: 預先發出的 _select_end_with_llm 呼叫（可選，情況 3 時使用）
             
         Returns:
             選擇的 end node type，如果無法選擇則返回 None
         """
         print("\n🔍 Selecting End Node...")
         
-        # 加載 top 10 popular end nodes（從 package 內的數據文件）
-        end_info_file = Path(__file__).parent.parent.parent / "data" / "top10_end_nodes_info.json"
-        try:
-            with open(end_info_file, 'r', encoding='utf-8') as f:
-                end_info_data = json.load(f)
-            
-            # 從 top10_end_nodes_info.json 獲取 top 10 end nodes
-            top_10_end_nodes = [
-                info.get('node_type', '') 
-                for info in end_info_data.get('top10_end_nodes', [])
-            ]
-            
-            print(f"   - Top 10 popular end nodes: {top_10_end_nodes}")
-            
-        except Exception as e:
-            print(f"   ⚠️  Warning: Could not load end node info: {e}")
-            top_10_end_nodes = []
+        # top 10 popular end nodes（初始化時已從 package 內的數據文件載入）
+        top_10_end_nodes = self.endpoint_descriptors['end']['node_types']
+        print(f"   - Top 10 popular end nodes: {top_10_end_nodes}")
         
         # 找出 mapped_nodes 中屬於 top 10 的 end nodes
         mapped_end_nodes = [
@@ -788,6 +1162,8 @@ Example output: {{"trigger_node_type": "n8n-nodes-base.gmailTrigger"}}
         # 情況 3：沒有 top 10 popular end nodes
         else:
             print(f"   🤖 Case 3: No top 10 end nodes found. Asking LLM...")
+            if llm_future is not None:
+                return self.llm_fanout.result(llm_future, "end_llm", self._fallback_end_node)
             return self._select_end_with_llm(user_query)
     
     def _select_end_by_embedding(
@@ -805,64 +1181,7 @@ Example output: {{"trigger_node_type": "n8n-nodes-base.gmailTrigger"}}
         Returns:
             最適合的 end node type
         """
-        try:
-            # 從 package 內的 top10_end_nodes_info.json 加載每個 end node 的 description
-            end_descriptions = {}
-            # 使用 package 內的數據文件
-            end_info_file = Path(__file__).parent.parent.parent / "data" / "top10_end_nodes_info.json"
-            
-            # 加載 top 10 end nodes 信息
-            end_info_map = {}
-            if end_info_file.exists():
-                with open(end_info_file, 'r', encoding='utf-8') as f:
-                    end_info_data = json.load(f)
-                    for info in end_info_data.get('top10_end_nodes', []):
-                        node_type = info.get('node_type', '')
-                        description = info.get('description', info.get('display_name', node_type))
-                        end_info_map[node_type] = description
-            
-            # 為每個候選 end 獲取 description
-            for end in candidate_ends:
-                if end in end_info_map:
-                    end_descriptions[end] = end_info_map[end]
-                else:
-                    # 如果不在 top 10 列表中，使用 node type 名稱作為描述
-                    end_descriptions[end] = end
-            
-            # 構建文本：end node name + description
-            end_texts = []
-            for end in candidate_ends:
-                desc = end_descriptions.get(end, end)
-                combined_text = f"{end}: {desc}"
-                end_texts.append(combined_text)
-            
-            # 計算 embedding
-            query_embedding = self.embedding_model.encode(user_query, convert_to_tensor=True)
-            end_embeddings = self.embedding_model.encode(end_texts, convert_to_tensor=True)
-            
-            # 計算相似度
-            similarities = util.cos_sim(query_embedding, end_embeddings)[0]
-            
-            # 找出最高相似度的 end
-            best_idx = similarities.argmax().item()
-            best_end = candidate_ends[best_idx]
-            best_similarity = similarities[best_idx].item()
-            
-            print(f"   - Embedding similarity results:")
-            for i, end in enumerate(candidate_ends):
-                sim = similarities[i].item()
-                print(f"      {end}: {sim:.4f}")
-            print(f"   ✅ Selected: {best_end} (similarity: {best_similarity:.4f})")
-            
-            return best_end
-            
-        except Exception as e:
-            print(f"   ⚠️  Error in embedding-based selection: {e}")
-            # Fallback: 返回第一個候選 end
-            if candidate_ends:
-                print(f"   - Fallback: Using first candidate: {candidate_ends[0]}")
-                return candidate_ends[0]
-            return None
+        return self._select_endpoint_by_embedding('end', user_query, candidate_ends)
     
     def _select_end_with_llm(self, user_query: str) -> Optional[str]:
         """
@@ -943,9 +1262,12 @@ Example output: {{"end_node_type": "n8n-nodes-base.telegram"}}
                 
         except Exception as e:
             print(f"   ⚠️  Error in LLM-based end node selection: {e}")
-            # Fallback: 使用 noOp
-            if "n8n-nodes-base.noOp" in self.ontology:
-                print(f"   - Fallback: Using noOp")
-                return "n8n-nodes-base.noOp"
-            return None
+            return self._fallback_end_node()
+    
+    def _fallback_end_node(self) -> Optional[str]:
+        """end node 選擇失敗（或逾時）時的備用方案：使用 noOp"""
+        if "n8n-nodes-base.noOp" in self.ontology:
+            print(f"   - Fallback: Using noOp")
+            return "n8n-nodes-base.noOp"
+        return None
 
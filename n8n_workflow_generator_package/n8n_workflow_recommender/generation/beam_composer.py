@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Beam Search 工作流程組合器
+
+在候選子圖上以 beam search 逐步延伸路徑，並以 Jaccard 相似度懲罰重複的節點集合，
+產生彼此不同的 top-k 候選交給 ChainRecommender 排序。
+"""
+
+from typing import Dict, List, Tuple
+
+from .workflow_composer import DomainKnowledgeGraph, ModuleAwareWorkflowComposer
+
+
+# beam 中的部分路徑：(分數, 路徑, 覆蓋 mask)
+BeamState = Tuple[float, Tuple[str, ...], int]
+
+
+def jaccard_similarity(a: frozenset, b: frozenset) -> float:
+    """兩個節點集合的 Jaccard 相似度"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class BeamSearchWorkflowComposer(ModuleAwareWorkflowComposer):
+    """
+    Beam Search 工作流程組合器
+
+    部分鏈的分數逐邊累加，與 A* 使用相同的參數：
+        score = miss_penalty × 已覆蓋關鍵節點數 - Σ 邊成本（length_cost + mf_weight × (1 - MF 分數)）
+    每一層只保留 beam_width 條部分路徑，挑選時以
+        adjusted = score - diversity_weight × max(與已選路徑的 Jaccard 相似度)
+    貪婪選擇（maximal marginal relevance），beam 與最終候選都因此保持多樣。
+    """
+
+    def __init__(
+        self,
+        domain_graph: DomainKnowledgeGraph,
+        search_agent,
+        ontology: Dict,
+        beam_width: int = 8,
+        max_depth: int = 8,
+        diversity_weight: float = 0.5,
+        **kwargs
+    ):
+        """
+        初始化組合器
+
+        Args:
+            domain_graph: 領域知識圖
+            search_agent: 搜索代理（用於獲取匹配的節點）
+            ontology: Ontology 字典
+            beam_width: 每一層保留的部分路徑數
+            max_depth: 最多延伸的邊數（同時受 max_path_nodes 限制）
+            diversity_weight: Jaccard 相似度懲罰權重（0 表示純分數排序）
+            **kwargs: 傳給 ModuleAwareWorkflowComposer 的參數（transition_scorer、length_cost 等）
+        """
+        super().__init__(domain_graph, search_agent, ontology, **kwargs)
+        self.beam_width = max(1, int(beam_width))
+        self.max_depth = max(1, int(max_depth))
+        self.diversity_weight = max(0.0, float(diversity_weight))
+
+    def _find_candidate_paths(self, nodes, start_node, top_k=5) -> List[Dict]:
+        return self._beam_search_in_subgraph(nodes, start_node, top_k=top_k)
+
+    def _select_diverse(
+        self,
+        states: List[BeamState],
+        k: int,
+        distinct: bool = False
+    ) -> List[Tuple[BeamState, float, float]]:
+        """
+        以 maximal marginal relevance 貪婪挑選 k 條路徑
+
+        懲罰永遠 >= 0，因此依原始分數由高到低掃描，
+        原始分數已不可能超過目前最佳調整分數時即可提前停止。
+
+        Args:
+            states: 候選部分路徑
+            k: 挑選數量
+            distinct: 是否略過節點集合與已選路徑完全相同的路徑
+
+        Returns:
+            selected: [(state, adjusted_score, diversity_penalty), ...]
+        """
+        ordered = sorted(states, key=lambda s: -s[0])
+        node_sets = [frozenset(s[1]) for s in ordered]
+        used = [False] * len(ordered)
+        chosen_sets: List[frozenset] = []
+        selected = []
+
+        while len(selected) < k:
+            best, best_adjusted, best_penalty = -1, float('-inf'), 0.0
+            for i, state in enumerate(ordered):
+                if used[i]:
+                    continue
+                if state[0] <= best_adjusted:
+                    break
+                penalty = max((jaccard_similarity(node_sets[i], c) for c in chosen_sets), default=0.0)
+                if distinct and penalty >= 1.0:
+                    used[i] = True
+                    continue
+                adjusted = state[0] - self.diversity_weight * penalty
+                if adjusted > best_adjusted:
+                    best, best_adjusted, best_penalty = i, adjusted, penalty
+            if best < 0:
+                break
+            used[best] = True
+            chosen_sets.append(node_sets[best])
+            selected.append((ordered[best], best_adjusted, best_penalty))
+
+        return selected
+
+    def _beam_search_in_subgraph(self, nodes, start_node, top_k=5) -> List[Dict]:
+        """
+        在候選子圖中以 beam search 尋找從 start_node 到潛在終點的多樣化 top-k 路徑
+
+        Args:
+            nodes: 候選節點列表
+            start_node: 起始節點
+            top_k: 返回的候選數量
+
+        Returns:
+            candidates: 候選路徑列表，每個包含 path, score, adjusted_score, diversity_penalty, coverage_count 等
+        """
+        self.last_search_stats = {}
+        if not nodes or not start_node or start_node not in nodes:
+            return []
+
+        top_k = top_k or 5
+        space = self._prepare_search_space(nodes, start_node)
+        if space is None:
+            return []
+        successors = space['successors']
+        potential_ends = space['potential_ends']
+        required_bits = space['required_bits']
+        can_reach_end = space['can_reach_end']
+        min_hops = space['min_hops']
+
+        edge_costs: Dict[Tuple[str, str], float] = {}
+        beam: List[BeamState] = [(0.0, (start_node,), 0)] if start_node in can_reach_end else []
+        finished: Dict[Tuple[str, ...], BeamState] = {}
+        expansions = 0
+        depth_limit = min(self.max_depth, self.max_path_nodes - 1)
+        pruned = 0
+
+        for _ in range(depth_limit):
+            expanded: List[BeamState] = []
+            for score, path, mask in beam:
+                node = path[-1]
+                for neigh in successors[node]:
+                    if neigh not in can_reach_end or neigh in path:
+                        continue
+                    cost = edge_costs.get((node, neigh))
+                    if cost is None:
+                        cost = edge_costs[(node, neigh)] = self._edge_cost(node, neigh)
+                    bit = required_bits.get(neigh, 0)
+                    gain = self.miss_penalty if bit and not mask & bit else 0.0
+                    state = (score - cost + gain, path + (neigh,), mask | bit)
+                    expansions += 1
+                    if neigh in potential_ends:
+                        finished[state[1]] = state
+                    if not successors[neigh]:
+                        continue
+                    # 與 A* 相同：剩餘跳數已不可能在長度上限內到達終點時不再延伸（不佔 beam 名額）
+                    if len(state[1]) + min_hops[neigh] > depth_limit + 1:
+                        pruned += 1
+                        continue
+                    expanded.append(state)
+            if not expanded:
+                break
+            beam = [state for state, _, _ in self._select_diverse(expanded, self.beam_width)]
+
+        candidates = []
+        num_required = len(required_bits)
+        for (score, path, _), adjusted, penalty in self._select_diverse(list(finished.values()), top_k, distinct=True):
+            coverage = [n for n in path if n in required_bits]
+            candidates.append({
+                'path': list(path),
+                'score': score,
+                'cost': self.miss_penalty * num_required - score,
+                'adjusted_score': adjusted,
+                'diversity_penalty': penalty,
+                'coverage': coverage,
+                'coverage_count': len(coverage),
+                'length': len(path)
+            })
+
+        self.last_search_stats = {
+            'subgraph_nodes': len(space['node_set']),
+            'reachable_nodes': len(can_reach_end),
+            'expansions': expansions,
+            'pruned': pruned,
+            'finished_paths': len(finished)
+        }
+
+        # Fallback: 拓樸排序 (如果沒有連通路徑)
+        if not candidates:
+            fallback = self._topological_fallback(space, start_node)
+            if fallback is not None:
+                candidates.append(fallback)
+
+        if candidates:
+            print(f" - Beam search found {len(finished)} complete paths ({expansions} expansions). "
+                  f"Returning {len(candidates)} diverse candidates.")
+            for i, c in enumerate(candidates):
+                path_preview = ' -> '.join(c['path'][:3]) + ('...' if len(c['path']) > 3 else '')
+                print(f"   Option {i+1}: {path_preview} (Score: {c['score']:.2f}, "
+                      f"Diversity penalty: {c.get('diversity_penalty', 0.0):.2f}, "
+                      f"Coverage: {c['coverage_count']}, Length: {c['length']})")
+        else:
+            print(f" - No valid paths found from {start_node} to any end nodes.")
+
+        return candidates
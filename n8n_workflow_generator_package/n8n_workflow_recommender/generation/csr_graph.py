@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+CSR 鄰接圖
+
+以整數索引的 CSR（正向邊）/ CSC（反向邊）NumPy 陣列表示知識圖，
+提供與 NetworkX DiGraph 相容的常用查詢（successors / predecessors / has_edge / out_degree），
+以及以節點 mask 限制的向量化 BFS 與拓撲排序。NetworkX 只作為可選的匯出格式。
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class CSRGraph:
+    """
+    CSR 有向圖
+
+    節點依在三元組中第一次出現的順序編號；重複的 (head, tail) 邊只保留一條
+    （relation 以最後一次出現為準，與 nx.DiGraph.add_edge 的行為一致），
+    每個節點的鄰居順序即邊的插入順序。
+    """
+
+    def __init__(
+        self,
+        nodes: List[str],
+        edges: Sequence[Tuple[int, int]],
+        edge_relations: Optional[Sequence[int]] = None,
+        relations: Optional[List[str]] = None
+    ):
+        """
+        Args:
+            nodes: 節點名稱列表（索引即節點 id）
+            edges: (source_id, target_id) 列表（已去重，依插入順序）
+            edge_relations: 每條邊的 relation id（可選）
+            relations: relation 名稱列表（可選）
+        """
+        self.nodes = list(nodes)
+        self.node_index: Dict[str, int] = {n: i for i, n in enumerate(self.nodes)}
+        self.relations = list(relations or [])
+
+        num_nodes = len(self.nodes)
+        edge_array = np.asarray(edges, dtype=np.int32).reshape(-1, 2)
+        sources, targets = edge_array[:, 0], edge_array[:, 1]
+        relation_ids = (
+            np.asarray(edge_relations, dtype=np.int16)
+            if edge_relations is not None else np.zeros(len(edge_array), dtype=np.int16)
+        )
+
+        # 正向 CSR（stable 排序保留每個節點的鄰居插入順序）
+        order = np.argsort(sources, kind='stable')
+        self.indptr = np.zeros(num_nodes + 1, dtype=np.int32)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=self.indptr[1:])
+        self.indices = targets[order]
+        self.edge_relations = relation_ids[order]
+
+        # 反向 CSC
+        rev_order = np.argsort(targets, kind='stable')
+        self.rev_indptr = np.zeros(num_nodes + 1, dtype=np.int32)
+        np.cumsum(np.bincount(targets, minlength=num_nodes), out=self.rev_indptr[1:])
+        self.rev_indices = sources[rev_order]
+
+        # has_edge 用的排序邊鍵（source * N + target）
+        self._edge_keys = np.sort(sources.astype(np.int64) * num_nodes + targets)
+
+    @classmethod
+    def from_triples(cls, triples: Iterable[Tuple[str, str, str]]) -> "CSRGraph":
+        """
+        從三元組列表建立 CSR 圖
+
+        Args:
+            triples: [(head, relation, tail), ...]
+
+        Returns:
+            graph: CSRGraph
+        """
+        node_index: Dict[str, int] = {}
+        relation_index: Dict[str, int] = {}
+        edge_relation: Dict[Tuple[int, int], int] = {}
+
+        for h, r, t in triples:
+            hi = node_index.setdefault(h, len(node_index))
+            ti = node_index.setdefault(t, len(node_index))
+            edge_relation[(hi, ti)] = relation_index.setdefault(r, len(relation_index))
+
+        return cls(
+            nodes=list(node_index),
+            edges=list(edge_relation.keys()),
+            edge_relations=list(edge_relation.values()),
+            relations=list(relation_index)
+        )
+
+    # === 名稱層級查詢（與 nx.DiGraph 相容） ===
+
+    def __contains__(self, node) -> bool:
+        return node in self.node_index
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    @property
+    def num_edges(self) -> int:
+        return int(self.indices.shape[0])
+
+    def successor_ids(self, node_id: int) -> np.ndarray:
+        return self.indices[self.indptr[node_id]:self.indptr[node_id + 1]]
+
+    def predecessor_ids(self, node_id: int) -> np.ndarray:
+        return self.rev_indices[self.rev_indptr[node_id]:self.rev_indptr[node_id + 1]]
+
+    def successors(self, node: str) -> List[str]:
+        i = self.node_index.get(node)
+        if i is None:
+            return []
+        return [self.nodes[j] for j in self.successor_ids(i)]
+
+    def predecessors(self, node: str) -> List[str]:
+        i = self.node_index.get(node)
+        if i is None:
+            return []
+        return [self.nodes[j] for j in self.predecessor_ids(i)]
+
+    def out_degree(self, node: str) -> int:
+        i = self.node_index.get(node)
+        return 0 if i is None else int(self.indptr[i + 1] - self.indptr[i])
+
+    def in_degree(self, node: str) -> int:
+        i = self.node_index.get(node)
+        return 0 if i is None else int(self.rev_indptr[i + 1] - self.rev_indptr[i])
+
+    def has_edge(self, source: str, target: str) -> bool:
+        si = self.node_index.get(source)
+        ti = self.node_index.get(target)
+        if si is None or ti is None:
+            return False
+        key = si * len(self.nodes) + ti
+        pos = np.searchsorted(self._edge_keys, key)
+        return bool(pos < len(self._edge_keys) and self._edge_keys[pos] == key)
+
+    # === 整數層級操作 ===
+
+    def ids(self, nodes: Iterable[str]) -> np.ndarray:
+        """節點名稱 → id 陣列（忽略不在圖中的節點，保留輸入順序並去重）"""
+        seen = {}
+        for n in nodes:
+            i = self.node_index.get(n)
+            if i is not None and i not in seen:
+                seen[i] = None
+        return np.fromiter(seen.keys(), dtype=np.int32, count=len(seen))
+
+    def names(self, node_ids: Iterable[int]) -> List[str]:
+        return [self.nodes[i] for i in node_ids]
+
+    def mask(self, nodes: Iterable[str]) -> np.ndarray:
+        """節點名稱集合 → 布林 mask"""
+        mask = np.zeros(len(self.nodes), dtype=bool)
+        mask[self.ids(nodes)] = True
+        return mask
+
+    @staticmethod
+    def _gather(indptr: np.ndarray, indices: np.ndarray, frontier: np.ndarray) -> np.ndarray:
+        """一次取出 frontier 中所有節點的鄰居（向量化的多段切片）"""
+        starts = indptr[frontier]
+        counts = indptr[frontier + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            return np.zeros(0, dtype=indices.dtype)
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+        return indices[offsets]
+
+    def reachable(
+        self,
+        start_ids: Sequence[int],
+        allowed: Optional[np.ndarray] = None,
+        reverse: bool = False
+    ) -> np.ndarray:
+        """
+        向量化 BFS：從 start_ids 出發（reverse=True 時沿反向邊）可達的節點
+
+        起點本身一定包含在結果中；其餘節點必須在 allowed mask 內。
+
+        Args:
+            start_ids: 起點 id
+            allowed: 允許經過的節點 mask（None 表示全圖）
+            reverse: 是否沿反向邊搜索
+
+        Returns:
+            visited: 布林 mask
+        """
+        indptr, indices = (self.rev_indptr, self.rev_indices) if reverse else (self.indptr, self.indices)
+        visited = np.zeros(len(self.nodes), dtype=bool)
+        frontier = np.unique(np.asarray(start_ids, dtype=np.int32))
+        visited[frontier] = True
+
+        while frontier.size:
+            neighbors = self._gather(indptr, indices, frontier)
+            keep = ~visited[neighbors]
+            if allowed is not None:
+                keep &= allowed[neighbors]
+            frontier = np.unique(neighbors[keep])
+            visited[frontier] = True
+        return visited
+
+    def induced_successors(self, node_ids: Sequence[int]) -> Dict[int, List[int]]:
+        """
+        導出子圖的鄰接表（只保留兩端都在 node_ids 中的邊，保留鄰居順序）
+
+        Args:
+            node_ids: 子圖節點 id
+
+        Returns:
+            adjacency: {node_id: [successor_id, ...]}
+        """
+        allowed = np.zeros(len(self.nodes), dtype=bool)
+        allowed[np.asarray(node_ids, dtype=np.int32)] = True
+        adjacency = {}
+        for i in node_ids:
+            succ = self.successor_ids(i)
+            adjacency[int(i)] = succ[allowed[succ]].tolist()
+        return adjacency
+
+    def topological_sort(self, node_ids: Sequence[int]) -> Optional[List[int]]:
+        """
+        導出子圖的拓撲排序（Kahn 算法）
+
+        Args:
+            node_ids: 子圖節點 id（其順序決定平手時的先後）
+
+        Returns:
+            order: 節點 id 順序；子圖有環時返回 None
+        """
+        node_ids = [int(i) for i in node_ids]
+        adjacency = self.induced_successors(node_ids)
+
+        in_degree = {i: 0 for i in node_ids}
+        for succs in adjacency.values():
+            for j in succs:
+                in_degree[j] += 1
+        queue = deque(i for i in node_ids if in_degree[i] == 0)
+        order = []
+        while queue:
+            i = queue.popleft()
+            order.append(i)
+            for j in adjacency[i]:
+                in_degree[j] -= 1
+                if in_degree[j] == 0:
+                    queue.append(j)
+        return order if len(order) == len(node_ids) else None
+
+    def strongly_connected_components(self) -> np.ndarray:
+        """
+        強連通分量（迭代式 Tarjan 算法）
+
+        Returns:
+            component: (N,) 每個節點所屬的分量編號；編號即縮點 DAG 的拓撲序（0 為最上游）
+        """
+        return self._tarjan(self.indptr.tolist(), self.indices.tolist())
+
+    @staticmethod
+    def _tarjan(indptr: List[int], indices: List[int]) -> np.ndarray:
+        """以 CSR 陣列表示的圖上執行迭代式 Tarjan，返回依拓撲序編號的分量（0 為最上游）"""
+        num_nodes = len(indptr) - 1
+        order = [-1] * num_nodes
+        low = [0] * num_nodes
+        on_stack = [False] * num_nodes
+        component = [-1] * num_nodes
+        stack: List[int] = []
+        counter = 0
+        num_components = 0
+
+        for root in range(num_nodes):
+            if order[root] != -1:
+                continue
+            order[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [[root, indptr[root]]]
+            while work:
+                frame = work[-1]
+                v, pos = frame
+                if pos < indptr[v + 1]:
+                    frame[1] = pos + 1
+                    w = indices[pos]
+                    if order[w] == -1:
+                        order[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = True
+                        work.append([w, indptr[w]])
+                    elif on_stack[w]:
+                        low[v] = min(low[v], order[w])
+                    continue
+
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[v])
+                if low[v] == order[v]:
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        component[w] = num_components
+                        if w == v:
+                            break
+                    num_components += 1
+
+        # Tarjan 以反向拓撲序完成分量：翻轉編號使 0 為最上游
+        return (num_components - 1) - np.asarray(component, dtype=np.int32)
+
+    def order_subset(self, node_ids: Sequence[int]) -> List[int]:
+        """
+        導出子圖的縮點順序：無環時為 Kahn 拓撲序；有環時依導出子圖的強連通分量
+        拓撲序排列，只有真正在同一個環內的節點才依輸入順序排列（可能出現逆向邊）
+
+        Args:
+            node_ids: 子圖節點 id（其順序決定平手與環內的先後）
+
+        Returns:
+            order: 節點 id 順序
+        """
+        order = self.topological_sort(node_ids)
+        if order is not None:
+            return order
+
+        node_ids = [int(i) for i in node_ids]
+        local = {v: i for i, v in enumerate(node_ids)}
+        adjacency = self.induced_successors(node_ids)
+        indptr = [0]
+        indices = []
+        for v in node_ids:
+            indices.extend(local[w] for w in adjacency[v])
+            indptr.append(len(indices))
+        component = self._tarjan(indptr, indices).tolist()
+        return [node_ids[i] for i in sorted(range(len(node_ids)), key=lambda i: (component[i], i))]
+
+    def _greedy_feedback_order(self, members: List[int], member_mask: np.ndarray) -> List[int]:
+        """
+        分量內的線性順序（Eades-Lin-Smyth 貪婪回饋邊集啟發式，盡量減少逆向邊）
+
+        反覆移除匯點（放到尾端）與源點（放到前端），都沒有時移除 出度 - 入度 最大的節點。
+        """
+        succ = {}
+        pred = {v: [] for v in members}
+        for v in members:
+            targets = self.successor_ids(v)
+            succ[v] = [w for w in targets[member_mask[targets]].tolist() if w != v]
+            for w in succ[v]:
+                pred[w].append(v)
+        out_degree = {v: len(succ[v]) for v in members}
+        in_degree = {v: len(pred[v]) for v in members}
+
+        remaining = dict.fromkeys(members)
+        head: List[int] = []
+        tail: List[int] = []
+
+        def remove(v):
+            del remaining[v]
+            for w in succ[v]:
+                if w in remaining:
+                    in_degree[w] -= 1
+            for u in pred[v]:
+                if u in remaining:
+                    out_degree[u] -= 1
+
+        while remaining:
+            sink = next((v for v in remaining if out_degree[v] == 0), None)
+            if sink is not None:
+                tail.append(sink)
+                remove(sink)
+                continue
+            source = next((v for v in remaining if in_degree[v] == 0), None)
+            if source is None:
+                source = max(remaining, key=lambda v: out_degree[v] - in_degree[v])
+            head.append(source)
+            remove(source)
+
+        return head + tail[::-1]
+
+    def condensation_order(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        全圖線性順序：先依縮點 DAG 的拓撲序排列分量，分量內再以貪婪回饋邊集順序排列
+
+        任何不在同一個強連通分量內的邊都是正向邊；分量內的 rank 只是全圖的近似順序，
+        節點子集需再以 order_subset 在導出子圖上排序，才能保證子集無環時沒有逆向邊。
+
+        Returns:
+            (component, rank): 每個節點的分量編號與全圖順序位置
+        """
+        component = self.strongly_connected_components()
+        num_components = int(component.max()) + 1 if len(component) else 0
+        members_by_component = [[] for _ in range(num_components)]
+        for v, c in enumerate(component.tolist()):
+            members_by_component[c].append(v)
+
+        rank = np.zeros(len(self.nodes), dtype=np.int32)
+        position = 0
+        for members in members_by_component:
+            if len(members) > 1:
+                member_mask = np.zeros(len(self.nodes), dtype=bool)
+                member_mask[members] = True
+                members = self._greedy_feedback_order(members, member_mask)
+            for v in members:
+                rank[v] = position
+                position += 1
+        return component, rank
+
+    def iter_simple_paths(self, source: int, target: int, allowed: np.ndarray, cutoff: int):
+        """
+        列舉 source → target 的簡單路徑（只經過 allowed 節點，最多 cutoff 條邊）
+
+        DFS 順序與 nx.all_simple_paths 相同（依鄰居插入順序）。
+
+        Yields:
+            path: 節點 id 列表
+        """
+        if cutoff < 1 or source == target:
+            return
+        path = [source]
+        on_path = {source}
+        stack = [iter(self.successor_ids(source).tolist())]
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:
+                stack.pop()
+                on_path.discard(path.pop())
+                continue
+            if child in on_path or not allowed[child]:
+                continue
+            if child == target:
+                yield path + [child]
+                continue
+            if len(path) < cutoff:
+                path.append(child)
+                on_path.add(child)
+                stack.append(iter(self.successor_ids(child).tolist()))
+
+    # === 匯出 ===
+
+    def nbytes(self) -> int:
+        """CSR / CSC 陣列佔用的位元組數"""
+        return sum(a.nbytes for a in (
+            self.indptr, self.indices, self.edge_relations,
+            self.rev_indptr, self.rev_indices, self._edge_keys
+        ))
+
+    def to_networkx(self, node_attrs: Optional[Dict[str, Dict]] = None):
+        """
+        匯出為 NetworkX DiGraph（需要安裝 networkx）
+
+        Args:
+            node_attrs: {node: {attr: value}} 節點屬性（例如 ontology）
+
+        Returns:
+            graph: nx.DiGraph，邊屬性為 relation 與 weight=1.0
+        """
+        import networkx as nx
+
+        node_attrs = node_attrs or {}
+        graph = nx.DiGraph()
+        for node in self.nodes:
+            graph.add_node(node, **node_attrs.get(node, {}))
+        for i, node in enumerate(self.nodes):
+            start, end = self.indptr[i], self.indptr[i + 1]
+            for j, rel in zip(self.indices[start:end], self.edge_relations[start:end]):
+                relation = self.relations[rel] if self.relations else None
+                graph.add_edge(node, self.nodes[j], relation=relation, weight=1.0)
+        return graph
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+可達性 / 距離索引
+
+對知識圖的每個節點離線計算傳遞閉包（打包成 bitset）與截斷在 max_hops 的最短跳數，
+保存為 .npz（與 adapted_knowledge_graph.json 放在一起），載入時以圖內容雜湊驗證。
+模組入口偵測與 A* 剪枝因此只需要 bitset 交集與查表。
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+from .csr_graph import CSRGraph
+from ..utils.file_loader import atomic_write_bytes
+
+
+# 索引格式版本（格式變動時遞增，舊索引會自動重建）
+INDEX_FORMAT_VERSION = 1
+
+# 距離矩陣中表示「不可達或超過 max_hops」的值
+UNREACHABLE = 255
+
+
+def compute_graph_key(csr: CSRGraph, max_hops: int) -> str:
+    """
+    計算索引鍵：節點列表 + CSR 邊陣列 + max_hops + 格式版本
+
+    Args:
+        csr: CSR 圖
+        max_hops: 距離截斷跳數
+
+    Returns:
+        key: 索引鍵
+    """
+    digest = hashlib.sha256(f"v{INDEX_FORMAT_VERSION}|{max_hops}|".encode('utf-8'))
+    digest.update("\n".join(csr.nodes).encode('utf-8'))
+    digest.update(csr.indptr.tobytes())
+    digest.update(csr.indices.tobytes())
+    return digest.hexdigest()
+
+
+class ReachabilityIndex:
+    """
+    可達性 / 距離索引
+
+    reach_bits[i]   - 從 i 可達的節點 bitset（np.packbits，包含 i 本身）
+    coreach_bits[i] - 可以到達 i 的節點 bitset（reach 的轉置）
+    dist[i, j]      - i → j 的最短跳數（> max_hops 或不可達時為 UNREACHABLE）
+
+    注意：索引描述的是完整知識圖；限制在候選子圖內的可達性是它的子集，
+    因此這裡的結果可作為精確剪枝的必要條件，距離可作為子圖距離的下界。
+    """
+
+    def __init__(self, nodes, reach_bits: np.ndarray, dist: np.ndarray, max_hops: int, key: str):
+        """
+        Args:
+            nodes: 節點名稱列表（與 CSRGraph.nodes 相同順序）
+            reach_bits: (N, ceil(N/8)) uint8 打包的傳遞閉包
+            dist: (N, N) uint8 截斷跳數
+            max_hops: 距離截斷跳數
+            key: 索引鍵
+        """
+        self.nodes = list(nodes)
+        self.num_nodes = len(self.nodes)
+        self.reach_bits = reach_bits
+        self.dist = dist
+        self.max_hops = int(max_hops)
+        self.key = key
+        reach = np.unpackbits(reach_bits, axis=1, count=self.num_nodes).astype(bool)
+        self.coreach_bits = np.packbits(reach.T, axis=1)
+
+    @classmethod
+    def build(cls, csr: CSRGraph, max_hops: int = 10) -> "ReachabilityIndex":
+        """
+        以每個節點為起點做分層 BFS，建立傳遞閉包與截斷距離
+
+        Args:
+            csr: CSR 圖
+            max_hops: 距離截斷跳數（必須 < 255）
+
+        Returns:
+            index: 新建立的索引
+        """
+        max_hops = int(min(max(max_hops, 1), UNREACHABLE - 1))
+        num_nodes = len(csr)
+        reach = np.zeros((num_nodes, num_nodes), dtype=bool)
+        dist = np.full((num_nodes, num_nodes), UNREACHABLE, dtype=np.uint8)
+
+        for source in range(num_nodes):
+            visited = reach[source]
+            visited[source] = True
+            dist[source, source] = 0
+            frontier = np.array([source], dtype=np.int32)
+            hops = 0
+            while frontier.size:
+                hops += 1
+                neighbors = CSRGraph._gather(csr.indptr, csr.indices, frontier)
+                frontier = np.unique(neighbors[~visited[neighbors]])
+                visited[frontier] = True
+                if hops <= max_hops:
+                    dist[source, frontier] = hops
+
+        return cls(csr.nodes, np.packbits(reach, axis=1), dist, max_hops, compute_graph_key(csr, max_hops))
+
+    def save(self, index_path: str):
+        """寫入 .npz（先寫暫存檔再 rename）"""
+        index_path = Path(index_path)
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(index_path, lambda f: np.savez(
+            f,
+            key=np.array(self.key),
+            format_version=np.array(INDEX_FORMAT_VERSION),
+            max_hops=np.array(self.max_hops),
+            nodes=np.array(self.nodes),
+            reach_bits=self.reach_bits,
+            dist=self.dist
+        ))
+
+    @classmethod
+    def load(cls, index_path: str, key: str) -> Optional["ReachabilityIndex"]:
+        """
+        載入索引
+
+        Args:
+            index_path: .npz 路徑
+            key: 預期的索引鍵（不一致時視為過期）
+
+        Returns:
+            index: 索引，如果不存在或已過期則返回 None
+        """
+        index_path = Path(index_path)
+        if not index_path.exists():
+            return None
+        try:
+            with np.load(index_path, allow_pickle=False) as data:
+                if str(data["key"]) != key:
+                    return None
+                nodes = [str(n) for n in data["nodes"]]
+                reach_bits = data["reach_bits"]
+                dist = data["dist"]
+                max_hops = int(data["max_hops"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+        if dist.shape != (len(nodes), len(nodes)) or reach_bits.shape[0] != len(nodes):
+            return None
+        return cls(nodes, reach_bits, dist, max_hops, key)
+
+    @classmethod
+    def load_or_build(cls, index_path: str, csr: CSRGraph, max_hops: int = 10) -> "ReachabilityIndex":
+        """
+        載入索引；如果不存在或知識圖已變動，則重建並保存
+
+        Returns:
+            index: 可用的索引
+        """
+        key = compute_graph_key(csr, int(min(max(max_hops, 1), UNREACHABLE - 1)))
+        index = cls.load(index_path, key)
+        if index is not None:
+            print(f"   ✅ 載入可達性索引: {index_path} ({index.num_nodes} 節點, max_hops={index.max_hops})")
+            return index
+
+        print(f"   📊 建立可達性索引: {index_path} ({len(csr)} 節點)...")
+        index = cls.build(csr, max_hops=max_hops)
+        try:
+            index.save(index_path)
+        except OSError as e:
+            print(f"   ⚠️  無法保存可達性索引: {e}")
+        return index
+
+    # === 查詢 ===
+
+    def bits(self, node_ids: Iterable[int]) -> np.ndarray:
+        """節點 id → 打包 bitset"""
+        mask = np.zeros(self.num_nodes, dtype=bool)
+        mask[np.asarray(list(node_ids), dtype=np.int64)] = True
+        return np.packbits(mask)
+
+    def to_mask(self, bits: np.ndarray) -> np.ndarray:
+        """打包 bitset → 布林 mask"""
+        return np.unpackbits(bits, count=self.num_nodes).astype(bool)
+
+    def reachable_from(self, node_ids: Iterable[int]) -> np.ndarray:
+        """從任一 node_ids 可達的節點（打包 bitset）"""
+        node_ids = np.asarray(list(node_ids), dtype=np.int64)
+        if node_ids.size == 0:
+            return np.zeros(self.reach_bits.shape[1], dtype=np.uint8)
+        return np.bitwise_or.reduce(self.reach_bits[node_ids], axis=0)
+
+    def reaching(self, node_ids: Iterable[int]) -> np.ndarray:
+        """可以到達任一 node_ids 的節點（打包 bitset）"""
+        node_ids = np.asarray(list(node_ids), dtype=np.int64)
+        if node_ids.size == 0:
+            return np.zeros(self.coreach_bits.shape[1], dtype=np.uint8)
+        return np.bitwise_or.reduce(self.coreach_bits[node_ids], axis=0)
+
+    def hops_to_any(self, target_ids: Iterable[int]) -> np.ndarray:
+        """
+        每個節點到任一目標的最短跳數下界
+
+        超過 max_hops 的距離以 max_hops + 1 表示（仍是有效下界），
+        完全不可達的節點以 UNREACHABLE 表示。
+
+        Returns:
+            hops: (N,) int 陣列
+        """
+        target_ids = np.asarray(list(target_ids), dtype=np.int64)
+        if target_ids.size == 0:
+            return np.full(self.num_nodes, UNREACHABLE, dtype=np.int32)
+        hops = self.dist[:, target_ids].min(axis=1).astype(np.int32)
+        reaches = self.to_mask(self.reaching(target_ids))
+        hops[(hops == UNREACHABLE) & reaches] = self.max_hops + 1
+        return hops
@@ -5,25 +5,31 @@
 使用 A* 算法在知識圖中生成工作流程路徑。
 """
 
-import networkx as nx
+import heapq
 from typing import List, Dict, Set, Optional, Tuple
-from collections import deque
 import numpy as np
 
+from .csr_graph import CSRGraph
+from .reachability_index import ReachabilityIndex
+from ..models.chain_recommender import CRITICAL_NODE_TYPES
+
 
 class DomainKnowledgeGraph:
     """
     領域知識圖
     
-    使用 NetworkX 構建的有向圖，用於 A* 路徑搜索。
-    """
+    以整數索引的 CSR / CSC 鄰接陣列（CSRGraph）表示的有向圖，用於 A* 路徑搜索；
+    NetworkX DiGraph 只在存取 .graph / to_networkx() 時才建立。
     """
-    領域知識圖
     
-    使用 NetworkX 構建的有向圖，用於 A* 路徑搜索。
-    """
-    
-    def __init__(self, triples: List[Tuple[str, str, str]], ontology: Dict, auxiliary_keywords: Optional[List[str]] = None):
+    def __init__(
+        self,
+        triples: List[Tuple[str, str, str]],
+        ontology: Dict,
+        auxiliary_keywords: Optional[List[str]] = None,
+        reachability_index_path: Optional[str] = None,
+        reachability_max_hops: int = 10
+    ):
         """
         初始化知識圖
         
@@ -31,9 +37,11 @@ class DomainKnowledgeGraph:
             triples: 三元組列表 [(head, relation, tail), ...]
             ontology: Ontology 字典 {node_type: {...}}
             auxiliary_keywords: 輔助關鍵字列表（用於擴展節點）
+            reachability_index_path: 可達性 / 距離索引的 .npz 路徑（可選，不存在或過期時自動重建）
+            reachability_max_hops: 距離索引的截斷跳數
         """
         print("PHASE 1B: Initializing Domain Knowledge Graph (A*)...")
-        self.graph = nx.DiGraph()
+        self.ontology = ontology
         self.auxiliary_keywords = auxiliary_keywords if auxiliary_keywords else []
         
         # n8n 的優先級起點和終點
@@ -47,19 +55,93 @@ class DomainKnowledgeGraph:
             'n8n-nodes-base.stopAndError'
         ]
         
-        self._build_graph(triples, ontology)
-        print(" - A* Graph built successfully.")
+        self._nx_graph = None
+        self._build_graph(triples)
+        print(f" - A* Graph built successfully ({len(self.csr)} nodes, {self.csr.num_edges} edges, "
+              f"{int(self.scc_component.max()) + 1 if len(self.csr) else 0} SCCs).")
+        
+        self.reachability: Optional[ReachabilityIndex] = None
+        if reachability_index_path:
+            self.reachability = ReachabilityIndex.load_or_build(
+                reachability_index_path, self.csr, max_hops=reachability_max_hops
+            )
     
-    def _build_graph(self, triples: List[Tuple[str, str, str]], ontology: Dict):
-        """構建 NetworkX 圖"""
-        all_nodes = set([h for h, _, _ in triples] + [t for _, _, t in triples])
+    def _build_graph(self, triples: List[Tuple[str, str, str]]):
+        """構建 CSR 鄰接圖，並預先計算強連通分量與縮點 DAG 的全圖線性順序"""
+        self.csr = CSRGraph.from_triples(triples)
+        self.scc_component, self.topo_rank = self.csr.condensation_order()
+    
+    def order_by_condensation(self, nodes, allowed: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        依縮點 DAG 排列節點：分量之間依預先計算的拓撲序（跨分量的邊一定是正向的），
+        同一分量內的節點以導出子圖排序（CSRGraph.order_subset），
+        全圖的貪婪順序只用來決定平手與導出子圖中真正成環的節點先後
         
-        for node in all_nodes:
-            node_attrs = ontology.get(node, {})
-            self.graph.add_node(node, **node_attrs)
+        Args:
+            nodes: 節點名稱集合
+            allowed: 額外的節點 mask（可選）
+        
+        Returns:
+            node_ids: 排序後的節點 id
+        """
+        mask = self.csr.mask(nodes)
+        if allowed is not None:
+            mask &= allowed
+        node_ids = np.flatnonzero(mask)
+        node_ids = node_ids[np.argsort(self.topo_rank[node_ids], kind='stable')]
+        
+        # 依 rank 排序後同一分量的節點相鄰
+        components = self.scc_component[node_ids]
+        boundaries = np.flatnonzero(np.diff(components)) + 1
+        ordered = []
+        for group in np.split(node_ids, boundaries):
+            ordered.extend(self.csr.order_subset(group) if len(group) > 1 else group.tolist())
+        return np.asarray(ordered, dtype=node_ids.dtype)
+    
+    def __contains__(self, node) -> bool:
+        return node in self.csr
+
+    def __getstate__(self) -> Dict:
+        # NetworkX 匯出只是快取，pickle（orchestrator snapshot）時不保存
+        state = self.__dict__.copy()
+        state['_nx_graph'] = None
+        return state
+
+    @property
+    def graph(self):
+        """NetworkX DiGraph（第一次存取時從 CSR 匯出，需要安裝 networkx）"""
+        if self._nx_graph is None:
+            self._nx_graph = self.to_networkx()
+        return self._nx_graph
+    
+    def to_networkx(self):
+        """
+        匯出為 NetworkX DiGraph（節點屬性為 ontology，邊屬性為 relation 與 weight）
+        
+        Returns:
+            graph: nx.DiGraph
+        """
+        return self.csr.to_networkx(node_attrs=self.ontology)
+    
+    def _subgraph_degrees(self, node_ids: np.ndarray, allowed: np.ndarray) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """
+        計算導出子圖中每個節點的入度與出度
+        
+        Args:
+            node_ids: 子圖節點 id（依圖中順序）
+            allowed: 子圖節點 mask
         
-        for h, r, t in triples:
-            self.graph.add_edge(h, t, relation=r, weight=1.0)
+        Returns:
+            (in_degrees, out_degrees): {node: degree}
+        """
+        csr = self.csr
+        in_degrees = {}
+        out_degrees = {}
+        for i in node_ids:
+            name = csr.nodes[i]
+            in_degrees[name] = int(allowed[csr.predecessor_ids(i)].sum())
+            out_degrees[name] = int(allowed[csr.successor_ids(i)].sum())
+        return in_degrees, out_degrees
     
     def expand_with_dependencies(self, core_nodes: List[str], max_expansion: int = 30) -> List[str]:
         """
@@ -72,7 +154,7 @@ class DomainKnowledgeGraph:
         
         # 強制加入起點與終點
         for n in self.PRIORITY_SOURCES + self.PRIORITY_SINKS:
-            if n in self.graph:
+            if n in self.csr:
                 expanded.add(n)
         
         # 如果核心節點太多，只取前 N 個進行擴展
@@ -87,14 +169,15 @@ class DomainKnowledgeGraph:
         
         while to_process and expansion_count < max_expansions:
             n = to_process.pop()
-            if n in self.graph:
+            i = self.csr.node_index.get(n)
+            if i is not None:
                 # 只擴展直接前置（最多1個）
-                for p in list(self.graph.predecessors(n))[:1]:
+                for p in self.csr.names(self.csr.predecessor_ids(i)[:1]):
                     if p not in expanded and expansion_count < max_expansions:
                         expanded.add(p)
                         expansion_count += 1
                 # 只擴展直接後繼（最多1個）
-                for s in list(self.graph.successors(n))[:1]:
+                for s in self.csr.names(self.csr.successor_ids(i)[:1]):
                     if s not in expanded and expansion_count < max_expansions:
                         expanded.add(s)
                         expansion_count += 1
@@ -121,9 +204,10 @@ class DomainKnowledgeGraph:
         if len(nodes) == 1:
             return nodes
         
-        subgraph = self.graph.subgraph(nodes)
-        in_degrees = dict(subgraph.in_degree())
-        out_degrees = dict(subgraph.out_degree())
+        csr = self.csr
+        allowed = csr.mask(nodes)
+        node_ids = np.flatnonzero(allowed)
+        in_degrees, out_degrees = self._subgraph_degrees(node_ids, allowed)
         
         # 1. 強制優先級起點
         sources = [n for n in self.PRIORITY_SOURCES if n in in_degrees]
@@ -153,12 +237,13 @@ class DomainKnowledgeGraph:
             essential_nodes = set(core_nodes)
             # 添加與核心節點直接相連的節點
             for core_node in list(core_nodes)[:20]:  # 只處理前20個核心節點
-                if core_node in subgraph:
+                i = csr.node_index.get(core_node)
+                if i is not None and allowed[i]:
                     # 添加直接前置和後繼
-                    for pred in list(subgraph.predecessors(core_node))[:3]:
-                        essential_nodes.add(pred)
-                    for succ in list(subgraph.successors(core_node))[:3]:
-                        essential_nodes.add(succ)
+                    preds = csr.predecessor_ids(i)
+                    succs = csr.successor_ids(i)
+                    essential_nodes.update(csr.names(preds[allowed[preds]][:3]))
+                    essential_nodes.update(csr.names(succs[allowed[succs]][:3]))
             
             # 添加起點和終點
             essential_nodes.update(sources)
@@ -172,7 +257,7 @@ class DomainKnowledgeGraph:
             
             print(f"   - Filtered to {len(essential_nodes_list)} essential nodes")
             # 使用過濾後的節點重新構建子圖
-            subgraph = self.graph.subgraph(essential_nodes_list)
+            allowed = csr.mask(essential_nodes_list)
             nodes = essential_nodes_list
         
         # 限制路徑搜索的深度和數量
@@ -184,19 +269,21 @@ class DomainKnowledgeGraph:
             for sink in sinks[:2]:  # 只檢查前2個終點
                 if source == sink:
                     continue
-                try:
-                    # 限制路徑長度和數量
-                    paths = nx.all_simple_paths(subgraph, source, sink, cutoff=max_path_length)
-                    for path in paths:
-                        if path_count >= max_paths_to_check:
-                            break
-                        path_count += 1
-                        coverage = len(set(path) & core_nodes) / len(core_nodes) if core_nodes else 0
-                        if len(path) > len(longest_path) or (len(path) == len(longest_path) and coverage > best_coverage):
-                            longest_path = path
-                            best_coverage = coverage
-                except (nx.NetworkXNoPath, nx.NetworkXError):
+                source_id = csr.node_index.get(source)
+                sink_id = csr.node_index.get(sink)
+                if source_id is None or sink_id is None or not (allowed[source_id] and allowed[sink_id]):
                     continue
+                # 限制路徑長度和數量
+                paths = csr.iter_simple_paths(source_id, sink_id, allowed, cutoff=max_path_length)
+                for path_ids in paths:
+                    if path_count >= max_paths_to_check:
+                        break
+                    path_count += 1
+                    path = csr.names(path_ids)
+                    coverage = len(set(path) & core_nodes) / len(core_nodes) if core_nodes else 0
+                    if len(path) > len(longest_path) or (len(path) == len(longest_path) and coverage > best_coverage):
+                        longest_path = path
+                        best_coverage = coverage
                 if path_count >= max_paths_to_check:
                     break
             if path_count >= max_paths_to_check:
@@ -207,16 +294,9 @@ class DomainKnowledgeGraph:
             print(" - No simple path. Using DAG topological sort with core nodes only...")
             # 只使用核心節點構建子圖
             if core_nodes:
-                core_subgraph = subgraph.subgraph(core_nodes | set(sources) | set(sinks))
-                H = nx.DiGraph(core_subgraph)
-                while not nx.is_directed_acyclic_graph(H) and len(H.edges()) > 0:
-                    try:
-                        cycle = nx.find_cycle(H)
-                        H.remove_edge(cycle[0][0], cycle[0][1])
-                    except:
-                        break
+                topo_ids = self.order_by_condensation(core_nodes | set(sources) | set(sinks), allowed)
                 try:
-                    topo_nodes = list(nx.topological_sort(H))
+                    topo_nodes = csr.names(topo_ids)
                     # 確保起點在前，終點在後
                     if sources and sinks:
                         # 重新排序：起點 -> 中間節點 -> 終點
@@ -247,10 +327,10 @@ class DomainKnowledgeGraph:
                     prev = longest_path[i-1]
                     next_node = longest_path[i+1]
                     # 必須有連接
-                    has_connection = (self.graph.has_edge(prev, node) and self.graph.has_edge(node, next_node))
+                    has_connection = (csr.has_edge(prev, node) and csr.has_edge(node, next_node))
                     # 必須是核心節點的鄰居（直接相連）
                     is_core_neighbor = any(
-                        self.graph.has_edge(node, core) or self.graph.has_edge(core, node)
+                        csr.has_edge(node, core) or csr.has_edge(core, node)
                         for core in core_nodes
                     )
                     if has_connection and is_core_neighbor:
@@ -281,10 +361,21 @@ class ModuleAwareWorkflowComposer:
     """
     模組感知的工作流程組合器
     
-    使用 A* 算法在知識圖中生成多個候選工作流程。
+    使用 A* 算法在知識圖中生成多個候選工作流程（邊成本可由 MF 轉換分數導出）。
     """
     
-    def __init__(self, domain_graph: DomainKnowledgeGraph, search_agent, ontology: Dict):
+    def __init__(
+        self,
+        domain_graph: DomainKnowledgeGraph,
+        search_agent,
+        ontology: Dict,
+        transition_scorer=None,
+        max_expansions: int = 5000,
+        max_path_nodes: int = 10,
+        length_cost: float = 0.1,
+        mf_weight: float = 0.5,
+        miss_penalty: float = 2.0
+    ):
         """
         初始化組合器
         
@@ -292,11 +383,24 @@ class ModuleAwareWorkflowComposer:
             domain_graph: 領域知識圖
             search_agent: 搜索代理（用於獲取匹配的節點）
             ontology: Ontology 字典
+            transition_scorer: A* 邊成本使用的 MF 轉換評分器（可選，None 表示單位成本）
+            max_expansions: 每次 A* 搜索最多展開的狀態數
+            max_path_nodes: 候選路徑最多包含的節點數
+            length_cost: 每條邊的固定成本（偏好較短路徑）
+            mf_weight: MF 轉換分數在邊成本中的權重
+            miss_penalty: 每個未覆蓋關鍵節點的懲罰
         """
-        self.graph = domain_graph.graph
+        self.csr = domain_graph.csr
         self.domain_graph = domain_graph
         self.search_agent = search_agent
         self.ontology = ontology
+        self.transition_scorer = transition_scorer
+        self.max_expansions = max(1, int(max_expansions))
+        self.max_path_nodes = max(2, int(max_path_nodes))
+        self.length_cost = float(length_cost)
+        self.mf_weight = float(mf_weight)
+        self.miss_penalty = float(miss_penalty)
+        self.last_search_stats = {}
     
     def compose(
         self,
@@ -353,7 +457,7 @@ class ModuleAwareWorkflowComposer:
                 nodes_in_module = list(priority_nodes) + other_nodes[:40-len(priority_nodes)]
             
             # 呼叫 A* 搜索，但限制 top_k=5 以避免性能問題
-            possible_candidates = self._astar_in_subgraph(nodes_in_module, entry, top_k=5)
+            possible_candidates = self._find_candidate_paths(nodes_in_module, entry, top_k=5)
             
             for rank, cand_data in enumerate(possible_candidates):
                 path = cand_data['path']
@@ -440,7 +544,7 @@ class ModuleAwareWorkflowComposer:
         
         # Step 1: 如果提供了選定的 trigger，只使用這個
         if selected_trigger:
-            if selected_trigger not in self.graph:
+            if selected_trigger not in self.csr:
                 print(f"   - Warning: Selected trigger {selected_trigger} not found in graph.")
                 return {None: concrete_nodes_list}
             trigger_nodes = [selected_trigger]
@@ -467,7 +571,7 @@ class ModuleAwareWorkflowComposer:
         
         # Step 2: 如果提供了選定的 end node，只使用這個
         if selected_end:
-            if selected_end not in self.graph:
+            if selected_end not in self.csr:
                 print(f"   - Warning: Selected end node {selected_end} not found in graph. Using all nodes as potential ends.")
                 end_nodes = list(concrete_nodes_list)
             else:
@@ -477,8 +581,8 @@ class ModuleAwareWorkflowComposer:
             # 找出所有出度為 0 的節點作為終點
             end_nodes = []
             for node in concrete_nodes_list:
-                if node in self.graph:
-                    if self.graph.out_degree(node) == 0:
+                if node in self.csr:
+                    if self.csr.out_degree(node) == 0:
                         end_nodes.append(node)
             
             # 如果沒有找到出度為 0 的節點，使用常見的終點節點
@@ -495,43 +599,46 @@ class ModuleAwareWorkflowComposer:
             print(f"   - Found {len(end_nodes)} potential end nodes: {end_nodes[:5]}...")
         
         # Step 3: 對每個 trigger 節點，進行雙向 BFS（現在通常只有一個 trigger）
+        csr = self.csr
+        module_mask = csr.mask(all_module_nodes)
+        end_ids = csr.ids(end_nodes)
+        index = self.domain_graph.reachability
+        
+        if index is None:
+            # 反向BFS：從所有終點往前（與 trigger 無關，只計算一次）
+            visited_backward = (
+                csr.reachable(end_ids, allowed=module_mask, reverse=True)
+                if len(end_ids) else np.zeros(len(csr), dtype=bool)
+            )
+        else:
+            # 完整知識圖的可達性是模組內可達性的必要條件：先以 bitset 交集排除不可能的節點
+            module_bits = index.bits(np.flatnonzero(module_mask)) & index.reaching(end_ids)
+        
         for trigger in trigger_nodes:
-            if trigger not in self.graph:
+            if trigger not in csr:
                 continue
+            trigger_id = csr.node_index[trigger]
             
-            # 正向BFS：從 trigger 往後
-            queue = deque([trigger])
-            visited_forward = {trigger}
-            
-            while queue:
-                curr = queue.popleft()
-                for neigh in self.graph.successors(curr):
-                    if neigh in all_module_nodes and neigh not in visited_forward:
-                        visited_forward.add(neigh)
-                        queue.append(neigh)
-            
-            # 反向BFS：從所有終點往前（現在通常只有一個 end node）
-            visited_backward = set()
-            for end_node in end_nodes:  # 不再限制數量，因為已經選定了
-                if end_node not in self.graph:
-                    continue
-                queue = deque([end_node])
-                visited_backward.add(end_node)
-                
-                while queue:
-                    curr = queue.popleft()
-                    for pred in self.graph.predecessors(curr):
-                        if pred in all_module_nodes and pred not in visited_backward:
-                            visited_backward.add(pred)
-                            queue.append(pred)
-            
-            # 取交集：必須同時從 trigger 可達 AND 可達終點
-            reachable_nodes = visited_forward & visited_backward
+            if index is None:
+                # 正向BFS：從 trigger 往後
+                visited_forward = csr.reachable([trigger_id], allowed=module_mask)
+                # 取交集：必須同時從 trigger 可達 AND 可達終點
+                both = visited_forward & visited_backward
+            else:
+                # trigger → 終點路徑上的每個模組節點都必然在交集內，
+                # 因此只在交集內做雙向 BFS 的結果與在整個模組內相同
+                candidate = index.to_mask(module_bits & index.reach_bits[trigger_id])
+                both = (
+                    csr.reachable([trigger_id], allowed=candidate)
+                    & csr.reachable(end_ids, allowed=candidate, reverse=True)
+                )
+            reachable_nodes = set(csr.names(np.flatnonzero(both)))
             
             # 如果交集為空，至少使用正向可達的節點
             if not reachable_nodes:
                 print(f"   - Warning: No nodes reachable from both {trigger} and end nodes. Using forward-reachable nodes.")
-                reachable_nodes = visited_forward
+                visited_forward = csr.reachable([trigger_id], allowed=module_mask)
+                reachable_nodes = set(csr.names(np.flatnonzero(visited_forward)))
             
             # 如果還是為空，使用所有節點
             if not reachable_nodes:
@@ -547,141 +654,262 @@ class ModuleAwareWorkflowComposer:
         
         return entries
     
-    def _astar_in_subgraph(self, nodes, start_node, top_k=5):
+    def set_transition_scorer(self, transition_scorer):
         """
-        在子圖中尋找從 start_node 到潛在終點的【多條】路徑（限制版）
+        設定 A* 邊成本使用的轉換評分器
+        
+        Args:
+            transition_scorer: 提供 get_transition_score(source, target) 的物件
+                               （MatrixFactorizationScorer / ChainRecommender），None 表示單位成本
+        """
+        self.transition_scorer = transition_scorer
+    
+    def _edge_cost(self, source: str, target: str) -> float:
+        """
+        邊成本：length_cost + mf_weight * (1 - MF 轉換分數)
+        
+        MF 分數先修剪到 [0, 1]，因此成本範圍為 [length_cost, length_cost + mf_weight]；
+        沒有評分器時所有邊成本均為 length_cost。
+        """
+        cost = self.length_cost
+        if self.transition_scorer is not None and self.mf_weight > 0:
+            score = self.transition_scorer.get_transition_score(source, target)
+            cost += self.mf_weight * (1.0 - max(0.0, min(1.0, float(score))))
+        return cost
+    
+    def _prepare_search_space(self, nodes, start_node) -> Optional[Dict]:
+        """
+        準備候選子圖的路徑搜索空間（A* 與 beam search 共用）
         
         Args:
             nodes: 候選節點列表
             start_node: 起始節點
-            top_k: 返回前 k 個最佳候選（預設 5，避免性能問題）
         
         Returns:
-            candidates: 候選路徑列表，每個包含 path, score, coverage_count 等
+            space: {sub_ids, node_set, successors, potential_ends, required_bits, can_reach_end}，
+                   沒有可用終點時返回 None
         """
-        if not nodes or not start_node or start_node not in nodes:
-            return []
-        
-        # 建立子圖 (只包含候選節點，確保路徑只走這些點)
-        subgraph = self.graph.subgraph(nodes)
+        csr = self.csr
+        sub_ids = csr.ids(nodes)
+        sub_mask = np.zeros(len(csr), dtype=bool)
+        sub_mask[sub_ids] = True
+        node_set = set(csr.names(sub_ids))
         
-        # 確定潛在終點（n8n 版本：使用出度為 0 的節點）
-        potential_ends = set()
+        # 子圖鄰接表（只走候選節點之間的邊）
+        successors = {
+            csr.nodes[i]: csr.names(succ_ids)
+            for i, succ_ids in csr.induced_successors(sub_ids).items()
+        }
         
-        # 加入所有出度為 0 的節點作為備選終點
-        for n in nodes:
-            if subgraph.out_degree(n) == 0:
-                potential_ends.add(n)
+        # 確定潛在終點（n8n 版本：使用子圖中出度為 0 的節點）
+        potential_ends = set(n for n in node_set if not successors[n])
         
         # 如果沒有找到，使用常見的終點節點
         if not potential_ends:
             common_ends = ['noOp', 'stopAndError', 'emailSend', 'respondToWebhook', 'googleCalendar']
-            for n in nodes:
+            for n in node_set:
                 if any(end in n for end in common_ends):
                     potential_ends.add(n)
+        potential_ends.discard(start_node)
         
         if not potential_ends:
             print(" - Warning: No valid end nodes identified.")
-            return []
+            return None
         
-        # 定義關鍵節點 (Critical Nodes) - 使用指定的5個節點
-        critical_nodes = [
-            'n8n-nodes-base.httpRequest',
-            '@n8n/n8n-nodes-langchain.agent',
-            'n8n-nodes-base.set',
-            'n8n-nodes-base.code',
-            'n8n-nodes-base.if'
-        ]
+        # 關鍵節點 (Critical Nodes) - 與 ChainRecommender 排序共用同一組
         required_nodes_in_subgraph = [
             n for n in nodes 
-            if n in critical_nodes
+            if n in CRITICAL_NODE_TYPES
             and n != start_node 
             and n not in potential_ends
         ]
         print(f" - Target Critical Nodes ({len(required_nodes_in_subgraph)}): {required_nodes_in_subgraph[:5]}...")
+        required_bits = {n: 1 << i for i, n in enumerate(required_nodes_in_subgraph)}
+        
+        # 反向 BFS：只保留能到達終點的節點，其餘節點不可能出現在候選路徑上
+        can_reach_end = set(csr.names(np.flatnonzero(
+            csr.reachable(csr.ids(potential_ends), allowed=sub_mask, reverse=True)
+        )))
+        
+        # 到任一終點的最少跳數（完整知識圖的跳數是子圖跳數的下界；未完成的路徑至少還要走 1 跳）
+        index = self.domain_graph.reachability
+        if index is not None:
+            hops = index.hops_to_any(csr.ids(potential_ends))
+            min_hops = {n: max(1, int(hops[csr.node_index[n]])) for n in can_reach_end}
+        else:
+            min_hops = dict.fromkeys(can_reach_end, 1)
+        
+        return {
+            'sub_ids': sub_ids,
+            'node_set': node_set,
+            'successors': successors,
+            'potential_ends': potential_ends,
+            'required_bits': required_bits,
+            'can_reach_end': can_reach_end,
+            'min_hops': min_hops
+        }
+    
+    def _topological_fallback(self, space: Dict, start_node: str) -> Optional[Dict]:
+        """
+        沒有連通路徑時的備案：子圖（無環時）拓撲序中從 start_node 開始的前 15 個節點
         
-        candidates = []
+        Returns:
+            candidate: 候選路徑，子圖有環或不包含 start_node 時返回 None
+        """
+        print(" - No connected path found via graph traversal. Attempting topological sort fallback.")
+        topo_ids = self.csr.topological_sort(space['sub_ids'])
+        if topo_ids is None:
+            return None
+        topo_path = self.csr.names(topo_ids)
+        if start_node not in topo_path:
+            return None
+        valid_topo = topo_path[topo_path.index(start_node):]
+        # 限制拓撲排序路徑長度
+        if len(valid_topo) > 15:
+            valid_topo = valid_topo[:15]
+        return {
+            'path': valid_topo,
+            'score': 0,
+            'cost': float('inf'),
+            'coverage': [],
+            'coverage_count': 0,
+            'length': len(valid_topo)
+        }
+    
+    def _find_candidate_paths(self, nodes, start_node, top_k=5) -> List[Dict]:
+        """
+        在候選子圖中尋找從 start_node 出發的候選路徑（子類別可替換搜索引擎）
         
-        # 限制：只檢查前 1 個終點，避免組合爆炸（進一步限制）
-        checked_ends = list(potential_ends)[:1]
+        Returns:
+            candidates: 候選路徑列表
+        """
+        return self._astar_in_subgraph(nodes, start_node, top_k=top_k)
+    
+    def _astar_in_subgraph(self, nodes, start_node, top_k=5):
+        """
+        在候選子圖中以 A* 搜索從 start_node 到潛在終點的 top-k 條最低成本簡單路徑
         
-        # 使用 NetworkX 尋找簡單路徑（嚴格限制深度和數量）
-        for end_node in checked_ends:
-            if start_node == end_node:
-                continue
+        路徑成本 = Σ 邊成本（見 _edge_cost）+ miss_penalty × 未覆蓋的關鍵節點數，
+        搜索狀態為 (節點, 已覆蓋關鍵節點集合)。啟發函數
+        h = max(最小邊成本 × 到終點的最少跳數, 未覆蓋數 × min(最小邊成本, miss_penalty))
+        不會高估剩餘成本（每覆蓋一個關鍵節點至少要走一條邊，否則付出懲罰；
+        完整知識圖的跳數是子圖跳數的下界，沒有可達性索引時以 1 跳計），
+        因此完成的路徑依真實成本由小到大彈出。每個狀態最多展開 top_k 次，
+        總展開數受 max_expansions 限制。
+        
+        Args:
+            nodes: 候選節點列表
+            start_node: 起始節點
+            top_k: 返回前 k 個最佳候選（預設 5）
+        
+        Returns:
+            candidates: 候選路徑列表，每個包含 path, score, cost, coverage_count 等
+        """
+        self.last_search_stats = {}
+        if not nodes or not start_node or start_node not in nodes:
+            return []
+        
+        top_k = top_k or 5
+        space = self._prepare_search_space(nodes, start_node)
+        if space is None:
+            return []
+        csr = self.csr
+        node_set = space['node_set']
+        successors = space['successors']
+        potential_ends = space['potential_ends']
+        required_bits = space['required_bits']
+        can_reach_end = space['can_reach_end']
+        min_hops = space['min_hops']
+        num_required = len(required_bits)
+        
+        candidates = []
+        expansions = 0
+        truncated = False
+        
+        if start_node in can_reach_end:
+            edge_costs = {
+                (u, v): self._edge_cost(u, v)
+                for u in can_reach_end for v in successors[u] if v in can_reach_end
+            }
+            min_edge_cost = min(edge_costs.values()) if edge_costs else 0.0
+            per_missing_bound = min(min_edge_cost, self.miss_penalty)
             
-            try:
-                # 進一步限制路徑深度為 6（減少搜索空間）
-                # 使用 generator 並立即限制，避免生成太多路徑
-                raw_paths = nx.all_simple_paths(self.graph, start_node, end_node, cutoff=6)
-                
-                path_count = 0
-                max_paths_per_end = 10  # 大幅減少：每個終點最多檢查 10 條路徑
+            def heuristic(node: str, mask: int) -> float:
+                missing = num_required - bin(mask).count("1")
+                return max(min_edge_cost * min_hops[node], missing * per_missing_bound)
+            
+            # 堆積項目：(f, g, 序號, 節點, 覆蓋 mask, 路徑, 是否已完成)
+            counter = 0
+            heap = [(heuristic(start_node, 0), 0.0, counter, start_node, 0, (start_node,), False)]
+            expanded_per_state: Dict[Tuple[str, int], int] = {}
+            
+            while heap and len(candidates) < top_k:
+                f, g, _, node, mask, path, done = heapq.heappop(heap)
                 
-                for path in raw_paths:
-                    if path_count >= max_paths_per_end:
-                        break
-                    
-                    # 過濾：確保路徑只經過候選節點
-                    if not all(n in nodes or n == end_node for n in path):
-                        continue
-                    
-                    # 限制路徑長度（避免過長的路徑）
-                    if len(path) > 10:
-                        continue
-                    
-                    # 計算分數
-                    coverage = set(path) & set(required_nodes_in_subgraph)
-                    score = len(coverage) * 2.0 - (len(path) * 0.1)
-                    
+                if done:
+                    coverage = [n for n in path if n in required_bits]
                     candidates.append({
-                        'path': path,
-                        'score': score,
-                        'coverage': list(coverage),
+                        'path': list(path),
+                        'score': self.miss_penalty * len(coverage) - g,
+                        'cost': f,
+                        'coverage': coverage,
                         'coverage_count': len(coverage),
                         'length': len(path)
                     })
-                    path_count += 1
-                    
-                    # 如果已經有足夠的候選，提前退出
-                    if len(candidates) >= top_k * 2:  # 收集比需要的多一點，以便排序
-                        break
-                        
-            except nx.NetworkXNoPath:
-                continue
-            except Exception as e:
-                print(f"   - Error finding paths to {end_node}: {e}")
-                continue
+                    continue
+                
+                state = (node, mask)
+                if expanded_per_state.get(state, 0) >= top_k:
+                    continue
+                if expansions >= self.max_expansions:
+                    truncated = True
+                    break
+                expanded_per_state[state] = expanded_per_state.get(state, 0) + 1
+                expansions += 1
+                
+                if len(path) >= self.max_path_nodes:
+                    continue
+                
+                for neigh in successors[node]:
+                    if neigh not in can_reach_end or neigh in path:
+                        continue
+                    new_g = g + edge_costs[(node, neigh)]
+                    new_mask = mask | required_bits.get(neigh, 0)
+                    new_path = path + (neigh,)
+                    if neigh in potential_ends:
+                        missing = num_required - bin(new_mask).count("1")
+                        counter += 1
+                        heapq.heappush(heap, (
+                            new_g + missing * self.miss_penalty, new_g, counter,
+                            neigh, new_mask, new_path, True
+                        ))
+                    # 剩餘跳數已不可能在 max_path_nodes 內到達終點時不再延伸
+                    if successors[neigh] and len(new_path) + min_hops[neigh] <= self.max_path_nodes:
+                        counter += 1
+                        heapq.heappush(heap, (
+                            new_g + heuristic(neigh, new_mask), new_g, counter,
+                            neigh, new_mask, new_path, False
+                        ))
+        
+        self.last_search_stats = {
+            'subgraph_nodes': len(node_set),
+            'reachable_nodes': len(can_reach_end),
+            'expansions': expansions,
+            'truncated': truncated
+        }
+        if truncated:
+            print(f"   ⚠️  A* expansion limit reached ({self.max_expansions}), returning best paths found so far.")
         
         # Fallback: 拓樸排序 (如果沒有連通路徑)
         if not candidates:
-            print(" - No connected path found via graph traversal. Attempting topological sort fallback.")
-            try:
-                topo_path = list(nx.topological_sort(subgraph))
-                if start_node in topo_path:
-                    start_idx = topo_path.index(start_node)
-                    valid_topo = topo_path[start_idx:]
-                    # 限制拓撲排序路徑長度
-                    if len(valid_topo) > 15:
-                        valid_topo = valid_topo[:15]
-                    candidates.append({
-                        'path': valid_topo,
-                        'score': 0,
-                        'coverage': [],
-                        'coverage_count': 0,
-                        'length': len(valid_topo)
-                    })
-            except nx.NetworkXUnfeasible:
-                pass
-        
-        # 排序：優先覆蓋率高，其次路徑短
-        candidates.sort(key=lambda x: (x['score'], -x['length']), reverse=True)
+            fallback = self._topological_fallback(space, start_node)
+            if fallback is not None:
+                candidates.append(fallback)
         
-        # 限制返回數量
-        final_result = candidates[:top_k] if top_k else candidates[:5]  # 預設最多 5 個
+        final_result = candidates[:top_k]
         
         if final_result:
-            print(f" - Found {len(candidates)} total valid paths. Returning {len(final_result)} candidates.")
+            print(f" - Found {len(candidates)} valid paths ({expansions} A* expansions). Returning {len(final_result)} candidates.")
             for i, c in enumerate(final_result):
                 path_preview = ' -> '.join(c['path'][:3]) + ('...' if len(c['path']) > 3 else '')
                 print(f"   Option {i+1}: {path_preview} (Score: {c['score']:.2f}, Coverage: {c['coverage_count']}, Length: {c['length']})")
@@ -689,4 +917,3 @@ class ModuleAwareWorkflowComposer:
             print(f" - No valid paths found from {start_node} to any end nodes.")
         
         return final_result
-
@@ -5,8 +5,22 @@
 適配 ChainRecommender 類，使用預訓練的矩陣分解模型進行評分和排序。
 """
 
-from typing import List, Dict, Optional
-from .matrix_factorization_scorer import MatrixFactorizationScorer
+import logging
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+from .matrix_factorization_scorer import MatrixFactorizationScorer, UNKNOWN_INDEX
+
+
+# 關鍵節點類型（Critical Nodes）：候選路徑覆蓋越多越好，路徑搜索與排序共用
+CRITICAL_NODE_TYPES = (
+    'n8n-nodes-base.httpRequest',
+    '@n8n/n8n-nodes-langchain.agent',
+    'n8n-nodes-base.set',
+    'n8n-nodes-base.code',
+    'n8n-nodes-base.if'
+)
 
 
 class ChainRecommender:
@@ -14,19 +28,53 @@ class ChainRecommender:
     鏈推薦器
     
     使用預訓練的矩陣分解模型對候選工作流程進行評分和排序。
+    
+    輸出分級：log_level <= logging.INFO 時輸出排序摘要，<= logging.DEBUG 時逐筆輸出排名；
+    大量批次排序時設為 logging.WARNING 即可完全靜音。
     """
     
-    def __init__(self, model_dir: str, use_type_model: bool = True):
+    def __init__(
+        self,
+        model_dir: str,
+        use_type_model: bool = True,
+        scoring_mode: str = 'dense',
+        row_cache_size: int = 256,
+        top_k_cache: int = 32,
+        log_level: int = logging.INFO,
+        mapping: Optional[Dict] = None
+    ):
         """
         初始化推薦器
         
         Args:
             model_dir: 預訓練模型目錄路徑
             use_type_model: 是否使用 type_to_type 模型（True）或 name_to_name 模型（False）
+            scoring_mode: 'dense'（完整預測矩陣）或 'factorized'（P/Q 即時計算，近似）
+            row_cache_size: factorized 模式下快取的熱門源節點分數列數量
+            top_k_cache: 每個源節點預先計算的 top-K 轉換數量（0 表示停用）
+            log_level: 排序輸出的日誌級別（DEBUG 逐筆輸出，INFO 只輸出摘要，WARNING 以上靜音）
+            mapping: 已載入的 type_type_mapping.json 內容（可選，例如來自 orchestrator snapshot）
         """
         self.model_dir = model_dir
         self.use_type_model = use_type_model
-        self.scorer = MatrixFactorizationScorer(model_dir)
+        self.scorer = MatrixFactorizationScorer(
+            model_dir,
+            mode=scoring_mode,
+            row_cache_size=row_cache_size,
+            top_k_cache=top_k_cache,
+            mapping=mapping
+        )
+        self.log_level = log_level
+        
+        # Critical node mask（MF 詞彙表上的布林陣列）；不在詞彙表中的關鍵節點另外以名稱比對
+        self.critical_mask = np.zeros(len(self.scorer.node_types), dtype=bool)
+        for node_type in CRITICAL_NODE_TYPES:
+            idx = self.scorer.node_type_to_index.get(node_type)
+            if idx is not None:
+                self.critical_mask[idx] = True
+        self._unindexed_critical = frozenset(
+            t for t in CRITICAL_NODE_TYPES if t not in self.scorer.node_type_to_index
+        )
     
     def score_chain(self, chain: List[str], verbose: bool = False) -> float:
         """
@@ -58,16 +106,23 @@ class ChainRecommender:
         candidates_list: List[Dict],
         strategy: str = 'average',
         min_score: float = 0.0,
-        critical_node_weight: float = 0.5
+        critical_node_weight: float = 0.5,
+        top_k: Optional[int] = None,
+        log_level: Optional[int] = None
     ) -> List[Dict]:
         """
         [IMPROVED] 混合 MF 分數與 Critical Node 覆蓋率進行排序。
         
+        所有候選一次編碼為索引陣列，MF 分數、覆蓋數與混合分數皆以向量運算計算；
+        只有最後返回的候選才會被複製並加上分數欄位。
+        
         Args:
             candidates_list: 候選列表，每個元素是包含 'path' 鍵的字典
             strategy: 評分策略
             min_score: 最小分數閾值
             critical_node_weight: Critical Node 覆蓋率的權重（預設 0.5）
+            top_k: 只返回前 k 個（以部分排序選出；None 表示全部）
+            log_level: 本次呼叫的日誌級別（None 表示使用 self.log_level）
         
         Returns:
             ranked_candidates: 排序後的候選列表，每個元素添加了多個分數欄位
@@ -75,72 +130,166 @@ class ChainRecommender:
         if not candidates_list:
             return []
         
-        print(f"\n[Scoring] Running MF scoring with Critical Node awareness...")
+        log_level = self.log_level if log_level is None else log_level
+        if log_level <= logging.INFO:
+            print(f"\n[Scoring] Running MF scoring with Critical Node awareness...")
         
-        # === 定義 Critical Nodes ===
-        critical_nodes = [
-            'n8n-nodes-base.httpRequest',
-            '@n8n/n8n-nodes-langchain.agent',
-            'n8n-nodes-base.set',
-            'n8n-nodes-base.code',
-            'n8n-nodes-base.if'
-        ]
+        # 跳過沒有路徑的候選
+        kept = [i for i, c in enumerate(candidates_list) if c.get('path')]
+        if not kept:
+            return []
+        scores = self._score_paths(
+            [candidates_list[i]['path'] for i in kept],
+            [candidates_list[i].get('metadata', {}).get('coverage_count', -1) for i in kept],
+            strategy,
+            critical_node_weight
+        )
+        scored_candidates = self._select_ranked(candidates_list, kept, scores, min_score, top_k)
         
-        scored_candidates = []
-        for candidate in candidates_list:
-            chain_path = candidate.get('path', [])
-            
-            if not chain_path:
-                continue
-            
-            # 1. MF 分數 (0.0 ~ 1.0)
-            mf_score = self.scorer.score_chain(chain_path, strategy=strategy)
-            
-            # 如果分數低於閾值，跳過
-            if mf_score < min_score:
-                continue
-            
-            # 2. 計算 Critical Node 覆蓋率
-            # 檢查路徑中有多少節點是 critical nodes
-            critical_nodes_in_path = [
-                n for n in chain_path 
-                if n in critical_nodes
-            ]
-            
-            # 從 metadata 獲取原始 coverage 資訊（如果有的話）
-            metadata = candidate.get('metadata', {})
-            coverage_count = metadata.get('coverage_count', len(critical_nodes_in_path))
-            
-            # 正規化覆蓋率（假設最多 5 個 critical nodes）
-            max_critical = len(critical_nodes)
-            coverage_score = min(1.0, coverage_count / max_critical)
-            
-            # 3. 混合分數
-            # 如果沒有覆蓋任何 critical node，給予懲罰
-            if coverage_count == 0:
-                penalty = 0.5  # 嚴重懲罰
-                combined_score = mf_score * (1 - penalty)
-            else:
-                combined_score = (1 - critical_node_weight) * mf_score + critical_node_weight * coverage_score
-            
-            candidate_copy = candidate.copy()
-            candidate_copy['mf_score'] = mf_score
-            candidate_copy['coverage_count'] = coverage_count
-            candidate_copy['coverage_score'] = coverage_score
-            candidate_copy['final_combined_score'] = combined_score
-            
-            scored_candidates.append(candidate_copy)
+        # 5. 詳細輸出
+        if log_level <= logging.DEBUG:
+            print(f"[Scoring] Ranking results:")
+            for i, c in enumerate(scored_candidates):
+                print(f"  #{i+1}: MF={c['mf_score']:.2f}, Coverage={c['coverage_count']}, Combined={c['final_combined_score']:.2f}")
+                path_preview = ' -> '.join(c['path'][:3]) + ('...' if len(c['path']) > 3 else '')
+                print(f"       Path: {path_preview}")
+        elif log_level <= logging.INFO and scored_candidates:
+            best = scored_candidates[0]
+            print(f"[Scoring] Ranked {len(scored_candidates)}/{len(candidates_list)} candidates "
+                  f"(best: MF={best['mf_score']:.2f}, Coverage={best['coverage_count']}, "
+                  f"Combined={best['final_combined_score']:.2f})")
         
-        # 4. 依照混合分數排序
-        scored_candidates.sort(key=lambda x: x['final_combined_score'], reverse=True)
+        return scored_candidates
+    
+    def rank_candidates_batch(
+        self,
+        candidates_lists: List[List[Dict]],
+        strategy: str = 'average',
+        min_score: float = 0.0,
+        critical_node_weight: float = 0.5,
+        top_k: Optional[int] = None,
+        log_level: Optional[int] = None
+    ) -> List[List[Dict]]:
+        """
+        對多組候選（例如多個查詢各自的候選）排序
         
-        # 5. 詳細輸出
-        print(f"[Scoring] Ranking results:")
-        for i, c in enumerate(scored_candidates):
-            print(f"  #{i+1}: MF={c['mf_score']:.2f}, Coverage={c['coverage_count']}, Combined={c['final_combined_score']:.2f}")
-            path_preview = ' -> '.join(c['path'][:3]) + ('...' if len(c['path']) > 3 else '')
-            print(f"       Path: {path_preview}")
+        所有組的路徑合併成一個索引陣列，只做一次向量化評分，再各組分別選出排名；
+        每組的結果與單獨呼叫 rank_candidates 相同。
+        
+        Args:
+            candidates_lists: 候選列表的列表
+            strategy / min_score / critical_node_weight / top_k / log_level: 同 rank_candidates
         
+        Returns:
+            ranked_lists: 與輸入順序對應的排序結果
+        """
+        log_level = self.log_level if log_level is None else log_level
+        kept_lists = [[i for i, c in enumerate(cands or []) if c.get('path')] for cands in candidates_lists]
+        paths, metadata_counts = [], []
+        for cands, kept in zip(candidates_lists, kept_lists):
+            paths.extend(cands[i]['path'] for i in kept)
+            metadata_counts.extend(cands[i].get('metadata', {}).get('coverage_count', -1) for i in kept)
+        if not paths:
+            return [[] for _ in candidates_lists]
+        
+        scores = self._score_paths(paths, metadata_counts, strategy, critical_node_weight)
+        
+        ranked_lists = []
+        start = 0
+        for cands, kept in zip(candidates_lists, kept_lists):
+            stop = start + len(kept)
+            group_scores = tuple(array[start:stop] for array in scores)
+            ranked_lists.append(self._select_ranked(cands, kept, group_scores, min_score, top_k) if kept else [])
+            start = stop
+        
+        if log_level <= logging.INFO:
+            print(f"[Scoring] Ranked {len(paths)} candidates across {len(candidates_lists)} queries in one pass")
+        return ranked_lists
+    
+    def _score_paths(
+        self,
+        paths: List[List[str]],
+        metadata_counts: List[float],
+        strategy: str,
+        critical_node_weight: float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        一次計算所有路徑的 MF 分數、Critical Node 覆蓋數、覆蓋率與混合分數
+        
+        Args:
+            paths: 路徑列表
+            metadata_counts: 候選 metadata 中的 coverage_count（沒有時為 -1）
+            strategy: 評分策略
+            critical_node_weight: Critical Node 覆蓋率的權重
+        
+        Returns:
+            (mf_scores, coverage_counts, coverage_scores, combined_scores)
+        """
+        # 1. MF 分數 (0.0 ~ 1.0)
+        index_array, lengths = self.scorer.encode_chains(paths)
+        mf_scores = self.scorer.score_index_batch(index_array, lengths, [strategy])[strategy]
+        
+        # 2. 計算 Critical Node 覆蓋率（填充與未知節點的索引為 UNKNOWN_INDEX）
+        known = index_array != UNKNOWN_INDEX
+        in_path = (self.critical_mask[np.where(known, index_array, 0)] & known).sum(axis=1)
+        if self._unindexed_critical:
+            in_path += np.array([sum(n in self._unindexed_critical for n in path) for path in paths])
+        
+        # 從 metadata 獲取原始 coverage 資訊（如果有的話）
+        metadata_counts = np.asarray(metadata_counts, dtype=np.float64)
+        coverage_counts = np.where(metadata_counts >= 0, metadata_counts, in_path)
+        
+        # 正規化覆蓋率（假設最多 5 個 critical nodes）
+        coverage_scores = np.minimum(1.0, coverage_counts / len(CRITICAL_NODE_TYPES))
+        
+        # 3. 混合分數：如果沒有覆蓋任何 critical node，給予嚴重懲罰 (0.5)
+        combined_scores = np.where(
+            coverage_counts == 0,
+            mf_scores * 0.5,
+            (1 - critical_node_weight) * mf_scores + critical_node_weight * coverage_scores
+        )
+        return mf_scores, coverage_counts, coverage_scores, combined_scores
+    
+    @staticmethod
+    def _select_ranked(
+        candidates_list: List[Dict],
+        kept: List[int],
+        scores: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray],
+        min_score: float,
+        top_k: Optional[int]
+    ) -> List[Dict]:
+        """
+        依混合分數選出排名（低於閾值的跳過；top_k 時先以 argpartition 找出第 k 名分數再排序），
+        同分時保留輸入順序，結果等同完整穩定排序後取前 top_k；
+        只有返回的候選才會被複製並加上分數欄位
+        """
+        mf_scores, coverage_counts, coverage_scores, combined_scores = scores
+        
+        # 4. 依照混合分數排序
+        eligible = np.flatnonzero(mf_scores >= min_score)
+        if top_k is not None and top_k < eligible.size:
+            top_k = max(int(top_k), 0)
+            if top_k:
+                values = combined_scores[eligible]
+                kth = -np.partition(-values, top_k - 1)[top_k - 1]
+                # 第 k 名的同分者只取輸入順序最前面的幾個，避免 argpartition 任意挑選
+                above = values > kth
+                ties = np.flatnonzero(values == kth)[:top_k - int(above.sum())]
+                above[ties] = True
+                eligible = eligible[above]
+            else:
+                eligible = eligible[:0]
+        order = eligible[np.argsort(-combined_scores[eligible], kind='stable')]
+        
+        scored_candidates = []
+        for row in order:
+            candidate_copy = candidates_list[kept[row]].copy()
+            coverage_count = coverage_counts[row]
+            candidate_copy['mf_score'] = float(mf_scores[row])
+            candidate_copy['coverage_count'] = int(coverage_count) if coverage_count.is_integer() else float(coverage_count)
+            candidate_copy['coverage_score'] = float(coverage_scores[row])
+            candidate_copy['final_combined_score'] = float(combined_scores[row])
+            scored_candidates.append(candidate_copy)
         return scored_candidates
     
     def batch_score_chains(self, list_of_chains: List[List[str]]) -> List[Dict]:
@@ -157,13 +306,12 @@ class ChainRecommender:
         print(f"執行批次評分 (共 {len(list_of_chains)} 條)")
         print(f"==========================================")
         
-        results = []
-        for chain in list_of_chains:
-            score = self.score_chain(chain, verbose=False)
-            results.append({
-                "chain": chain,
-                "score": score
-            })
+        # 一次以批次 API 計算所有鏈的平均分數
+        scores = self.scorer.score_chains(list_of_chains, strategies=['average'])['average']
+        results = [
+            {"chain": chain, "score": float(score)}
+            for chain, score in zip(list_of_chains, scores)
+        ]
         
         # 按分數降序排序
         results.sort(key=lambda x: x['score'], reverse=True)
@@ -199,4 +347,17 @@ class ChainRecommender:
             top_transitions: [(target, score), ...]
         """
         return self.scorer.get_top_transitions(source, top_k)
+    
+    def get_top_transitions_batch(self, sources: List[str], top_k: int = 10) -> Dict[str, List[tuple]]:
+        """
+        批次獲取多個節點出發的最佳轉換（使用預先計算的 top-K 列表）
+        
+        Args:
+            sources: 源節點類型或名稱列表
+            top_k: 每個源節點返回前 k 個
+        
+        Returns:
+            top_transitions: {source: [(target, score), ...]}
+        """
+        return self.scorer.get_top_transitions_batch(sources, top_k)
 
@@ -3,12 +3,44 @@
 矩陣分解評分器
 
 加載預訓練的 type_to_type 矩陣分解模型，提供鏈評分和候選排序功能。
+
+兩種評分模式：
+- dense: 載入完整的 type_type_prediction_matrix.npy（記憶體隨節點類型數平方成長）
+- factorized: 只以 memmap 載入 type_type_P.npy / type_type_Q.npy，轉換分數以 P[i]·Q[j]
+  即時計算（記憶體隨節點類型數線性成長）。注意保存的預測矩陣並非 P @ Q.T
+  （訓練腳本另外混入了觀測值），factorized 模式的分數是近似值：
+  原始值相關係數約 0.58，修剪到 [0, 1] 後約 0.99。
+
+每個源節點類型的 top-K 轉換列表在載入時以 argpartition 預先計算，
+保存為模型目錄中的 type_type_top_transitions.{mode}.npz（以模型內容雜湊驗證），
+查詢與批次查詢只需陣列切片。
 """
 
+import hashlib
 import numpy as np
 import json
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Tuple, Dict, Optional
+from typing import List, Tuple, Dict, Optional, Sequence
+
+from ..utils.file_loader import atomic_write_bytes
+
+
+# 支援的鏈評分策略
+SCORING_STRATEGIES = ('sum', 'product', 'average', 'geometric_mean', 'min')
+
+# 批次索引陣列中表示「未知節點類型 / 填充」的索引
+UNKNOWN_INDEX = -1
+
+# 支援的評分模式
+SCORING_MODES = ('dense', 'factorized')
+
+# top-K 轉換列表的檔名與格式版本（格式變動時遞增，舊檔會自動重建）
+TOP_TRANSITIONS_FILE = "type_type_top_transitions.{mode}.npz"
+TOP_TRANSITIONS_FORMAT_VERSION = 1
+
+# factorized 模式分塊計算 top-K 時每塊的源節點數（避免建立完整 N×N 矩陣）
+_TOP_K_BLOCK_ROWS = 256
 
 
 class MatrixFactorizationScorer:
@@ -16,18 +48,41 @@ class MatrixFactorizationScorer:
     矩陣分解評分器
     
     使用預訓練的矩陣分解模型對節點類型鏈進行評分。
+    預測矩陣在載入時即修剪到 [0, 1]，批次評分直接以 NumPy fancy indexing 查表。
     """
     
-    def __init__(self, model_dir: str):
+    def __init__(
+        self,
+        model_dir: str,
+        mode: str = 'dense',
+        row_cache_size: int = 256,
+        top_k_cache: int = 32,
+        mapping: Optional[Dict] = None
+    ):
         """
         初始化評分器
         
         Args:
             model_dir: 預訓練模型目錄路徑
+            mode: 評分模式，'dense'（完整預測矩陣）或 'factorized'（P/Q 即時計算，近似）
+            row_cache_size: factorized 模式下快取的熱門源節點分數列數量
+            top_k_cache: 每個源節點預先計算的 top-K 轉換數量（0 表示停用）
+            mapping: 已載入的 type_type_mapping.json 內容（可選，例如來自 orchestrator snapshot）
         """
+        if mode not in SCORING_MODES:
+            raise ValueError(f"未知的評分模式: {mode}（可用: {', '.join(SCORING_MODES)}）")
         self.model_dir = Path(model_dir)
+        self.mode = mode
+        self.row_cache_size = max(0, int(row_cache_size))
         self.prediction_matrix: Optional[np.ndarray] = None
-        self.mapping: Optional[Dict] = None
+        self.P: Optional[np.ndarray] = None
+        self.Q: Optional[np.ndarray] = None
+        self._row_cache: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self.top_k_cache = max(0, int(top_k_cache))
+        # (N, K) 每個源節點的 top-K 目標索引與分數（分數已修剪，依原始分數降序）
+        self.top_targets: Optional[np.ndarray] = None
+        self.top_scores: Optional[np.ndarray] = None
+        self.mapping: Optional[Dict] = mapping
         self.node_type_to_index: Dict[str, int] = {}
         self.index_to_node_type: Dict[int, str] = {}
         self.node_types: List[str] = []
@@ -38,13 +93,14 @@ class MatrixFactorizationScorer:
         """載入預訓練模型"""
         print(f"📥 載入矩陣分解模型: {self.model_dir}")
         
-        # 載入映射
-        mapping_path = self.model_dir / "type_type_mapping.json"
-        if not mapping_path.exists():
-            raise FileNotFoundError(f"映射檔案不存在: {mapping_path}")
-        
-        with open(mapping_path, 'r', encoding='utf-8') as f:
-            self.mapping = json.load(f)
+        # 載入映射（已由呼叫端提供時不再讀檔）
+        if self.mapping is None:
+            mapping_path = self.model_dir / "type_type_mapping.json"
+            if not mapping_path.exists():
+                raise FileNotFoundError(f"映射檔案不存在: {mapping_path}")
+            
+            with open(mapping_path, 'r', encoding='utf-8') as f:
+                self.mapping = json.load(f)
         
         self.node_types = self.mapping.get("node_types", [])
         self.node_type_to_index = self.mapping.get("node_type_to_index", {})
@@ -54,6 +110,11 @@ class MatrixFactorizationScorer:
         
         print(f"   ✅ 載入了 {len(self.node_types)} 個節點類型的映射")
         
+        if self.mode == 'factorized':
+            self._load_factors()
+            self._init_top_transitions()
+            return
+        
         # 載入預測矩陣
         prediction_matrix_path = self.model_dir / "type_type_prediction_matrix.npy"
         if prediction_matrix_path.exists():
@@ -73,6 +134,160 @@ class MatrixFactorizationScorer:
                 raise FileNotFoundError(
                     f"找不到預測矩陣或 P/Q 矩陣: {prediction_matrix_path}, {p_path}, {q_path}"
                 )
+        
+        # top-K 依原始分數排序（修剪後同為 1.0 的目標仍有明確順序），因此在修剪前建立
+        raw_matrix = self.prediction_matrix
+        self._init_top_transitions(raw_matrix)
+        
+        # 預先修剪到 [0, 1]，查表時不需要再逐一 clamp
+        self.prediction_matrix = np.clip(raw_matrix, 0.0, 1.0)
+    
+    def _load_factors(self):
+        """factorized 模式：以 memmap 載入 P / Q，不建立完整預測矩陣"""
+        p_path = self.model_dir / "type_type_P.npy"
+        q_path = self.model_dir / "type_type_Q.npy"
+        if not p_path.exists() or not q_path.exists():
+            raise FileNotFoundError(f"factorized 模式需要 P/Q 矩陣: {p_path}, {q_path}")
+        
+        self.P = np.load(p_path, mmap_mode='r')
+        self.Q = np.load(q_path, mmap_mode='r')
+        num_types = len(self.node_types)
+        if self.P.shape[0] != num_types or self.Q.shape[0] != num_types or self.P.shape[1] != self.Q.shape[1]:
+            raise ValueError(
+                f"P/Q 形狀與映射不符: P={self.P.shape}, Q={self.Q.shape}, node_types={num_types}"
+            )
+        self._row_cache.clear()
+        print(f"   ✅ 載入了 P/Q 因子（memmap）: P={self.P.shape}, Q={self.Q.shape}（factorized 模式，分數為近似值）")
+    
+    def _top_transitions_key(self, raw_matrix: Optional[np.ndarray]) -> str:
+        """top-K 列表的驗證鍵：模型內容 + 節點類型 + K + 格式版本"""
+        digest = hashlib.sha256(
+            f"v{TOP_TRANSITIONS_FORMAT_VERSION}|{self.mode}|{self.top_k_cache}|".encode('utf-8')
+        )
+        digest.update("\n".join(self.node_types).encode('utf-8'))
+        if raw_matrix is not None:
+            digest.update(np.ascontiguousarray(raw_matrix).tobytes())
+        else:
+            digest.update(np.ascontiguousarray(self.P).tobytes())
+            digest.update(np.ascontiguousarray(self.Q).tobytes())
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _top_k_rows(raw_rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        以 argpartition 取每列前 k 大的索引，再只對這 k 個排序
+        
+        Args:
+            raw_rows: (B, N) 原始分數
+            k: 每列保留數量（<= N）
+        
+        Returns:
+            targets: (B, k) int32 目標索引（依原始分數降序）
+            scores: (B, k) 修剪到 [0, 1] 的分數
+        """
+        part = np.argpartition(-raw_rows, k - 1, axis=1)[:, :k]
+        part_scores = np.take_along_axis(raw_rows, part, axis=1)
+        order = np.argsort(-part_scores, axis=1, kind='stable')
+        targets = np.take_along_axis(part, order, axis=1).astype(np.int32)
+        scores = np.clip(np.take_along_axis(part_scores, order, axis=1), 0.0, 1.0)
+        return targets, scores
+    
+    def _build_top_transitions(self, raw_matrix: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """計算所有源節點的 top-K 列表（factorized 模式分塊計算 P @ Q.T）"""
+        num_types = len(self.node_types)
+        k = min(self.top_k_cache, num_types)
+        if raw_matrix is not None:
+            return self._top_k_rows(raw_matrix, k)
+        
+        targets = np.empty((num_types, k), dtype=np.int32)
+        scores = np.empty((num_types, k), dtype=np.float64)
+        for start in range(0, num_types, _TOP_K_BLOCK_ROWS):
+            stop = min(start + _TOP_K_BLOCK_ROWS, num_types)
+            block = np.asarray(self.P[start:stop]) @ np.asarray(self.Q).T
+            targets[start:stop], scores[start:stop] = self._top_k_rows(block, k)
+        return targets, scores
+    
+    def _init_top_transitions(self, raw_matrix: Optional[np.ndarray] = None):
+        """
+        載入或建立 top-K 轉換列表；模型內容變動時自動重建並保存
+        
+        Args:
+            raw_matrix: dense 模式下修剪前的預測矩陣；factorized 模式為 None（改用 P/Q）
+        """
+        if self.top_k_cache == 0 or not self.node_types:
+            return
+        
+        cache_path = self.model_dir / TOP_TRANSITIONS_FILE.format(mode=self.mode)
+        key = self._top_transitions_key(raw_matrix)
+        if cache_path.exists():
+            try:
+                with np.load(cache_path, allow_pickle=False) as data:
+                    if str(data["key"]) == key:
+                        self.top_targets = data["targets"]
+                        self.top_scores = data["scores"]
+            except (OSError, ValueError, KeyError):
+                pass
+        if self.top_targets is not None:
+            print(f"   ✅ 載入了 top-{self.top_targets.shape[1]} 轉換列表: {cache_path.name}")
+            return
+        
+        self.top_targets, self.top_scores = self._build_top_transitions(raw_matrix)
+        try:
+            atomic_write_bytes(cache_path, lambda f: np.savez(
+                f, key=np.array(key), targets=self.top_targets, scores=self.top_scores
+            ))
+            print(f"   ✅ 建立並保存了 top-{self.top_targets.shape[1]} 轉換列表: {cache_path.name}")
+        except OSError as e:
+            print(f"   ⚠️  無法保存 top-K 轉換列表: {e}")
+    
+    @property
+    def is_loaded(self) -> bool:
+        """是否已載入可用的模型（預測矩陣或 P/Q 因子）"""
+        return self.prediction_matrix is not None or self.P is not None
+    
+    def _row_scores(self, source_idx: int) -> np.ndarray:
+        """
+        從 source_idx 出發到所有節點類型的轉換分數（已修剪到 [0, 1]）
+        
+        factorized 模式以 Q @ P[source_idx] 計算並放入 LRU 快取。
+        
+        Args:
+            source_idx: 源節點類型索引
+        
+        Returns:
+            scores: (N,) 分數列（唯讀，請勿修改）
+        """
+        if self.prediction_matrix is not None:
+            return self.prediction_matrix[source_idx]
+        
+        row = self._row_cache.get(source_idx)
+        if row is not None:
+            self._row_cache.move_to_end(source_idx)
+            return row
+        
+        row = np.clip(self.Q @ self.P[source_idx], 0.0, 1.0)
+        row.flags.writeable = False
+        if self.row_cache_size:
+            self._row_cache[source_idx] = row
+            if len(self._row_cache) > self.row_cache_size:
+                self._row_cache.popitem(last=False)
+        return row
+    
+    def _pair_scores(self, source: np.ndarray, target: np.ndarray) -> np.ndarray:
+        """
+        逐元素計算 (source[i], target[i]) 的轉換分數（已修剪到 [0, 1]）
+        
+        Args:
+            source: 源節點類型索引陣列（皆為有效索引）
+            target: 與 source 同形狀的目標節點類型索引陣列
+        
+        Returns:
+            scores: 與 source 同形狀的分數陣列
+        """
+        if self.prediction_matrix is not None:
+            return self.prediction_matrix[source, target]
+        dots = np.einsum('...k,...k->...', self.P[source], self.Q[target])
+        return np.clip(dots, 0.0, 1.0)
     
     def get_transition_score(self, source_type: str, target_type: str) -> float:
         """
@@ -85,7 +300,7 @@ class MatrixFactorizationScorer:
         Returns:
             score: 轉換分數 (0.0 - 1.0)
         """
-        if self.prediction_matrix is None:
+        if not self.is_loaded:
             return 0.0
         
         # 檢查節點類型是否存在
@@ -95,13 +310,113 @@ class MatrixFactorizationScorer:
         source_idx = self.node_type_to_index[source_type]
         target_idx = self.node_type_to_index[target_type]
         
-        # 獲取分數
-        score = self.prediction_matrix[source_idx, target_idx]
+        # 分數已在載入（dense）或計算列時（factorized）修剪到 [0, 1]
+        return float(self._row_scores(source_idx)[target_idx])
+    
+    def encode_chains(self, chains: Sequence[Sequence[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        將節點類型鏈編碼為填充後的整數索引陣列
         
-        # 修剪分數到 [0, 1] 範圍
-        score = max(0.0, min(1.0, score))
+        Args:
+            chains: 節點類型鏈列表
         
-        return float(score)
+        Returns:
+            index_array: (B, L) int32，未知節點類型與填充位置為 UNKNOWN_INDEX
+            lengths: (B,) int32 每條鏈的實際長度
+        """
+        lengths = np.fromiter((len(chain) for chain in chains), dtype=np.int32, count=len(chains))
+        max_len = int(lengths.max()) if lengths.size else 0
+        index_array = np.full((len(chains), max_len), UNKNOWN_INDEX, dtype=np.int32)
+        
+        # 一次查完所有節點，再以 (row, col) 散佈到填充陣列
+        lookup = self.node_type_to_index
+        flat = np.fromiter(
+            (lookup.get(node_type, UNKNOWN_INDEX) for chain in chains for node_type in chain),
+            dtype=np.int32,
+            count=int(lengths.sum())
+        )
+        rows = np.repeat(np.arange(len(chains)), lengths)
+        cols = np.arange(flat.size) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        index_array[rows, cols] = flat
+        return index_array, lengths
+    
+    def score_index_batch(
+        self,
+        index_array: np.ndarray,
+        lengths: np.ndarray,
+        strategies: Optional[Sequence[str]] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        以 NumPy fancy indexing 一次計算多條鏈的所有策略分數
+        
+        語意與 score_chain 相同：未知節點類型的轉換分數為 0（仍計入邊數），
+        長度 < 2 的鏈在所有策略下分數為 0。
+        
+        Args:
+            index_array: (B, L) 整數索引陣列（見 encode_chains）
+            lengths: (B,) 每條鏈的實際長度
+            strategies: 要計算的策略（預設全部）
+        
+        Returns:
+            scores: {strategy: (B,) float64 分數陣列}
+        """
+        strategies = list(strategies) if strategies is not None else list(SCORING_STRATEGIES)
+        for strategy in strategies:
+            if strategy not in SCORING_STRATEGIES:
+                raise ValueError(f"未知的評分策略: {strategy}")
+        
+        index_array = np.asarray(index_array)
+        lengths = np.asarray(lengths)
+        batch_size = index_array.shape[0]
+        num_edges = np.maximum(lengths - 1, 0)
+        if not self.is_loaded or index_array.ndim != 2 or index_array.shape[1] < 2:
+            return {strategy: np.zeros(batch_size, dtype=np.float64) for strategy in strategies}
+        
+        # (B, L-1) 邊分數；未知節點或填充位置先查索引 0 再歸零
+        source = index_array[:, :-1]
+        target = index_array[:, 1:]
+        known = (source >= 0) & (target >= 0)
+        edge_scores = self._pair_scores(np.where(known, source, 0), np.where(known, target, 0))
+        edge_scores = np.where(known, edge_scores, 0.0)
+        valid = np.arange(index_array.shape[1] - 1)[None, :] < num_edges[:, None]
+        has_edges = num_edges > 0
+        safe_edges = np.maximum(num_edges, 1)
+        
+        scores: Dict[str, np.ndarray] = {}
+        total = np.where(valid, edge_scores, 0.0).sum(axis=1)
+        product = None
+        for strategy in strategies:
+            if strategy == 'sum':
+                result = total
+            elif strategy == 'average':
+                result = total / safe_edges
+            elif strategy in ('product', 'geometric_mean'):
+                if product is None:
+                    product = np.where(valid, edge_scores, 1.0).prod(axis=1)
+                result = product if strategy == 'product' else product ** (1.0 / safe_edges)
+            else:  # 'min'
+                result = np.where(valid, edge_scores, np.inf).min(axis=1)
+            scores[strategy] = np.where(has_edges, result, 0.0)
+        
+        return scores
+    
+    def score_chains(
+        self,
+        chains: Sequence[Sequence[str]],
+        strategies: Optional[Sequence[str]] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        批次計算多條節點類型鏈的分數
+        
+        Args:
+            chains: 節點類型鏈列表
+            strategies: 要計算的策略（預設全部）
+        
+        Returns:
+            scores: {strategy: (B,) 分數陣列}，順序與 chains 相同
+        """
+        index_array, lengths = self.encode_chains(chains)
+        return self.score_index_batch(index_array, lengths, strategies)
     
     def score_chain(self, chain: List[str], strategy: str = 'sum') -> float:
         """
@@ -122,7 +437,7 @@ class MatrixFactorizationScorer:
         if len(chain) < 2:
             return 0.0
         
-        # 獲取每對相鄰節點的分數
+        # 獲取每對相鄰節點的分數（單條鏈直接查表；多條鏈請使用 score_chains）
         edge_scores = []
         for i in range(len(chain) - 1):
             source = chain[i]
@@ -164,17 +479,18 @@ class MatrixFactorizationScorer:
         Returns:
             ranked_candidates: 排序後的候選列表，每個元素是 (chain, score) 元組
         """
-        scored_candidates = []
-        
-        for chain in candidates:
-            score = self.score_chain(chain, strategy)
-            if score >= min_score:
-                scored_candidates.append((chain, score))
+        if not candidates:
+            return []
         
-        # 按分數降序排序
-        scored_candidates.sort(key=lambda x: x[1], reverse=True)
+        scores = self.score_chains(candidates, strategies=[strategy])[strategy]
         
-        return scored_candidates
+        # 按分數降序排序（穩定排序，同分時保持原順序）
+        order = np.argsort(-scores, kind='stable')
+        return [
+            (candidates[i], float(scores[i]))
+            for i in order
+            if scores[i] >= min_score
+        ]
     
     def get_top_transitions(self, source_type: str, top_k: int = 10) -> List[Tuple[str, float]]:
         """
@@ -187,11 +503,22 @@ class MatrixFactorizationScorer:
         Returns:
             top_transitions: [(target_type, score), ...]
         """
-        if self.prediction_matrix is None or source_type not in self.node_type_to_index:
+        if not self.is_loaded or source_type not in self.node_type_to_index:
             return []
         
+        # 預先計算的 top-K 列表足夠時直接切片
+        if self.top_targets is not None and top_k <= self.top_targets.shape[1]:
+            source_idx = self.node_type_to_index[source_type]
+            return [
+                (self.index_to_node_type.get(int(idx), f"unknown_{idx}"), float(score))
+                for idx, score in zip(self.top_targets[source_idx, :top_k], self.top_scores[source_idx, :top_k])
+            ]
+        
+        if self.mode == 'factorized':
+            return self.top_transitions_mips(source_type, top_k)
+        
         source_idx = self.node_type_to_index[source_type]
-        scores = self.prediction_matrix[source_idx, :]
+        scores = self._row_scores(source_idx)
         
         # 獲取 top_k 個最高分
         top_indices = np.argsort(scores)[-top_k:][::-1]
@@ -199,10 +526,93 @@ class MatrixFactorizationScorer:
         top_transitions = []
         for idx in top_indices:
             target_type = self.index_to_node_type.get(idx, f"unknown_{idx}")
-            score = float(max(0.0, min(1.0, scores[idx])))
+            score = float(scores[idx])
             top_transitions.append((target_type, score))
         
         return top_transitions
+    
+    def top_transition_indices(self, source_ids: np.ndarray, top_k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        批次取得多個源節點的 top-k 轉換（索引層級，單次陣列切片）
+        
+        Args:
+            source_ids: (B,) 源節點類型索引
+            top_k: 每個源節點返回的數量（不可超過 top_k_cache）
+        
+        Returns:
+            targets: (B, top_k) 目標索引（依分數降序）
+            scores: (B, top_k) 分數
+        """
+        if self.top_targets is None:
+            raise ValueError("top-K 轉換列表未啟用（top_k_cache = 0）")
+        if top_k > self.top_targets.shape[1]:
+            raise ValueError(f"top_k={top_k} 超過預先計算的數量 {self.top_targets.shape[1]}")
+        source_ids = np.asarray(source_ids, dtype=np.int64)
+        return self.top_targets[source_ids, :top_k], self.top_scores[source_ids, :top_k]
+    
+    def get_top_transitions_batch(
+        self,
+        source_types: Sequence[str],
+        top_k: int = 10
+    ) -> Dict[str, List[Tuple[str, float]]]:
+        """
+        批次獲取多個節點類型出發的最佳轉換
+        
+        Args:
+            source_types: 源節點類型列表
+            top_k: 每個源節點返回前 k 個
+        
+        Returns:
+            top_transitions: {source_type: [(target_type, score), ...]}，未知節點類型為空列表
+        """
+        known = [t for t in dict.fromkeys(source_types) if t in self.node_type_to_index]
+        results: Dict[str, List[Tuple[str, float]]] = {t: [] for t in source_types}
+        if not known or not self.is_loaded:
+            return results
+        
+        if self.top_targets is None or top_k > self.top_targets.shape[1]:
+            for source_type in known:
+                results[source_type] = self.get_top_transitions(source_type, top_k)
+            return results
+        
+        targets, scores = self.top_transition_indices(
+            [self.node_type_to_index[t] for t in known], top_k
+        )
+        for source_type, row_targets, row_scores in zip(known, targets.tolist(), scores.tolist()):
+            results[source_type] = [
+                (self.index_to_node_type.get(idx, f"unknown_{idx}"), score)
+                for idx, score in zip(row_targets, row_scores)
+            ]
+        return results
+    
+    def top_transitions_mips(self, source_type: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """
+        factorized 模式的 top-k 轉換：對 P[source] 做最大內積搜索（maximum inner product search）
+        
+        以原始內積排序（修剪前），因此分數同為 1.0 的目標之間仍有明確順序；
+        詞彙量為數百到數千時，精確的 Q @ p 加 argpartition 已足夠快。
+        
+        Args:
+            source_type: 源節點類型
+            top_k: 返回前 k 個
+        
+        Returns:
+            top_transitions: [(target_type, score), ...]，score 已修剪到 [0, 1]
+        """
+        if self.P is None or source_type not in self.node_type_to_index:
+            return []
+        
+        inner = self.Q @ self.P[self.node_type_to_index[source_type]]
+        top_k = min(max(int(top_k), 0), inner.shape[0])
+        if top_k == 0:
+            return []
+        top_indices = np.argpartition(-inner, top_k - 1)[:top_k]
+        top_indices = top_indices[np.argsort(-inner[top_indices], kind='stable')]
+        
+        return [
+            (self.index_to_node_type.get(int(idx), f"unknown_{idx}"), float(min(1.0, max(0.0, inner[idx]))))
+            for idx in top_indices
+        ]
 
 
 def main():
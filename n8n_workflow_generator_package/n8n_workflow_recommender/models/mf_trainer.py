@@ -0,0 +1,724 @@
+#!/usr/bin/env python3
+"""
+矩陣分解訓練器
+
+從 n8n 模板串流累積 type → type 轉換次數（稀疏 COO），以向量化的 ALS 或 SGD 擬合 P / Q，
+支援以既有模型 warm start 做增量更新，並寫出 MatrixFactorizationScorer 讀取的同一組檔案：
+    type_type_mapping.json / type_type_P.npy / type_type_Q.npy / type_type_prediction_matrix.npy
+    loss_history_with_validation.json / type_type_model_parameters.json
+另外保存 type_type_transition_counts.npz（累積的轉換次數與已處理的模板），下次增量訓練只需加入新模板。
+
+目標函數（觀測值為轉換次數 r_ij）：
+    Σ_{觀測} (r_ij - p_i·q_j)² + zero_weight × Σ_{未觀測} (p_i·q_j)² + regularization × Σ_i (n_i + 1)|p_i|² + ...
+（n_i 為該列的觀測數；Q 的正則化項相同）
+驗證集是隨機保留的一部分觀測值，訓練時完全遮蔽（權重 0）。
+"""
+
+import hashlib
+import json
+import os
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..utils.file_loader import atomic_write_bytes
+
+
+# 累積的轉換次數（增量訓練用）
+TRANSITION_COUNTS_FILE = "type_type_transition_counts.npz"
+
+# 支援的訓練方法
+TRAINING_METHODS = ('als', 'sgd')
+
+# COO 緩衝超過此數量時合併重複項
+_COMPACT_THRESHOLD = 1_000_000
+
+# seen_templates 的識別方式（變動時舊的累積檔會被忽略並重新計數）
+_TEMPLATE_KEY = "sha256"
+
+
+def extract_workflow(template: Dict) -> Optional[Dict]:
+    """
+    從模板 JSON 取出包含 nodes / connections 的 workflow
+
+    模板的巢狀層數不一（template → workflow → workflow），這裡沿著 'workflow' 鍵往下找。
+
+    Args:
+        template: 模板字典
+
+    Returns:
+        workflow: 包含 'connections' 的字典，找不到時返回 None
+    """
+    current = template
+    while isinstance(current, dict) and 'connections' not in current and isinstance(current.get('workflow'), dict):
+        current = current['workflow']
+    if isinstance(current, dict) and 'connections' in current:
+        return current
+    return None
+
+
+def iter_template_files(templates_dirs: Iterable[str]) -> Iterator[Path]:
+    """依檔名排序列出目錄中的所有模板 JSON（可傳入多個目錄或單一檔案）"""
+    for templates_dir in templates_dirs:
+        path = Path(templates_dir)
+        if path.is_file():
+            yield path
+        elif path.is_dir():
+            yield from sorted(path.rglob("*.json"))
+
+
+class TransitionCounter:
+    """
+    type → type 轉換次數的串流累積器
+
+    新模板的轉換先寫入 array 緩衝（COO 三元組），超過門檻或輸出時才以 NumPy 合併重複項，
+    記憶體與觀測到的轉換種類數成正比，不需要建立 N×N 矩陣。
+    """
+
+    def __init__(self, node_types: Optional[Sequence[str]] = None, connection_types: Sequence[str] = ('main',)):
+        """
+        Args:
+            node_types: 既有的節點類型順序（warm start 時沿用舊模型的索引）
+            connection_types: 計入的連線種類（例如 'main'、'ai_tool'；空列表表示全部）
+        """
+        self.node_types: List[str] = list(node_types or [])
+        self.node_type_to_index: Dict[str, int] = {t: i for i, t in enumerate(self.node_types)}
+        self.connection_types = tuple(connection_types or ())
+        # 已計數模板的內容 SHA-256（不同目錄中同名的模板各自計數，內容不變的重複匯出只計一次）
+        self.seen_templates: set = set()
+
+        self._rows = array('i')
+        self._cols = array('i')
+        self._vals = array('d')
+        self._coo = (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float64))
+
+    @property
+    def num_types(self) -> int:
+        return len(self.node_types)
+
+    def _index(self, node_type: str) -> int:
+        idx = self.node_type_to_index.get(node_type)
+        if idx is None:
+            idx = len(self.node_types)
+            self.node_types.append(node_type)
+            self.node_type_to_index[node_type] = idx
+        return idx
+
+    def add_workflow(self, workflow: Dict, weight: float = 1.0) -> int:
+        """
+        累積一個 workflow 的所有轉換
+
+        Args:
+            workflow: 包含 nodes / connections 的字典
+            weight: 每條轉換的權重
+
+        Returns:
+            count: 加入的轉換數
+        """
+        node_types = {
+            node.get('name'): node.get('type')
+            for node in workflow.get('nodes') or []
+            if isinstance(node, dict) and node.get('name') and node.get('type')
+        }
+        count = 0
+        for source_name, outputs in (workflow.get('connections') or {}).items():
+            source_type = node_types.get(source_name)
+            if source_type is None or not isinstance(outputs, dict):
+                continue
+            for connection_type, output_lists in outputs.items():
+                if self.connection_types and connection_type not in self.connection_types:
+                    continue
+                for targets in output_lists or []:
+                    if not isinstance(targets, list):
+                        continue
+                    for target in targets:
+                        target_type = node_types.get(target.get('node')) if isinstance(target, dict) else None
+                        if target_type is None:
+                            continue
+                        self._rows.append(self._index(source_type))
+                        self._cols.append(self._index(target_type))
+                        self._vals.append(weight)
+                        count += 1
+
+        if len(self._vals) >= _COMPACT_THRESHOLD:
+            self._compact()
+        return count
+
+    def add_template_file(self, template_path: Path, weight: float = 1.0) -> Optional[int]:
+        """
+        累積一個模板檔案（內容已處理過的檔案會略過，避免增量訓練重複計數）
+
+        Returns:
+            count: 加入的轉換數；已處理過或無法解析時返回 None
+        """
+        try:
+            with open(template_path, 'rb') as f:
+                raw = f.read()
+        except OSError:
+            return None
+        template_id = hashlib.sha256(raw).hexdigest()
+        if template_id in self.seen_templates:
+            return None
+        try:
+            workflow = extract_workflow(json.loads(raw.decode('utf-8')))
+        except ValueError:
+            return None
+        if workflow is None:
+            return None
+        self.seen_templates.add(template_id)
+        return self.add_workflow(workflow, weight=weight)
+
+    def add_templates(self, templates_dirs: Iterable[str]) -> Tuple[int, int]:
+        """
+        累積目錄中的所有新模板
+
+        Returns:
+            (templates, transitions): 新加入的模板數與轉換數
+        """
+        templates = transitions = 0
+        for template_path in iter_template_files(templates_dirs):
+            count = self.add_template_file(template_path)
+            if count is not None:
+                templates += 1
+                transitions += count
+        return templates, transitions
+
+    def _compact(self):
+        """把緩衝併入已合併的 COO（重複的 (row, col) 相加）"""
+        if not self._vals:
+            return
+        rows = np.concatenate([self._coo[0], np.frombuffer(self._rows, dtype=np.int32)])
+        cols = np.concatenate([self._coo[1], np.frombuffer(self._cols, dtype=np.int32)])
+        vals = np.concatenate([self._coo[2], np.frombuffer(self._vals, dtype=np.float64)])
+        keys = rows.astype(np.int64) * (1 << 32) + cols
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        summed = np.bincount(inverse, weights=vals, minlength=unique_keys.size)
+        self._coo = (
+            (unique_keys >> 32).astype(np.int32),
+            (unique_keys & 0xFFFFFFFF).astype(np.int32),
+            summed
+        )
+        self._rows, self._cols, self._vals = array('i'), array('i'), array('d')
+
+    def to_coo(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns:
+            (rows, cols, vals): 合併後的轉換次數（每個 (row, col) 只出現一次）
+        """
+        self._compact()
+        return self._coo
+
+    def save(self, path: str):
+        """保存累積狀態（.npz）"""
+        rows, cols, vals = self.to_coo()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(path, lambda f: np.savez(
+            f,
+            node_types=np.array(self.node_types),
+            connection_types=np.array(self.connection_types),
+            template_key=np.array(_TEMPLATE_KEY),
+            seen_templates=np.array(sorted(self.seen_templates)),
+            rows=rows,
+            cols=cols,
+            vals=vals
+        ))
+
+    @classmethod
+    def load(cls, path: str, connection_types: Sequence[str] = ('main',)) -> Optional["TransitionCounter"]:
+        """
+        載入累積狀態
+
+        Returns:
+            counter: 累積器；檔案不存在、損壞、連線種類不同或模板識別方式不同（舊版以檔名記錄）時返回 None
+        """
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if tuple(str(t) for t in data['connection_types']) != tuple(connection_types or ()):
+                    return None
+                if 'template_key' not in data.files or str(data['template_key']) != _TEMPLATE_KEY:
+                    return None
+                counter = cls([str(t) for t in data['node_types']], connection_types)
+                counter.seen_templates = {str(t) for t in data['seen_templates']}
+                counter._coo = (
+                    data['rows'].astype(np.int32),
+                    data['cols'].astype(np.int32),
+                    data['vals'].astype(np.float64)
+                )
+        except (OSError, ValueError, KeyError):
+            return None
+        return counter
+
+
+def _error_metrics(errors: np.ndarray) -> Dict[str, float]:
+    """誤差統計（與 loss_history_with_validation.json 的欄位相同）"""
+    if errors.size == 0:
+        return {'mae': 0.0, 'rmse': 0.0, 'max_error': 0.0, 'median_error': 0.0}
+    abs_errors = np.abs(errors)
+    return {
+        'mae': float(abs_errors.mean()),
+        'rmse': float(np.sqrt(np.mean(errors ** 2))),
+        'max_error': float(abs_errors.max()),
+        'median_error': float(np.median(abs_errors))
+    }
+
+
+class MatrixFactorizationTrainer:
+    """
+    type → type 矩陣分解訓練器
+
+    ALS：每次固定 Q 解所有 P 的列（反之亦然），每列是一個 k×k 的加權 ridge regression，
+    以 np.linalg.solve 批次求解並依 n_jobs 分塊到多個執行緒（LAPACK 會釋放 GIL）。
+    未觀測項的貢獻以 zero_weight × QᵀQ 一次計算，不需要建立 N×N 矩陣。
+    SGD：對觀測項與同數量的隨機未觀測項做 mini-batch 向量化更新；同一列在 batch 內的梯度加總後
+    一次套用，每列的更新步長（L2 範數）以 max_step 截斷，熱門節點類型不會發散。
+    """
+
+    def __init__(
+        self,
+        num_factors: int = 8,
+        learning_rate: float = 0.005,
+        regularization: float = 0.2,
+        method: str = 'als',
+        iterations: int = 50,
+        zero_weight: float = 0.05,
+        val_fraction: float = 0.1,
+        patience: int = 5,
+        batch_size: int = 4096,
+        max_step: Optional[float] = 0.5,
+        n_jobs: Optional[int] = None,
+        seed: int = 42
+    ):
+        """
+        Args:
+            num_factors: 隱因子維度
+            learning_rate: SGD 學習率（ALS 不使用）
+            regularization: L2 正則化係數
+            method: 'als' 或 'sgd'
+            iterations: ALS 迭代次數 / SGD epoch 數
+            zero_weight: 未觀測轉換（視為 0）的權重
+            val_fraction: 保留為驗證集的觀測值比例
+            patience: 驗證損失連續幾次沒有改善就提前停止（0 表示不提前停止）
+            batch_size: SGD mini-batch 大小
+            max_step: SGD 每列每次更新的最大 L2 範數（None 或 <= 0 表示不截斷）
+            n_jobs: ALS 並行的執行緒數（None 表示使用所有 CPU）
+            seed: 隨機種子
+        """
+        if method not in TRAINING_METHODS:
+            raise ValueError(f"未知的訓練方法: {method}（可用: {', '.join(TRAINING_METHODS)}）")
+        self.num_factors = int(num_factors)
+        self.learning_rate = float(learning_rate)
+        self.regularization = float(regularization)
+        self.method = method
+        self.iterations = int(iterations)
+        self.zero_weight = float(zero_weight)
+        self.val_fraction = float(val_fraction)
+        self.patience = int(patience)
+        self.batch_size = int(batch_size)
+        self.max_step = float(max_step) if max_step and max_step > 0 else None
+        self.n_jobs = int(n_jobs) if n_jobs else (os.cpu_count() or 1)
+        self.seed = seed
+
+    # === ALS ===
+
+    def _solve_side(
+        self,
+        fixed: np.ndarray,
+        num_rows: int,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        deltas: np.ndarray,
+        targets: np.ndarray
+    ) -> np.ndarray:
+        """
+        固定一側因子，解另一側所有列
+
+        A_i = zero_weight × FᵀF + Σ_j delta_ij f_j f_jᵀ + λ(n_i + 1)I，b_i = Σ_j r_ij f_j
+        （weighted-λ 正則化：n_i 為該列的訓練觀測數，常見與罕見節點類型的收縮程度一致）
+
+        Args:
+            fixed: (M, k) 固定的因子
+            num_rows: 要解的列數
+            rows / cols: 修正項的 (列, 固定側索引)，已依 rows 排序
+            deltas: 每個修正項的權重差（觀測值為 1 - zero_weight，驗證項為 -zero_weight）
+            targets: 每個修正項的目標值（驗證項為 0）
+
+        Returns:
+            solved: (num_rows, k) 新因子
+        """
+        k = fixed.shape[1]
+        observed = np.bincount(rows[deltas > 0], minlength=num_rows)
+        A = np.broadcast_to(self.zero_weight * (fixed.T @ fixed), (num_rows, k, k)).copy()
+        A += (self.regularization * (observed + 1))[:, None, None] * np.eye(k)
+        b = np.zeros((num_rows, k))
+
+        if rows.size:
+            factors = fixed[cols]
+            starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+            unique_rows = rows[starts]
+            A[unique_rows] += np.add.reduceat(
+                deltas[:, None, None] * factors[:, :, None] * factors[:, None, :], starts, axis=0
+            )
+            b[unique_rows] += np.add.reduceat(targets[:, None] * factors, starts, axis=0)
+
+        chunks = np.array_split(np.arange(num_rows), min(self.n_jobs, max(num_rows, 1)))
+        solved = np.empty((num_rows, k))
+
+        def solve(chunk):
+            if chunk.size:
+                solved[chunk] = np.linalg.solve(A[chunk], b[chunk][:, :, None])[:, :, 0]
+
+        if len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+                list(executor.map(solve, chunks))
+        else:
+            solve(chunks[0])
+        return solved
+
+    def _als_step(self, P, Q, train, held_out):
+        """一次 ALS 迭代（先解 P 再解 Q）"""
+        (tr_rows, tr_cols, tr_vals), (ho_rows, ho_cols) = train, held_out
+        rows = np.concatenate([tr_rows, ho_rows])
+        cols = np.concatenate([tr_cols, ho_cols])
+        deltas = np.concatenate([
+            np.full(tr_rows.size, 1.0 - self.zero_weight),
+            np.full(ho_rows.size, -self.zero_weight)
+        ])
+        targets = np.concatenate([tr_vals, np.zeros(ho_rows.size)])
+
+        order = np.argsort(rows, kind='stable')
+        P = self._solve_side(Q, P.shape[0], rows[order], cols[order], deltas[order], targets[order])
+        order = np.argsort(cols, kind='stable')
+        Q = self._solve_side(P, Q.shape[0], cols[order], rows[order], deltas[order], targets[order])
+        return P, Q
+
+    # === SGD ===
+
+    def _sgd_epoch(self, P, Q, train, rng):
+        """一個 SGD epoch：觀測項 + 同數量的隨機未觀測項（視為 0，權重 zero_weight）"""
+        tr_rows, tr_cols, tr_vals = train
+        num_types = P.shape[0]
+        num_negatives = tr_rows.size if self.zero_weight > 0 else 0
+        rows = np.concatenate([tr_rows, rng.integers(0, num_types, num_negatives)])
+        cols = np.concatenate([tr_cols, rng.integers(0, num_types, num_negatives)])
+        vals = np.concatenate([tr_vals, np.zeros(num_negatives)])
+        weights = np.concatenate([np.ones(tr_rows.size), np.full(num_negatives, self.zero_weight)])
+
+        order = rng.permutation(rows.size)
+        for start in range(0, order.size, self.batch_size):
+            batch = order[start:start + self.batch_size]
+            i, j = rows[batch], cols[batch]
+            p, q = P[i], Q[j]
+            err = weights[batch] * (vals[batch] - np.einsum('bk,bk->b', p, q))
+            self._apply_row_gradient(P, i, err[:, None] * q - self.regularization * p)
+            self._apply_row_gradient(Q, j, err[:, None] * p - self.regularization * q)
+        return P, Q
+
+    def _apply_row_gradient(self, factors: np.ndarray, index: np.ndarray, grads: np.ndarray):
+        """
+        同一 batch 內重複出現的列加總梯度後一次更新（與逐筆 SGD 的總步長相同），
+        再把每列的步長截斷到 max_step：計數很大的轉換誤差也很大，不截斷時熱門節點類型會發散
+        """
+        unique, inverse = np.unique(index, return_inverse=True)
+        summed = np.zeros((unique.size, factors.shape[1]))
+        np.add.at(summed, inverse, grads)
+        step = self.learning_rate * summed
+        if self.max_step is not None:
+            norms = np.linalg.norm(step, axis=1, keepdims=True)
+            step *= np.minimum(1.0, self.max_step / np.maximum(norms, 1e-12))
+        factors[unique] += step
+
+    # === 訓練 ===
+
+    def _split(self, rows, cols, vals):
+        """
+        保留 val_fraction 的觀測值作為驗證集
+
+        以 (row, col, seed) 的雜湊決定，而不是隨機抽樣：增量訓練時索引不變，
+        同一個轉換在每次訓練都落在同一側，warm start 的舊因子不會看過驗證集。
+        """
+        if self.val_fraction <= 0:
+            is_val = np.zeros(rows.size, dtype=bool)
+        else:
+            # splitmix64 風格的整數雜湊
+            with np.errstate(over='ignore'):
+                h = (rows.astype(np.uint64) << np.uint64(32)) | cols.astype(np.uint64)
+                h ^= np.uint64(self.seed & 0xFFFFFFFF) * np.uint64(0x9E3779B97F4A7C15)
+                h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+                h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+                h ^= h >> np.uint64(31)
+            is_val = (h >> np.uint64(11)).astype(np.float64) / float(1 << 53) < self.val_fraction
+        train = (rows[~is_val], cols[~is_val], vals[~is_val])
+        val = (rows[is_val], cols[is_val], vals[is_val])
+        return train, val
+
+    @staticmethod
+    def _errors(P, Q, entries) -> np.ndarray:
+        rows, cols, vals = entries
+        return vals - np.einsum('bk,bk->b', P[rows], Q[cols])
+
+    def fit(
+        self,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        vals: np.ndarray,
+        num_types: int,
+        init_P: Optional[np.ndarray] = None,
+        init_Q: Optional[np.ndarray] = None
+    ) -> Dict:
+        """
+        擬合 P / Q
+
+        Args:
+            rows / cols / vals: 轉換次數（COO）
+            num_types: 節點類型數
+            init_P / init_Q: warm start 的初始因子（形狀必須為 (num_types, num_factors)）
+
+        Returns:
+            result: {'P', 'Q', 'loss_history', 'best_iteration', 'train_metrics', 'val_metrics', ...}
+        """
+        rng = np.random.default_rng(self.seed)
+        train, val = self._split(rows, cols, vals)
+        scale = 0.1 / np.sqrt(max(self.num_factors, 1))
+        P = np.array(init_P, dtype=np.float64) if init_P is not None else rng.normal(0, scale, (num_types, self.num_factors))
+        Q = np.array(init_Q, dtype=np.float64) if init_Q is not None else rng.normal(0, scale, (num_types, self.num_factors))
+
+        loss_history = []
+        best = (np.inf, 0, P.copy(), Q.copy())
+        stale = 0
+        for iteration in range(self.iterations):
+            if self.method == 'als':
+                P, Q = self._als_step(P, Q, train, val[:2])
+            else:
+                P, Q = self._sgd_epoch(P, Q, train, rng)
+
+            with np.errstate(over='ignore', invalid='ignore'):
+                train_loss = float(np.sum(self._errors(P, Q, train) ** 2))
+                val_loss = float(np.sum(self._errors(P, Q, val) ** 2)) if val[0].size else None
+            if not (np.isfinite(P).all() and np.isfinite(Q).all() and np.isfinite(train_loss)):
+                print(f"   ⚠️  第 {iteration} 次迭代的因子發散（NaN / inf），回復到第 {best[1]} 次迭代的最佳因子並停止"
+                      f"（可調低 learning_rate 或 max_step）")
+                break
+            loss_history.append({'iteration': iteration, 'train_loss': train_loss, 'val_loss': val_loss})
+
+            monitored = val_loss if val_loss is not None else train_loss
+            if monitored < best[0]:
+                best = (monitored, iteration, P.copy(), Q.copy())
+                stale = 0
+            else:
+                stale += 1
+                if self.patience and stale >= self.patience:
+                    print(f"   ⏹️  驗證損失連續 {stale} 次未改善，於第 {iteration} 次迭代提前停止")
+                    break
+
+        _, best_iteration, P, Q = best
+        final = loss_history[-1] if loss_history else {'train_loss': 0.0, 'val_loss': None}
+        final_val = final['val_loss'] if final['val_loss'] is not None else 0.0
+        return {
+            'P': P,
+            'Q': Q,
+            'loss_history': loss_history,
+            'best_iteration': best_iteration,
+            'total_iterations': len(loss_history),
+            'final_train_loss': final['train_loss'],
+            'final_val_loss': final_val,
+            'overfitting': final_val - final['train_loss'],
+            'train_metrics': _error_metrics(self._errors(P, Q, train)),
+            'val_metrics': _error_metrics(self._errors(P, Q, val)),
+            'num_train': int(train[0].size),
+            'num_val': int(val[0].size)
+        }
+
+    def parameters(self) -> Dict:
+        """寫入報告的超參數"""
+        return {
+            'num_factors': self.num_factors,
+            'learning_rate': self.learning_rate,
+            'regularization': self.regularization
+        }
+
+
+def load_factors(model_dir: str) -> Optional[Tuple[List[str], np.ndarray, np.ndarray]]:
+    """
+    載入既有模型的節點類型與 P / Q（warm start 用）
+
+    Returns:
+        (node_types, P, Q)，不存在時返回 None
+    """
+    model_dir = Path(model_dir)
+    mapping_path = model_dir / "type_type_mapping.json"
+    p_path = model_dir / "type_type_P.npy"
+    q_path = model_dir / "type_type_Q.npy"
+    if not (mapping_path.exists() and p_path.exists() and q_path.exists()):
+        return None
+    with open(mapping_path, 'r', encoding='utf-8') as f:
+        node_types = json.load(f).get('node_types', [])
+    return node_types, np.load(p_path), np.load(q_path)
+
+
+def _expand_factors(
+    old_types: List[str],
+    old_factors: np.ndarray,
+    node_types: List[str],
+    rng: np.random.Generator
+) -> np.ndarray:
+    """依新的節點類型順序排列舊因子；新出現的類型以小隨機值初始化"""
+    num_factors = old_factors.shape[1]
+    scale = 0.1 / np.sqrt(max(num_factors, 1))
+    factors = rng.normal(0, scale, (len(node_types), num_factors))
+    old_index = {t: i for i, t in enumerate(old_types)}
+    for i, node_type in enumerate(node_types):
+        j = old_index.get(node_type)
+        if j is not None:
+            factors[i] = old_factors[j]
+    return factors
+
+
+def save_model(
+    output_dir: str,
+    node_types: List[str],
+    result: Dict,
+    trainer: MatrixFactorizationTrainer,
+    write_prediction_matrix: bool = True
+):
+    """
+    寫出 MatrixFactorizationScorer 讀取的檔案與訓練報告
+
+    Args:
+        output_dir: 輸出目錄
+        node_types: 節點類型（索引順序）
+        result: MatrixFactorizationTrainer.fit 的結果
+        trainer: 訓練器（用於記錄超參數）
+        write_prediction_matrix: 是否寫出完整 P @ Qᵀ（dense 評分模式需要；記憶體隨類型數平方成長）
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    P, Q = result['P'], result['Q']
+
+    def write_json(name: str, data: Dict):
+        payload = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+        atomic_write_bytes(output_dir / name, lambda f: f.write(payload))
+
+    write_json("type_type_mapping.json", {
+        'node_types': node_types,
+        'node_type_to_index': {t: i for i, t in enumerate(node_types)},
+        'index_to_node_type': {str(i): t for i, t in enumerate(node_types)}
+    })
+    atomic_write_bytes(output_dir / "type_type_P.npy", lambda f: np.save(f, P))
+    atomic_write_bytes(output_dir / "type_type_Q.npy", lambda f: np.save(f, Q))
+    if write_prediction_matrix:
+        atomic_write_bytes(output_dir / "type_type_prediction_matrix.npy", lambda f: np.save(f, P @ Q.T))
+
+    parameters = trainer.parameters()
+    write_json("loss_history_with_validation.json", {
+        'loss_history': result['loss_history'],
+        'best_iteration': result['best_iteration'],
+        'final_train_loss': result['final_train_loss'],
+        'final_val_loss': result['final_val_loss'],
+        'overfitting': result['overfitting'],
+        'train_metrics': result['train_metrics'],
+        'val_metrics': result['val_metrics'],
+        'best_parameters': parameters,
+        'method': trainer.method,
+        'zero_weight': trainer.zero_weight
+    })
+    write_json("type_type_model_parameters.json", {
+        'num_factors': int(P.shape[1]),
+        'num_node_types': len(node_types),
+        'matrix_shape': [len(node_types), len(node_types)],
+        'best_iteration': result['best_iteration'],
+        'training_info': {
+            'total_iterations': result['total_iterations'],
+            'final_train_loss': result['final_train_loss'],
+            'final_val_loss': result['final_val_loss'],
+            'overfitting': result['overfitting']
+        },
+        'metrics': {
+            'train': result['train_metrics'],
+            'validation': result['val_metrics']
+        },
+        'best_parameters': parameters
+    })
+
+
+def train_from_templates(
+    templates_dirs: Sequence[str],
+    model_dir: str,
+    output_dir: Optional[str] = None,
+    trainer: Optional[MatrixFactorizationTrainer] = None,
+    warm_start: bool = True,
+    connection_types: Sequence[str] = ('main',),
+    write_prediction_matrix: bool = True
+) -> Dict:
+    """
+    從模板訓練（或增量更新）type → type 矩陣分解模型
+
+    warm start 時沿用 model_dir 的轉換次數與 P / Q：只有尚未處理過的模板會被加入，
+    節點類型索引保持不變（新類型附加在後面），因子維度沿用舊模型。
+
+    Args:
+        templates_dirs: 模板目錄（或檔案）列表
+        model_dir: 既有模型目錄（warm start 來源）
+        output_dir: 輸出目錄（預設與 model_dir 相同）
+        trainer: 訓練器（預設使用預設超參數）
+        warm_start: 是否從既有模型繼續訓練
+        connection_types: 計入的連線種類
+        write_prediction_matrix: 是否寫出完整預測矩陣
+
+    Returns:
+        result: MatrixFactorizationTrainer.fit 的結果，另含 'node_types'、'new_templates'、'new_transitions'
+    """
+    trainer = trainer or MatrixFactorizationTrainer()
+    output_dir = Path(output_dir or model_dir)
+
+    existing = load_factors(model_dir) if warm_start else None
+    counter = None
+    if warm_start:
+        counter = TransitionCounter.load(Path(model_dir) / TRANSITION_COUNTS_FILE, connection_types)
+        if counter is not None:
+            print(f"   ✅ 載入累積轉換次數: {len(counter.seen_templates)} 個模板, {counter.num_types} 個節點類型")
+    if counter is None:
+        counter = TransitionCounter(existing[0] if existing else None, connection_types)
+
+    print(f"📥 累積模板轉換: {', '.join(str(d) for d in templates_dirs)}")
+    new_templates, new_transitions = counter.add_templates(templates_dirs)
+    rows, cols, vals = counter.to_coo()
+    print(f"   ✅ 新增 {new_templates} 個模板 / {new_transitions} 條轉換；"
+          f"共 {counter.num_types} 個節點類型, {vals.size} 種轉換")
+    if vals.size == 0:
+        raise ValueError("沒有可用的轉換資料")
+
+    init_P = init_Q = None
+    if existing is not None:
+        old_types, old_P, old_Q = existing
+        if old_P.shape[1] != trainer.num_factors:
+            print(f"   ⚠️  warm start 沿用既有因子維度 {old_P.shape[1]}（忽略 num_factors={trainer.num_factors}）")
+            trainer.num_factors = int(old_P.shape[1])
+        rng = np.random.default_rng(trainer.seed)
+        init_P = _expand_factors(old_types, old_P, counter.node_types, rng)
+        init_Q = _expand_factors(old_types, old_Q, counter.node_types, rng)
+        print(f"   🔁 warm start: {len(old_types)} 個既有節點類型, "
+              f"{counter.num_types - len(set(old_types) & set(counter.node_types))} 個新類型")
+
+    print(f"🏋️  訓練 ({trainer.method.upper()}, k={trainer.num_factors}, iterations={trainer.iterations}, "
+          f"n_jobs={trainer.n_jobs})...")
+    result = trainer.fit(rows, cols, vals, counter.num_types, init_P=init_P, init_Q=init_Q)
+    print(f"   ✅ best_iteration={result['best_iteration']}, "
+          f"train RMSE={result['train_metrics']['rmse']:.4f}, val RMSE={result['val_metrics']['rmse']:.4f}")
+
+    save_model(output_dir, counter.node_types, result, trainer, write_prediction_matrix=write_prediction_matrix)
+    counter.save(output_dir / TRANSITION_COUNTS_FILE)
+    print(f"💾 模型已寫入: {output_dir}")
+
+    result.update({
+        'node_types': counter.node_types,
+        'new_templates': new_templates,
+        'new_transitions': new_transitions
+    })
+    return result
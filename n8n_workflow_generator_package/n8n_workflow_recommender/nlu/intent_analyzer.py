@@ -9,6 +9,67 @@ import json
 from typing import Dict, List, Optional, Set
 from openai import OpenAI
 
+from .nlu_cache import NLUCache, stable_hash
+
+
+NLU_SYSTEM_MESSAGE = "You are an expert NLU engine for workflow automation. Extract structured information accurately."
+
+NLU_PROMPT_TEMPLATE = """You are an expert NLU engine for a workflow automation system. Analyze the user's query and provide:
+
+1. A clear "goal_description" summarizing the overall intent (in English, concise)
+2. A "parameters" object with extracted entities mapped to our ontology
+3. A "function_categories" list - **MUST select from the available categories list below**
+
+--- AVAILABLE FUNCTION CATEGORIES (YOU MUST SELECT FROM THIS LIST) ---
+{categories_list_str}
+
+--- FUNCTION CATEGORIES WITH DESCRIPTIONS ---
+{function_categories_str}
+
+--- AVAILABLE ONTOLOGY SCHEMA (sample) ---
+{ontology_description}
+
+**IMPORTANT**: For "function_categories", you MUST select one or more categories from the available list above. 
+Do NOT create new category names. Only use the exact names from the list.
+
+**Example Output:**
+{{
+  "goal_description": "Design an intelligent email processing workflow",
+  "parameters": {{
+    "email_provider": "gmail",
+    "ai_model": "openai",
+    "calendar_service": "google_calendar"
+  }},
+  "function_categories": ["Customer Engagement & Marketing", "Productivity & Collaboration", "AI, ML & Automation Intelligence"]
+}}
+
+**Note**: The function_categories should be top-level categories from the taxonomy (e.g., "Commerce & Revenue Operations", "Customer Engagement & Marketing", "AI, ML & Automation Intelligence").
+
+Now analyze: "{user_query}"
+
+Return ONLY valid JSON, no other text."""
+
+KEYWORD_PROMPT_TEMPLATE = """
+You are an expert NLU (Natural Language Understanding) assistant. 
+Your task is to extract critical technical keywords, entities, and actions from the user's query. These keywords will be used to search a technical function database (taxonomy).
+
+**Input Context:**
+1.  **User Query:** "{user_query}"
+2.  **NLU Goal:** "{goal_description}"
+3.  **NLU Parameters:** {parameters_json}
+
+**Instructions:**
+1.  Focus on *specific* technical terms, nouns, and actions (e.g., "OCR", "變數", "API呼叫", "JSON", "flow.begin").
+2.  Include key entities from the parameters if they are technical (e.g., "OCR_result", "post_node_execution").
+3.  Avoid generic, conversational words (e.g., "我要設計", "一個流程", "最後有", "結果").
+4.  Keep keywords concise and relevant.
+5.  Include both English and Chinese keywords if applicable.
+
+**Output Format:**
+Return a JSON object with a single key "keywords", which contains a list of unique keyword strings.
+Example: {{"keywords": ["OCR", "變數", "節點執行後", "JSON", "OCR結果"]}}
+"""
+
 
 class IntentAnalyzer:
     """
@@ -17,7 +78,16 @@ class IntentAnalyzer:
     使用 GPT 分析用戶查詢，提取結構化信息。
     """
     
-    def __init__(self, openai_api_key: str, ontology: Optional[Dict] = None, function_categories: Optional[Dict] = None):
+    def __init__(
+        self,
+        openai_api_key: str,
+        ontology: Optional[Dict] = None,
+        function_categories: Optional[Dict] = None,
+        cache: Optional[NLUCache] = None,
+        analysis_model: str = "gpt-4o",
+        keyword_model: str = "gpt-4o-mini",
+        request_timeout: Optional[float] = None
+    ):
         """
         初始化意圖分析器
         
@@ -25,10 +95,39 @@ class IntentAnalyzer:
             openai_api_key: OpenAI API 密鑰
             ontology: Ontology 字典（用於提供參數上下文）
             function_categories: 功能類別字典（用於提供類別上下文）
+            cache: NLU 結果快取（可選，analyze 與 extract_keywords 都會先查詢）
+            analysis_model: analyze 使用的模型
+            keyword_model: extract_keywords 使用的模型
+            request_timeout: 每個 OpenAI 請求的逾時秒數（可選）
         """
-        self.client = OpenAI(api_key=openai_api_key)
+        # client 可跨執行緒共用（generate_workflow 會並行發出多個 LLM 呼叫）
+        if request_timeout:
+            self.client = OpenAI(api_key=openai_api_key, timeout=request_timeout)
+        else:
+            self.client = OpenAI(api_key=openai_api_key)
         self.ontology = ontology or {}
         self.function_categories = function_categories or {}
+        self.cache = cache
+        self.analysis_model = analysis_model
+        self.keyword_model = keyword_model
+        self._context_hash: Optional[str] = None
+    
+    def _get_context_hash(self) -> str:
+        """ontology 樣本與 function_categories 的雜湊（任一變動都會使 analyze 快取失效）"""
+        if self._context_hash is None:
+            ontology_sample = [
+                (node_name, details.get("required_params", [])[:5])
+                for node_name, details in list(self.ontology.items())[:20]
+            ]
+            self._context_hash = stable_hash({
+                "ontology": ontology_sample,
+                "function_categories": self.function_categories
+            })
+        return self._context_hash
+    
+    def get_cache_stats(self) -> Dict:
+        """取得 NLU 快取命中率統計（未啟用快取時返回空字典）"""
+        return self.cache.get_stats() if self.cache is not None else {}
     
     def _build_nlu_prompt(self, user_query: str) -> str:
         """構建 NLU 分析 prompt（動態包含 ontology 和 function_categories）"""
@@ -53,40 +152,12 @@ class IntentAnalyzer:
         if available_categories_list:
             print(f"   - Sample categories: {available_categories_list[:5]}")
         
-        return f"""You are an expert NLU engine for a workflow automation system. Analyze the user's query and provide:
-
-1. A clear "goal_description" summarizing the overall intent (in English, concise)
-2. A "parameters" object with extracted entities mapped to our ontology
-3. A "function_categories" list - **MUST select from the available categories list below**
-
---- AVAILABLE FUNCTION CATEGORIES (YOU MUST SELECT FROM THIS LIST) ---
-{categories_list_str}
-
---- FUNCTION CATEGORIES WITH DESCRIPTIONS ---
-{function_categories_str}
-
---- AVAILABLE ONTOLOGY SCHEMA (sample) ---
-{ontology_description}
-
-**IMPORTANT**: For "function_categories", you MUST select one or more categories from the available list above. 
-Do NOT create new category names. Only use the exact names from the list.
-
-**Example Output:**
-{{
-  "goal_description": "Design an intelligent email processing workflow",
-  "parameters": {{
-    "email_provider": "gmail",
-    "ai_model": "openai",
-    "calendar_service": "google_calendar"
-  }},
-  "function_categories": ["Customer Engagement & Marketing", "Productivity & Collaboration", "AI, ML & Automation Intelligence"]
-}}
-
-**Note**: The function_categories should be top-level categories from the taxonomy (e.g., "Commerce & Revenue Operations", "Customer Engagement & Marketing", "AI, ML & Automation Intelligence").
-
-Now analyze: "{user_query}"
-
-Return ONLY valid JSON, no other text."""
+        return NLU_PROMPT_TEMPLATE.format(
+            categories_list_str=categories_list_str,
+            function_categories_str=function_categories_str,
+            ontology_description=ontology_description,
+            user_query=user_query
+        )
     
     def analyze(self, user_query: str) -> Dict:
         """
@@ -105,13 +176,26 @@ Return ONLY valid JSON, no other text."""
         print("\nSTAGE 0: NLU Analysis (GPT)")
         print(f" - User Query: {user_query}")
         
+        cache_key = None
+        if self.cache is not None:
+            cache_key = NLUCache.make_key(
+                "analyze", user_query, self.analysis_model,
+                stable_hash(NLU_SYSTEM_MESSAGE + NLU_PROMPT_TEMPLATE), self._get_context_hash()
+            )
+            analysis = self.cache.get(cache_key, namespace="analyze")
+            if analysis is not None:
+                print(f" - NLU cache hit")
+                print(f" - Goal: {analysis.get('goal_description', 'N/A')}")
+                print(f" - Function Categories: {analysis.get('function_categories', [])}")
+                return analysis
+        
         try:
             prompt = self._build_nlu_prompt(user_query)
             
             response = self.client.chat.completions.create(
-                model="gpt-4o",  # 使用更強的模型，像原本的程式碼
+                model=self.analysis_model,  # 預設 gpt-4o（使用更強的模型，像原本的程式碼）
                 messages=[
-                    {"role": "system", "content": "You are an expert NLU engine for workflow automation. Extract structured information accurately."},
+                    {"role": "system", "content": NLU_SYSTEM_MESSAGE},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.3,
@@ -142,16 +226,25 @@ Return ONLY valid JSON, no other text."""
             print(f" - Parameters: {list(analysis.get('parameters', {}).keys())}")
             print(f" - Function Categories: {analysis.get('function_categories', [])}")
             
+            # 只快取成功的結果（錯誤時的預設值不寫入）
+            if cache_key is not None:
+                self.cache.put(cache_key, analysis, namespace="analyze")
+            
             return analysis
         
         except Exception as e:
             print(f" - Error in NLU analysis: {e}")
             # 返回默認值
-            return {
-                "goal_description": user_query,
-                "parameters": {},
-                "function_categories": []
-            }
+            return self.fallback_analysis(user_query)
+    
+    @staticmethod
+    def fallback_analysis(user_query: str) -> Dict:
+        """NLU 分析失敗（或逾時）時的默認結果"""
+        return {
+            "goal_description": user_query,
+            "parameters": {},
+            "function_categories": []
+        }
     
     def extract_keywords(self, user_query: str, analysis: Optional[Dict] = None) -> Set[str]:
         """
@@ -166,30 +259,32 @@ Return ONLY valid JSON, no other text."""
         """
         print(" - Extracting keywords with LLM...")
         
-        prompt = f"""
-You are an expert NLU (Natural Language Understanding) assistant. 
-Your task is to extract critical technical keywords, entities, and actions from the user's query. These keywords will be used to search a technical function database (taxonomy).
-
-**Input Context:**
-1.  **User Query:** "{user_query}"
-2.  **NLU Goal:** "{analysis.get('goal_description', 'N/A') if analysis else 'N/A'}"
-3.  **NLU Parameters:** {json.dumps(analysis.get('parameters', {}) if analysis else {}, ensure_ascii=False)}
-
-**Instructions:**
-1.  Focus on *specific* technical terms, nouns, and actions (e.g., "OCR", "變數", "API呼叫", "JSON", "flow.begin").
-2.  Include key entities from the parameters if they are technical (e.g., "OCR_result", "post_node_execution").
-3.  Avoid generic, conversational words (e.g., "我要設計", "一個流程", "最後有", "結果").
-4.  Keep keywords concise and relevant.
-5.  Include both English and Chinese keywords if applicable.
-
-**Output Format:**
-Return a JSON object with a single key "keywords", which contains a list of unique keyword strings.
-Example: {{"keywords": ["OCR", "變數", "節點執行後", "JSON", "OCR結果"]}}
-"""
+        cache_key = None
+        if self.cache is not None:
+            # keyword prompt 依賴 NLU 分析結果，因此以分析內容作為上下文雜湊
+            context_hash = stable_hash({
+                "goal_description": analysis.get('goal_description') if analysis else None,
+                "parameters": analysis.get('parameters', {}) if analysis else {},
+                "function_categories": analysis.get('function_categories', []) if analysis else []
+            })
+            cache_key = NLUCache.make_key(
+                "keywords", user_query, self.keyword_model, stable_hash(KEYWORD_PROMPT_TEMPLATE), context_hash
+            )
+            cached_keywords = self.cache.get(cache_key, namespace="keywords")
+            if cached_keywords is not None:
+                keywords_set = set(cached_keywords)
+                print(f"   - Keyword cache hit: {len(keywords_set)} keywords: {keywords_set}")
+                return keywords_set
+        
+        prompt = KEYWORD_PROMPT_TEMPLATE.format(
+            user_query=user_query,
+            goal_description=analysis.get('goal_description', 'N/A') if analysis else 'N/A',
+            parameters_json=json.dumps(analysis.get('parameters', {}) if analysis else {}, ensure_ascii=False)
+        )
         
         try:
             response = self.client.chat.completions.create(
-                model="gpt-4o-mini",  # 關鍵字提取用 mini 就夠了
+                model=self.keyword_model,  # 預設 gpt-4o-mini（關鍵字提取用 mini 就夠了）
                 messages=[{"role": "user", "content": prompt}],
                 response_format={"type": "json_object"}
             )
@@ -206,18 +301,25 @@ Example: {{"keywords": ["OCR", "變數", "節點執行後", "JSON", "OCR結果"]
                 keywords_set.update([cat for cat in categories if cat])
             
             print(f"   - Extracted {len(keywords_set)} keywords: {keywords_set}")
+            
+            if cache_key is not None:
+                self.cache.put(cache_key, sorted(keywords_set), namespace="keywords")
             return keywords_set
             
         except Exception as e:
             print(f" - LLM Keyword extraction failed: {e}. Falling back to simple extraction.")
-            # 備用方案：簡單提取
-            keywords = set()
-            words = user_query.lower().split()
-            stop_words = {'的', '是', '在', '有', '和', '與', '或', '要', '我', '你', '他', '她', '它', 
-                         'the', 'is', 'are', 'a', 'an', 'and', 'or', 'to', 'of', 'in', 'on', 'at'}
-            for word in words:
-                word = word.strip('.,!?;:()[]{}"\'-')
-                if len(word) > 2 and word not in stop_words:
-                    keywords.add(word)
-            return keywords
+            return self.fallback_keywords(user_query)
+    
+    @staticmethod
+    def fallback_keywords(user_query: str) -> Set[str]:
+        """關鍵字提取失敗（或逾時）時的備用方案：簡單提取"""
+        keywords = set()
+        words = user_query.lower().split()
+        stop_words = {'的', '是', '在', '有', '和', '與', '或', '要', '我', '你', '他', '她', '它', 
+                     'the', 'is', 'are', 'a', 'an', 'and', 'or', 'to', 'of', 'in', 'on', 'at'}
+        for word in words:
+            word = word.strip('.,!?;:()[]{}"\'-')
+            if len(word) > 2 and word not in stop_words:
+                keywords.add(word)
+        return keywords
 
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+NLU 結果快取
+
+以 SQLite 持久化 IntentAnalyzer 的 LLM 結果（analyze / extract_keywords），
+鍵由正規化查詢 + 模型 + prompt 模板雜湊 + ontology / 類別雜湊組成，
+支持 TTL 過期、筆數上限淘汰（最久未使用優先）與命中率統計。
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+
+def normalize_query(query: str) -> str:
+    """
+    正規化查詢字串（NFKC、去除首尾空白、合併連續空白、大小寫折疊）
+
+    Args:
+        query: 原始查詢
+
+    Returns:
+        normalized: 正規化後的查詢
+    """
+    query = unicodedata.normalize("NFKC", query or "")
+    return " ".join(query.split()).casefold()
+
+
+def stable_hash(obj: Any) -> str:
+    """計算任意 JSON 可序列化物件的穩定雜湊（鍵排序）"""
+    if not isinstance(obj, str):
+        obj = json.dumps(obj, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(obj.encode('utf-8')).hexdigest()
+
+
+class NLUCache:
+    """
+    SQLite 持久化 NLU 快取
+
+    資料表 nlu_cache(key, namespace, value, created_at, last_access, hits)。
+    同一個 NLUCache 可以被多個執行緒共用（內部以 lock 保護連線）。
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+        max_entries: int = 10000,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Args:
+            db_path: SQLite 檔案路徑（":memory:" 表示不持久化）
+            ttl_seconds: 項目存活時間（None 或 <= 0 表示不過期）
+            max_entries: 最大筆數（超過時淘汰最久未使用的項目）
+            clock: 取得目前時間（秒）的函數，用於 TTL 與最近使用時間（測試時可注入）
+        """
+        self.db_path = str(db_path)
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self.max_entries = max(1, int(max_entries))
+        self.clock = clock
+
+        if self.db_path != ":memory:":
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._lock:
+            if self.db_path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS nlu_cache (
+                    key TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_nlu_cache_last_access ON nlu_cache(last_access)")
+            self._conn.commit()
+
+        # 命中率統計（以 namespace 分組，進程內計數）
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def make_key(
+        namespace: str,
+        query: str,
+        model: str,
+        template_hash: str,
+        context_hash: str
+    ) -> str:
+        """
+        計算快取鍵
+
+        Args:
+            namespace: 快取類型（例如 "analyze"、"keywords"）
+            query: 用戶查詢（會先正規化）
+            model: LLM 模型名稱
+            template_hash: prompt 模板雜湊
+            context_hash: ontology / 類別等上下文雜湊
+
+        Returns:
+            key: 快取鍵
+        """
+        raw = "|".join([namespace, normalize_query(query), model, template_hash, context_hash])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _count(self, namespace: str, field: str):
+        stats = self._stats.setdefault(namespace, {"hits": 0, "misses": 0, "expired": 0, "writes": 0, "evictions": 0})
+        stats[field] += 1
+
+    def get(self, key: str, namespace: str = "default") -> Optional[Any]:
+        """
+        讀取快取（過期項目視為未命中並刪除）
+
+        Args:
+            key: 快取鍵
+            namespace: 快取類型（用於統計）
+
+        Returns:
+            value: 快取值，未命中時返回 None
+        """
+        now = self.clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM nlu_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._count(namespace, "misses")
+                return None
+
+            value, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM nlu_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self._count(namespace, "expired")
+                self._count(namespace, "misses")
+                return None
+
+            self._conn.execute(
+                "UPDATE nlu_cache SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self._count(namespace, "hits")
+
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return None
+
+    def put(self, key: str, value: Any, namespace: str = "default"):
+        """
+        寫入快取（超過 max_entries 時淘汰最久未使用的項目）
+
+        Args:
+            key: 快取鍵
+            value: JSON 可序列化的值
+            namespace: 快取類型
+        """
+        now = self.clock()
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO nlu_cache (key, namespace, value, created_at, last_access, hits) "
+                "VALUES (?, ?, ?, ?, ?, 0)",
+                (key, namespace, payload, now, now)
+            )
+            self._count(namespace, "writes")
+
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM nlu_cache").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM nlu_cache WHERE key IN "
+                    "(SELECT key FROM nlu_cache ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,)
+                )
+                for _ in range(overflow):
+                    self._count(namespace, "evictions")
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """
+        刪除所有過期項目
+
+        Returns:
+            removed: 刪除的筆數
+        """
+        if self.ttl_seconds is None:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM nlu_cache WHERE created_at < ?", (self.clock() - self.ttl_seconds,)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def clear(self):
+        """清空快取"""
+        with self._lock:
+            self._conn.execute("DELETE FROM nlu_cache")
+            self._conn.commit()
+
+    def get_stats(self) -> Dict:
+        """
+        取得命中率統計
+
+        Returns:
+            stats: {"entries", "hits", "misses", "hit_rate", "by_namespace": {...}}
+        """
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM nlu_cache").fetchone()
+            by_namespace = {}
+            for namespace, stats in self._stats.items():
+                total = stats["hits"] + stats["misses"]
+                by_namespace[namespace] = {**stats, "hit_rate": stats["hits"] / total if total else 0.0}
+
+        hits = sum(s["hits"] for s in by_namespace.values())
+        misses = sum(s["misses"] for s in by_namespace.values())
+        return {
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "by_namespace": by_namespace
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
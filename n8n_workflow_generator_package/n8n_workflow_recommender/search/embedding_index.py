@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Embedding 索引
+
+將文字的 embedding 預先計算並保存到磁碟（.npy 矩陣 + JSON manifest），
+載入時使用 memory-map，多個 worker process 可以共享同一份唯讀頁面。
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from ..utils.file_loader import atomic_write_bytes
+
+
+# 索引格式版本（格式變動時遞增，舊索引會自動重建）
+INDEX_FORMAT_VERSION = 1
+
+SUPPORTED_DTYPES = ("float32", "float16")
+
+
+def hash_file(file_path: str) -> str:
+    """
+    計算檔案內容的 SHA-256
+
+    Args:
+        file_path: 檔案路徑
+
+    Returns:
+        digest: 十六進位雜湊字串
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compute_index_key(source_hash: str, model_name: str, dtype: str) -> str:
+    """
+    計算索引鍵：來源數據雜湊 + 模型名稱 + 數據型別 + 格式版本
+
+    Args:
+        source_hash: 來源數據（例如 taxonomy JSON）的雜湊
+        model_name: SentenceTransformer 模型名稱
+        dtype: 矩陣數據型別（float32 / float16）
+
+    Returns:
+        key: 索引鍵
+    """
+    raw = f"v{INDEX_FORMAT_VERSION}|{source_hash}|{model_name}|{dtype}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class EmbeddingIndex:
+    """
+    磁碟 Embedding 索引
+
+    檔案佈局（位於 index_dir）：
+        {name}.npy   - (N, dim) embedding 矩陣（float32 或 float16，已 L2 正規化）
+        {name}.json  - manifest：key、模型名稱、dtype、texts、paths
+    """
+
+    def __init__(self, embeddings: np.ndarray, manifest: Dict):
+        """
+        Args:
+            embeddings: embedding 矩陣（通常是唯讀 memmap）
+            manifest: 索引 manifest
+        """
+        self.embeddings = embeddings
+        self.manifest = manifest
+        self.texts: List[str] = manifest.get("texts", [])
+        self.paths: List[str] = manifest.get("paths", [])
+        self.text_to_row: Dict[str, int] = {text: i for i, text in enumerate(self.texts)}
+
+    @property
+    def key(self) -> str:
+        return self.manifest.get("key", "")
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """取得某段文字的 embedding（float32 view / copy），不存在時返回 None"""
+        row = self.text_to_row.get(text)
+        if row is None:
+            return None
+        return np.asarray(self.embeddings[row], dtype=np.float32)
+
+    @staticmethod
+    def _files(index_dir: Path, name: str):
+        return index_dir / f"{name}.npy", index_dir / f"{name}.json"
+
+    @classmethod
+    def load(
+        cls,
+        index_dir: str,
+        name: str,
+        key: str,
+        expected_texts: Optional[List[str]] = None
+    ) -> Optional["EmbeddingIndex"]:
+        """
+        載入索引（memory-mapped）
+
+        Args:
+            index_dir: 索引目錄
+            name: 索引名稱
+            key: 預期的索引鍵（不一致時視為過期）
+            expected_texts: 預期的文字列表（不一致時視為過期）
+
+        Returns:
+            index: 索引，如果不存在或已過期則返回 None
+        """
+        matrix_path, manifest_path = cls._files(Path(index_dir), name)
+        if not matrix_path.exists() or not manifest_path.exists():
+            return None
+
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        if manifest.get("key") != key:
+            return None
+        if expected_texts is not None and manifest.get("texts") != list(expected_texts):
+            return None
+
+        try:
+            embeddings = np.load(matrix_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+        if embeddings.ndim != 2 or embeddings.shape[0] != len(manifest.get("texts", [])):
+            return None
+
+        return cls(embeddings, manifest)
+
+    @classmethod
+    def build(
+        cls,
+        index_dir: str,
+        name: str,
+        key: str,
+        texts: List[str],
+        encode_fn: Callable[[List[str]], np.ndarray],
+        paths: Optional[List[str]] = None,
+        dtype: str = "float32",
+        metadata: Optional[Dict] = None
+    ) -> "EmbeddingIndex":
+        """
+        編碼所有文字並寫入索引，寫入完成後以 memmap 重新載入
+
+        Args:
+            index_dir: 索引目錄
+            name: 索引名稱
+            key: 索引鍵
+            texts: 要編碼的文字列表
+            encode_fn: 編碼函數，輸入文字列表、輸出 (N, dim) 矩陣
+            paths: 每段文字對應的 taxonomy 路徑（可選）
+            dtype: 矩陣數據型別（float32 / float16）
+            metadata: 其他寫入 manifest 的資訊
+
+        Returns:
+            index: 新建立的索引
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"不支援的 embedding dtype: {dtype}（可用: {SUPPORTED_DTYPES}）")
+
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        matrix_path, manifest_path = cls._files(index_dir, name)
+
+        embeddings = np.asarray(encode_fn(list(texts)), dtype=np.float32)
+        if embeddings.ndim == 1:
+            embeddings = embeddings.reshape(len(texts), -1)
+
+        # L2 正規化，之後 cosine similarity 只需要內積
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.maximum(norms, 1e-12)
+        embeddings = embeddings.astype(dtype)
+
+        manifest = {
+            "key": key,
+            "format_version": INDEX_FORMAT_VERSION,
+            "dtype": dtype,
+            "dim": int(embeddings.shape[1]) if embeddings.size else 0,
+            "count": len(texts),
+            "normalized": True,
+            "texts": list(texts),
+            "paths": list(paths) if paths is not None else [],
+            **(metadata or {})
+        }
+
+        # 先寫矩陣再寫 manifest：manifest 存在且 key 一致才代表索引完整
+        atomic_write_bytes(matrix_path, lambda f: np.save(f, embeddings))
+        atomic_write_bytes(
+            manifest_path,
+            lambda f: f.write(json.dumps(manifest, ensure_ascii=False).encode('utf-8'))
+        )
+
+        return cls(np.load(matrix_path, mmap_mode='r'), manifest)
+
+    @classmethod
+    def load_or_build(
+        cls,
+        index_dir: str,
+        name: str,
+        key: str,
+        texts: List[str],
+        encode_fn: Callable[[List[str]], np.ndarray],
+        paths: Optional[List[str]] = None,
+        dtype: str = "float32",
+        metadata: Optional[Dict] = None
+    ) -> "EmbeddingIndex":
+        """
+        載入索引；如果不存在或已過期（來源數據、模型或文字變動），則重建
+
+        Returns:
+            index: 可用的索引
+        """
+        index = cls.load(index_dir, name, key, expected_texts=texts)
+        if index is not None:
+            print(f"   ✅ 載入 embedding 索引: {Path(index_dir) / name}.npy ({len(index)} 筆, {index.manifest.get('dtype')})")
+            return index
+
+        print(f"   📊 建立 embedding 索引: {Path(index_dir) / name}.npy ({len(texts)} 筆)...")
+        return cls.build(index_dir, name, key, texts, encode_fn, paths=paths, dtype=dtype, metadata=metadata)
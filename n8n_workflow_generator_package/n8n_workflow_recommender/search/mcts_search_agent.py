@@ -7,19 +7,30 @@ MCTS 搜索代理
 
 import json
 import math
+import multiprocessing
 import numpy as np
 import os
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Set, Optional, Tuple
-from sentence_transformers import SentenceTransformer, util
-import torch
+
+from .embedding_index import EmbeddingIndex, compute_index_key, hash_file
+from .mcts_tree import ConvergenceCriterion, MCTSTree, run_tree_worker
+from ..utils.embedding_service import EmbeddingService, get_embedding_service
 
 # 避免 huggingface tokenizers 的警告
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
+# 搜索結果必須覆蓋的關鍵類別（以子字串比對路徑、描述與 mapped node types）
+CRITICAL_CATEGORIES = ('SMS', 'Email', 'Payment', 'Database', 'API')
+
 
 class MCTSNode:
     """MCTS 節點"""
+    __slots__ = ('name', 'parent', 'taxonomy_data', 'children', 'visits', 'total_reward')
+    
     def __init__(self, name, parent=None, taxonomy_data=None):
         self.name = name
         self.parent = parent
@@ -52,24 +63,45 @@ class TaxonomySearchAgent:
     使用 MCTS 算法在 n8n taxonomy 中搜索相關節點。
     """
     
-    def __init__(self, taxonomy_path: str, model_name: str = "paraphrase-multilingual-mpnet-base-v2"):
+    def __init__(
+        self,
+        taxonomy_path: str,
+        model_name: str = "paraphrase-multilingual-mpnet-base-v2",
+        embedding_cache_dir: Optional[str] = None,
+        embedding_dtype: str = "float32",
+        embedding_service: Optional[EmbeddingService] = None,
+        snapshot_state: Optional[Dict] = None
+    ):
         """
         初始化搜索代理
         
         Args:
             taxonomy_path: MCTS 格式的 taxonomy JSON 檔案路徑
             model_name: SentenceTransformer 模型名稱
+            embedding_cache_dir: embedding 索引目錄（預設為 taxonomy 同層的 embedding_cache/）
+            embedding_dtype: 索引矩陣的數據型別（float32 / float16）
+            embedding_service: 共享的 embedding 服務（預設從進程內註冊表取得）
+            snapshot_state: snapshot_state() 的結果（可選，提供時不再解析 taxonomy JSON）
         """
         print("PHASE 1A: Initializing Taxonomy Search Agent (MCTS)...")
-        device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.model = SentenceTransformer(model_name, device=device)
-        # ✅ 優化：緩存 use_case embeddings，避免重複計算
-        self.use_case_embedding_cache = {}  # {use_case_text: embedding}
-        self._prepare_data(taxonomy_path)
+        self.embedding_service = embedding_service or get_embedding_service(model_name)
+        self.model_name = self.embedding_service.model_name
+        self.embedding_cache_dir = (
+            Path(embedding_cache_dir) if embedding_cache_dir
+            else Path(taxonomy_path).parent / "embedding_cache"
+        )
+        self.embedding_dtype = embedding_dtype
+        if snapshot_state is not None:
+            self._restore_prepared_data(taxonomy_path, snapshot_state)
+        else:
+            self._prepare_data(taxonomy_path)
         print(" - MCTS Taxonomy data prepared.")
         
         # === 新增：儲存 LLM 選擇的目標節點（供 R_category 使用）===
         self.llm_selected_nodes = set()
+        
+        # 最近一次搜索的統計（迭代次數、是否提前收斂等）
+        self.last_search_stats: Dict = {}
     
     def _is_leaf_node(self, node_content: Dict) -> bool:
         """檢查是否為葉子節點（包含 Nodes 或 mapped_nodes）"""
@@ -105,6 +137,7 @@ class TaxonomySearchAgent:
         
         self.node_database = []
         texts_to_encode = []
+        text_paths = []
         
         def traverse(node_name: str, node_content: Dict, current_path: List[str]):
             """遞歸遍歷 taxonomy（為所有節點生成 embedding）"""
@@ -123,6 +156,7 @@ class TaxonomySearchAgent:
             
             # 為所有節點（包括中間節點）生成 embedding
             texts_to_encode.append(combined_text)
+            text_paths.append(full_path_str)
             
             if self._is_leaf_node(node_content):
                 # 保存 example_use_cases（如果有的話，舊格式才有）
@@ -156,10 +190,24 @@ class TaxonomySearchAgent:
         for root_key, root_content in taxonomy_root.items():
             traverse(root_key, root_content, [])
         
-        # 生成 embeddings
-        print(f"   📊 編碼 {len(texts_to_encode)} 個節點描述...")
-        embeddings = self.model.encode(texts_to_encode, convert_to_tensor=True, show_progress_bar=True)
-        self.text_embedding_map = {text: emb for text, emb in zip(texts_to_encode, embeddings)}
+        # 建立 O(1) 查找索引（路徑、mapped node type、第一層分類）
+        self._build_lookup_indexes()
+        
+        # 虛擬根節點 "Taxonomy" 的描述（與所有節點一起寫入 embedding 索引）
+        virtual_root_description = "n8n Taxonomy: Complete workflow automation node categories"
+        virtual_root_combined_text = f"Taxonomy: {virtual_root_description}"
+        if virtual_root_combined_text not in texts_to_encode:
+            texts_to_encode.append(virtual_root_combined_text)
+            text_paths.append("Taxonomy")
+        
+        # 生成 embeddings：優先載入磁碟索引（memory-mapped），taxonomy 或模型變動時自動重建
+        self.embedding_index = self._load_embedding_index(taxonomy_path, texts_to_encode, text_paths)
+        self.text_embedding_map = {
+            text: self.embedding_index.get(text) for text in self.embedding_index.texts
+        }
+        
+        # 所有 example_use_cases 一次編碼成單一矩陣（關鍵字匹配只需一次矩陣-向量乘積）
+        self._prepare_use_case_matrix(taxonomy_path)
         
         # 構建 MCTS 樹
         def build_mcts_tree(node_name: str, node_content: Dict, current_path: List[str]) -> Dict:
@@ -181,6 +229,7 @@ class TaxonomySearchAgent:
             
             processed_node = {
                 'embedding': embedding,
+                'combined_text': combined_text,
                 'description': description,
                 'mapped_nodes': node_content.get("Nodes", node_content.get("mapped_nodes", [])),
                 'children': {},
@@ -216,26 +265,594 @@ class TaxonomySearchAgent:
             if isinstance(root_content, dict):
                 virtual_root_children[root_key] = build_mcts_tree(root_key, root_content, [])
         
-        # 為虛擬根節點創建一個描述和 embedding
-        virtual_root_description = "n8n Taxonomy: Complete workflow automation node categories"
-        virtual_root_combined_text = f"Taxonomy: {virtual_root_description}"
-        
-        # 為虛擬根節點生成 embedding（如果還沒有的話）
-        if virtual_root_combined_text not in self.text_embedding_map:
-            virtual_root_embedding = self.model.encode(virtual_root_combined_text, convert_to_tensor=True)
-            self.text_embedding_map[virtual_root_combined_text] = virtual_root_embedding
-        
         # 構建虛擬根節點
         self.mcts_taxonomy_tree = {
             "Taxonomy": {
                 'embedding': self.text_embedding_map.get(virtual_root_combined_text),
+                'combined_text': virtual_root_combined_text,
                 'description': virtual_root_description,
                 'mapped_nodes': [],
                 'children': virtual_root_children,
                 'is_leaf': False
             }
         }
+        
+        # 為樹中每個節點分配整數 node_id，建立以 node_id 為索引的陣列（供批次獎勵計算）
+        self._index_search_tree()
+    
+    def snapshot_state(self) -> Dict:
+        """
+        取得 _prepare_data 產生的、與 embedding 模型無關的結構（供 orchestrator snapshot 使用）
+        
+        MCTS 樹不含 embedding，還原時依 combined_text 從 embedding 索引重新取得。
+        
+        Returns:
+            state: 可 pickle 的字典
+        """
+        def strip_tree(data: Dict) -> Dict:
+            node = {k: v for k, v in data.items() if k not in ('embedding', 'children', 'node_id')}
+            node['children'] = {name: strip_tree(child) for name, child in data.get('children', {}).items()}
+            return node
+        
+        return {
+            'raw_taxonomy_for_search': self.raw_taxonomy_for_search,
+            'node_database': self.node_database,
+            'db_index_by_path': self._db_index_by_path,
+            'db_indices_by_prefix': self._db_indices_by_prefix,
+            'db_indices_by_mapped_type': self._db_indices_by_mapped_type,
+            'db_indices_by_category': self._db_indices_by_category,
+            'db_indices_by_critical_category': self._db_indices_by_critical_category,
+            'db_keyword_texts': self._db_keyword_texts,
+            'embedding_texts': list(self.embedding_index.texts),
+            'embedding_paths': list(self.embedding_index.paths),
+            'mcts_taxonomy_tree': {name: strip_tree(data) for name, data in self.mcts_taxonomy_tree.items()},
+        }
+    
+    def _restore_prepared_data(self, taxonomy_path: str, state: Dict):
+        """
+        從 snapshot_state() 還原 taxonomy 數據（取代 _prepare_data）
+        
+        embedding 仍從磁碟索引（memory-mapped）載入，模型變動時照常重建。
+        
+        Args:
+            taxonomy_path: taxonomy JSON 檔案路徑（embedding 索引鍵使用其內容雜湊）
+            state: snapshot_state() 的結果
+        """
+        self.raw_taxonomy_for_search = state['raw_taxonomy_for_search']
+        self.node_database = state['node_database']
+        self._db_index_by_path = state['db_index_by_path']
+        self._db_indices_by_prefix = state['db_indices_by_prefix']
+        self._db_indices_by_mapped_type = state['db_indices_by_mapped_type']
+        self._db_indices_by_category = state['db_indices_by_category']
+        self._db_indices_by_critical_category = state['db_indices_by_critical_category']
+        self._db_keyword_texts = state['db_keyword_texts']
+        
+        self.embedding_index = self._load_embedding_index(
+            taxonomy_path, state['embedding_texts'], state['embedding_paths']
+        )
+        self.text_embedding_map = {
+            text: self.embedding_index.get(text) for text in self.embedding_index.texts
+        }
+        self._prepare_use_case_matrix(taxonomy_path)
+        
+        # 重新掛上 embedding（與 build_mcts_tree 相同的查找方式）
+        self.mcts_taxonomy_tree = state['mcts_taxonomy_tree']
+        stack = list(self.mcts_taxonomy_tree.values())
+        while stack:
+            data = stack.pop()
+            data['embedding'] = self.text_embedding_map.get(data.get('combined_text'))
+            stack.extend(data.get('children', {}).values())
+        
+        self._index_search_tree()
+    
+    @staticmethod
+    def _first_level_category(path_str: str) -> str:
+        """從路徑中提取第一層分類（去掉數字前綴）"""
+        parts = path_str.split(" -> ")
+        if parts:
+            first_part = parts[0]
+            # 去掉數字前綴（例如："6 AI, ML & Automation Intelligence" -> "AI, ML & Automation Intelligence"）
+            first_parts = first_part.split(' ', 1)
+            if len(first_parts) == 2 and first_parts[0].isdigit():
+                return first_parts[1]
+            return first_part
+        return "Unknown"
+    
+    def _build_lookup_indexes(self):
+        """
+        為 node_database 建立查找字典（取代逐一掃描 node_database）
+        
+        - _db_index_by_path: {path_str: index}（重複路徑保留第一筆，與線性掃描一致）
+        - _db_indices_by_prefix: {父路徑前綴: [index, ...]}
+        - _db_indices_by_mapped_type: {node type: [index, ...]}
+        - _db_indices_by_category: {第一層分類: [index, ...]}
+        - _db_indices_by_critical_category: {CRITICAL_CATEGORIES 中的類別: [index, ...]}
+          （與 _has_category_match 相同的子字串比對，類別固定所以可預先建立）
+        - _db_keyword_texts: 每個節點小寫化的「路徑 描述 mapped nodes」文字（關鍵字掃描用）
+        
+        列表皆依 node_database 順序排列。
+        """
+        self._db_index_by_path: Dict[str, int] = {}
+        self._db_indices_by_prefix: Dict[str, List[int]] = {}
+        self._db_indices_by_mapped_type: Dict[str, List[int]] = {}
+        self._db_indices_by_category: Dict[str, List[int]] = {}
+        self._db_indices_by_critical_category: Dict[str, List[int]] = {c: [] for c in CRITICAL_CATEGORIES}
+        self._db_keyword_texts: List[str] = []
+        
+        for i, item in enumerate(self.node_database):
+            path_str = item.get("path_str", "")
+            self._db_index_by_path.setdefault(path_str, i)
+            
+            parts = path_str.split(" -> ")
+            for depth in range(1, len(parts)):
+                self._db_indices_by_prefix.setdefault(" -> ".join(parts[:depth]), []).append(i)
+            
+            for node_type in dict.fromkeys(item.get("mapped_nodes", [])):
+                self._db_indices_by_mapped_type.setdefault(node_type, []).append(i)
+            
+            self._db_indices_by_category.setdefault(self._first_level_category(path_str), []).append(i)
+            
+            for category in CRITICAL_CATEGORIES:
+                if self._has_category_match(item, [category]):
+                    self._db_indices_by_critical_category[category].append(i)
+            
+            mapped_nodes = " ".join(item.get('mapped_nodes', []))
+            self._db_keyword_texts.append(f"{path_str} {item.get('description', '')} {mapped_nodes}".lower())
+    
+    def get_node_by_path(self, path_str: str) -> Optional[Dict]:
+        """
+        以路徑查找 node_database 節點（O(1)）
+        
+        Args:
+            path_str: taxonomy 路徑（可包含 "Taxonomy -> " 前綴）
+        
+        Returns:
+            db_node: 節點字典，找不到時返回 None
+        """
+        if path_str.startswith("Taxonomy -> "):
+            path_str = path_str[len("Taxonomy -> "):]
+        index = self._db_index_by_path.get(path_str)
+        return self.node_database[index] if index is not None else None
+    
+    def get_nodes_by_mapped_type(self, node_type: str) -> List[Dict]:
+        """取得 mapped_nodes 包含指定 node type 的所有節點"""
+        return [self.node_database[i] for i in self._db_indices_by_mapped_type.get(node_type, [])]
+    
+    def get_nodes_by_category(self, category: str) -> List[Dict]:
+        """取得屬於指定第一層分類（不含數字前綴）的所有節點"""
+        return [self.node_database[i] for i in self._db_indices_by_category.get(category, [])]
+    
+    def _get_nodes_under_prefix(self, prefix_path: str, min_depth: int) -> List[Dict]:
+        """取得路徑以 prefix_path 開頭、且深度至少為 min_depth 的節點"""
+        return [
+            self.node_database[i] for i in self._db_indices_by_prefix.get(prefix_path, [])
+            if self.node_database[i]["path_str"].count(" -> ") + 1 >= min_depth
+        ]
+    
+    def _get_nodes_sharing_mapped_types(self, mapped_nodes: List[str]) -> List[Dict]:
+        """取得與 mapped_nodes 至少共享一個 node type 的節點（依 node_database 順序）"""
+        indices = set()
+        for node_type in mapped_nodes:
+            indices.update(self._db_indices_by_mapped_type.get(node_type, []))
+        return [self.node_database[i] for i in sorted(indices)]
+    
+    def _index_search_tree(self):
+        """
+        以 BFS 順序為 MCTS 樹的每個節點分配 node_id（虛擬根節點為 0），
+        並建立以 node_id 為索引的陣列：
+        
+        - tree_nodes: taxonomy_data 字典
+        - tree_names: 節點鍵（MCTSNode.name）
+        - tree_paths: MCTS 路徑字串（以節點鍵組成，含 "Taxonomy -> " 前綴）
+        - tree_paths_lower: 小寫化的 tree_paths（numpy 字串陣列，類別獎勵以 np.char.find 比對）
+        - tree_parent / tree_is_leaf: 父節點與葉子標記
+        - tree_db_index: 對應 node_database 的索引（找不到為 -1）
+        - tree_embeddings / tree_has_embedding: 節點 embedding 矩陣（已正規化）
+        """
+        root_name = "Taxonomy"
+        db_index_by_path = self._db_index_by_path
+        
+        self.tree_nodes: List[Dict] = []
+        self.tree_names: List[str] = []
+        self.tree_paths: List[str] = []
+        parents: List[int] = []
+        
+        queue = [(root_name, self.mcts_taxonomy_tree[root_name], -1, root_name)]
+        head = 0
+        while head < len(queue):
+            name, data, parent_id, path_str = queue[head]
+            head += 1
+            node_id = len(self.tree_nodes)
+            data['node_id'] = node_id
+            self.tree_nodes.append(data)
+            self.tree_names.append(name)
+            self.tree_paths.append(path_str)
+            parents.append(parent_id)
+            for child_name, child_data in data.get('children', {}).items():
+                queue.append((child_name, child_data, node_id, f"{path_str} -> {child_name}"))
+        
+        num_nodes = len(self.tree_nodes)
+        self.tree_paths_lower = np.array([path_str.lower() for path_str in self.tree_paths])
+        self.tree_parent = np.asarray(parents, dtype=np.int32)
+        self.tree_is_leaf = np.asarray([bool(d.get('is_leaf', False)) for d in self.tree_nodes], dtype=bool)
+        
+        # node_database 的 path_str 不包含 "Taxonomy -> " 前綴
+        prefix = f"{root_name} -> "
+        self.tree_db_index = np.full(num_nodes, -1, dtype=np.int32)
+        for node_id, path_str in enumerate(self.tree_paths):
+            search_path = path_str[len(prefix):] if path_str.startswith(prefix) else path_str
+            self.tree_db_index[node_id] = db_index_by_path.get(search_path, -1)
+        
+        dim = self.embedding_index.embeddings.shape[1] if len(self.embedding_index) else 0
+        self.tree_embeddings = np.zeros((num_nodes, dim), dtype=np.float32)
+        self.tree_has_embedding = np.zeros(num_nodes, dtype=bool)
+        for node_id, data in enumerate(self.tree_nodes):
+            embedding = data.get('embedding')
+            if embedding is not None:
+                self.tree_embeddings[node_id] = np.asarray(embedding, dtype=np.float32)
+                self.tree_has_embedding[node_id] = True
+        
+        # 陣列化的 MCTS 樹（結構共享；每個執行緒擁有自己的統計量）
+        self.search_tree = MCTSTree(self.tree_parent)
+        self._thread_local = threading.local()
+        
+        # Root-parallel MCTS 的 process pool（第一次使用 workers > 1 時才建立）
+        self._mcts_pool: Optional[ProcessPoolExecutor] = None
+        self._mcts_pool_workers = 0
+        self._mcts_pool_lock = threading.Lock()
+    
+    @property
+    def llm_selected_nodes(self) -> Set[str]:
+        """LLM 選擇的目標節點（供 R_category 使用；每個執行緒各自一份，多個查詢可並行搜索）"""
+        return getattr(self._thread_local, 'llm_selected_nodes', set())
+    
+    @llm_selected_nodes.setter
+    def llm_selected_nodes(self, nodes: Set[str]):
+        self._thread_local.llm_selected_nodes = nodes
+    
+    def _get_search_tree(self) -> MCTSTree:
+        """取得目前執行緒專用的 MCTS 樹（首次使用時從共享結構複製）"""
+        tree = getattr(self._thread_local, 'tree', None)
+        if tree is None:
+            tree = self.search_tree.clone_structure()
+            self._thread_local.tree = tree
+        return tree
+    
+    def _get_mcts_pool(self, workers: int) -> ProcessPoolExecutor:
+        """取得（或建立）root-parallel MCTS 的 process pool"""
+        with self._mcts_pool_lock:
+            if self._mcts_pool is None or self._mcts_pool_workers != workers:
+                if self._mcts_pool is not None:
+                    self._mcts_pool.shutdown(wait=True)
+                # 使用 spawn：worker 只需要 numpy，不繼承已載入的 embedding 模型與執行緒狀態
+                self._mcts_pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                self._mcts_pool_workers = workers
+            return self._mcts_pool
+    
+    def close(self):
+        """關閉 root-parallel MCTS 的 process pool"""
+        with self._mcts_pool_lock:
+            if self._mcts_pool is not None:
+                self._mcts_pool.shutdown(wait=True)
+                self._mcts_pool = None
+                self._mcts_pool_workers = 0
+    
+    @staticmethod
+    def _make_seed_sequence(seed: Optional[int], semantic_query: str) -> np.random.SeedSequence:
+        """
+        由 seed 與查詢內容衍生這次搜索的 SeedSequence
+        
+        指定 seed 時，同一查詢每次得到相同的隨機序列；未指定時使用系統熵。
+        """
+        if seed is None:
+            return np.random.SeedSequence()
+        return np.random.SeedSequence([int(seed), zlib.crc32(semantic_query.encode('utf-8'))])
+    
+    def _run_root_parallel(
+        self,
+        reward_table: np.ndarray,
+        iterations: int,
+        workers: int,
+        seed_sequence: np.random.SeedSequence,
+        convergence: Optional[ConvergenceCriterion] = None,
+        noise: float = 0.0
+    ) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Root-parallel MCTS：workers 棵獨立的樹各自執行 iterations 次迭代，最後合併統計量
+        
+        獎勵表是確定性的，只有 expansion 的隨機順序不足以讓各棵樹分岔；
+        noise > 0 時每棵樹以自己的隨機序列擾動 UCT 的平均獎勵，探索不同的分支。
+        
+        Args:
+            reward_table: 以 node_id 為索引的獎勵表
+            iterations: 每棵樹的迭代次數
+            workers: 樹（process）的數量
+            seed_sequence: 這次搜索的 SeedSequence（每棵樹 spawn 一個子序列）
+            convergence: 提前停止條件（每棵樹各自判斷）
+            noise: selection 擾動標準差（見 MCTSTree.select_best_child）
+        
+        Returns:
+            (visits, total_reward, iterations_used): 所有樹加總後的統計量陣列與總迭代次數
+        """
+        child_seeds = seed_sequence.spawn(workers)
+        pool = self._get_mcts_pool(workers)
+        futures = [
+            pool.submit(run_tree_worker, self.tree_parent, reward_table, iterations, child_seed,
+                        convergence=convergence, noise=noise)
+            for child_seed in child_seeds
+        ]
+        
+        visits = np.zeros(len(self.tree_nodes), dtype=np.int64)
+        total_reward = np.zeros(len(self.tree_nodes), dtype=np.float64)
+        iterations_used = 0
+        # 依提交順序合併，浮點加總順序固定，結果可重現
+        for future in futures:
+            tree_visits, tree_total, tree_iterations, reason = future.result()
+            visits += tree_visits
+            total_reward += tree_total
+            iterations_used += tree_iterations
+            if convergence is not None and reason and not convergence.reason:
+                convergence.reason = reason
+        return visits, total_reward, iterations_used
+    
+    def _materialize_visited_nodes(self, visits: np.ndarray, total_reward: np.ndarray) -> MCTSNode:
+        """
+        將陣列樹中已訪問的節點轉為 MCTSNode（只在搜索結束後為結果收集建立物件）
+        
+        Args:
+            visits: 以 node_id 為索引的訪問次數
+            total_reward: 以 node_id 為索引的累積獎勵
+        
+        Returns:
+            root: 虛擬根節點 "Taxonomy" 對應的 MCTSNode
+        """
+        tree = self.search_tree
+        
+        def make(node_id: int, parent: Optional[MCTSNode]) -> MCTSNode:
+            node = MCTSNode(self.tree_names[node_id], parent, self.tree_nodes[node_id])
+            node.visits = int(visits[node_id])
+            node.total_reward = float(total_reward[node_id])
+            return node
+        
+        root = make(0, None)
+        stack = [(0, root)]
+        while stack:
+            node_id, node = stack.pop()
+            start = tree.first_child[node_id]
+            for child_id in range(start, start + tree.num_children[node_id]):
+                if visits[child_id] > 0:
+                    child = make(child_id, node)
+                    node.children.append(child)
+                    stack.append((child_id, child))
+        return root
+    
+    def _compute_reward_table(
+        self,
+        query_embedding: np.ndarray,
+        function_categories: List[str],
+        extracted_keywords: Optional[Set[str]],
+        llm_selected_nodes: Set[str]
+    ) -> Dict[str, np.ndarray]:
+        """
+        一次性計算所有 taxonomy 節點的 semantic / category / keyword 獎勵
+        
+        與逐次迭代計算（_evaluate_node_reward）的結果相同，但每個查詢只計算一次，
+        MCTS 迴圈中只需以 node_id 查表。
+        
+        Returns:
+            table: {"semantic": [...], "category": [...], "keyword": [...], "total": [...]}
+                   每個都是長度為節點數的 numpy 陣列
+        """
+        num_nodes = len(self.tree_nodes)
+        
+        # 1. 語義獎勵：一次矩陣-向量乘積（索引中的 embedding 已正規化）
+        query_vec = np.asarray(query_embedding, dtype=np.float32).ravel()
+        query_norm = float(np.linalg.norm(query_vec))
+        semantic = np.zeros(num_nodes, dtype=np.float32)
+        if query_norm > 0 and self.tree_embeddings.size:
+            row_norms = np.linalg.norm(self.tree_embeddings, axis=1)
+            dots = self.tree_embeddings @ query_vec
+            valid = self.tree_has_embedding & (row_norms > 0)
+            semantic[valid] = dots[valid] / (row_norms[valid] * query_norm)
+        
+        # 2. 類別獎勵：路徑中包含的類別比例（每個類別一次向量化子字串比對）
+        category = np.zeros(num_nodes, dtype=np.float32)
+        node_match_mask = self.tree_is_leaf if llm_selected_nodes else np.zeros(num_nodes, dtype=bool)
+        if function_categories:
+            matches = np.zeros(num_nodes, dtype=np.int64)
+            for c in function_categories:
+                matches += np.char.find(self.tree_paths_lower, c.lower()) >= 0
+            category[~node_match_mask] = (matches / len(function_categories))[~node_match_mask]
+        leaf_db = self.tree_is_leaf & (self.tree_db_index >= 0)
+        if llm_selected_nodes:
+            # 與 _calculate_node_match_reward 相同：mapped_nodes 與 LLM 選擇的交集大小 / LLM 選擇數
+            overlap = np.zeros(len(self.node_database), dtype=np.int64)
+            for node_type in llm_selected_nodes:
+                overlap[self._db_indices_by_mapped_type.get(node_type, [])] += 1
+            category[leaf_db] = (overlap / len(llm_selected_nodes))[self.tree_db_index[leaf_db]]
+        
+        # 3. 關鍵字獎勵（只有葉子節點且能對應到 node_database）
+        keyword = np.zeros(num_nodes, dtype=np.float32)
+        if extracted_keywords:
+            keyword[leaf_db] = self._use_case_match_scores(extracted_keywords)[self.tree_db_index[leaf_db]]
+        
+        total = 0.5 * semantic + 0.2 * category + 0.3 * keyword
+        return {"semantic": semantic, "category": category, "keyword": keyword, "total": total}
     
+    def _get_db_node_for_tree_node(self, node: MCTSNode) -> Optional[Dict]:
+        """以 MCTS 節點的 node_id 查找對應的 node_database 節點（O(1)）"""
+        db_index = self.tree_db_index[node.taxonomy_data['node_id']]
+        return self.node_database[db_index] if db_index >= 0 else None
+    
+    def _evaluate_node_reward(
+        self,
+        node: MCTSNode,
+        query_embedding,
+        function_categories: List[str],
+        extracted_keywords: Optional[Set[str]]
+    ) -> float:
+        """逐次計算單一節點的混合獎勵（precompute_rewards=False 時使用）"""
+        # 計算語義獎勵
+        semantic_reward = 0.0
+        if node.taxonomy_data.get('embedding') is not None:
+            node_embedding = node.taxonomy_data.get('embedding')
+            if isinstance(node_embedding, list):
+                node_embedding = np.asarray(node_embedding, dtype=np.float32)
+            semantic_reward = self._cosine_similarity(query_embedding, node_embedding)
+        
+        # === 修改：計算類別匹配獎勵 (R_category) - 使用新方法 ===
+        category_reward = 0
+        if self.llm_selected_nodes and node.taxonomy_data.get('is_leaf', False):
+            # 找到對應的 db_node
+            db_node = self._get_db_node_for_tree_node(node)
+            
+            if db_node:
+                category_reward = self._calculate_node_match_reward(db_node, self.llm_selected_nodes)
+        else:
+            # Fallback: 如果沒有 llm_selected_nodes，使用舊方法
+            category_reward = self._calculate_category_reward(node, function_categories)
+        
+        # ✅ 計算關鍵字匹配獎勵
+        keyword_reward = 0.0
+        if extracted_keywords and node.taxonomy_data.get('is_leaf', False):
+            # 獲取該節點的 example_use_cases
+            db_node = self._get_db_node_for_tree_node(node)
+            
+            if db_node:
+                use_cases = db_node.get("example_use_cases", [])
+                match_result = self._fuzzy_match_use_cases(extracted_keywords, use_cases)
+                keyword_reward = match_result["match_score"]
+        
+        # 混合獎勵（調整權重：semantic*0.5 + categories*0.2 + keywords*0.3）
+        return 0.5 * semantic_reward + 0.2 * category_reward + 0.3 * keyword_reward
+    
+    def _load_embedding_index(
+        self,
+        taxonomy_path,
+        texts: List[str],
+        paths: List[str],
+        name: str = "taxonomy_embeddings"
+    ) -> EmbeddingIndex:
+        """
+        載入（或建立）taxonomy 節點的 embedding 索引
+
+        索引鍵由 taxonomy JSON 內容雜湊 + 模型名稱 + dtype 組成，
+        任一變動都會觸發重建；載入時使用 memmap，多個 worker 共享唯讀頁面。
+        """
+        if getattr(self, '_taxonomy_hash', None) is None:
+            self._taxonomy_hash = hash_file(str(taxonomy_path))
+        key = compute_index_key(self._taxonomy_hash, self.model_name, self.embedding_dtype)
+
+        def encode(batch: List[str]) -> np.ndarray:
+            # 一次性的大量文字不進 LRU 快取
+            return self.embedding_service.encode(batch, use_cache=False, show_progress_bar=True)
+
+        return EmbeddingIndex.load_or_build(
+            index_dir=str(self.embedding_cache_dir),
+            name=name,
+            key=key,
+            texts=texts,
+            encode_fn=encode,
+            paths=paths,
+            dtype=self.embedding_dtype,
+            metadata={"model_name": self.model_name, "source": Path(taxonomy_path).name}
+        )
+
+    def _prepare_use_case_matrix(self, taxonomy_path):
+        """
+        將所有葉子節點的 example_use_cases（去重）編碼為單一矩陣
+
+        - use_case_matrix: (U, dim) 已正規化的 use case embedding 矩陣
+        - use_case_rows: {use_case_text: row}
+        - db_use_case_rows / db_use_case_offsets: 每個 node_database 節點的 use case 列（CSR）
+        """
+        use_case_texts: List[str] = []
+        use_case_paths: List[str] = []
+        self.use_case_rows: Dict[str, int] = {}
+        db_rows: List[int] = []
+        db_offsets = [0]
+        for item in self.node_database:
+            for use_case in item.get("example_use_cases", []):
+                if use_case not in self.use_case_rows:
+                    self.use_case_rows[use_case] = len(use_case_texts)
+                    use_case_texts.append(use_case)
+                    use_case_paths.append(item["path_str"])
+                db_rows.append(self.use_case_rows[use_case])
+            db_offsets.append(len(db_rows))
+        # CSR：node_database[i] 的 use case 列為 db_use_case_rows[offsets[i]:offsets[i + 1]]
+        self.db_use_case_rows = np.asarray(db_rows, dtype=np.int64)
+        self.db_use_case_offsets = np.asarray(db_offsets, dtype=np.int64)
+        
+        self._use_case_query_cache: Tuple[Optional[str], Optional[np.ndarray]] = (None, None)
+        if not use_case_texts:
+            self.use_case_matrix = np.zeros((0, 0), dtype=np.float32)
+            return
+        
+        use_case_index = self._load_embedding_index(
+            taxonomy_path, use_case_texts, use_case_paths, name="use_case_embeddings"
+        )
+        self.use_case_matrix = np.asarray(use_case_index.embeddings, dtype=np.float32)
+        print(f" - {len(use_case_texts)} example_use_cases pre-encoded.")
+
+    def _use_case_similarities(self, query_text: str) -> np.ndarray:
+        """
+        查詢文字與所有 example_use_cases 的 cosine similarity（一次矩陣-向量乘積）
+
+        同一查詢（例如 MCTS 迴圈中同一組 keywords）只計算一次。
+        """
+        cached_text, cached_sims = self._use_case_query_cache
+        if cached_text == query_text:
+            return cached_sims
+        sims = self.use_case_matrix @ self.embedding_service.encode_one(query_text)
+        self._use_case_query_cache = (query_text, sims)
+        return sims
+
+    def _use_case_match_scores(self, keywords: Set[str], semantic_threshold: float = 0.3) -> np.ndarray:
+        """
+        一次計算所有 node_database 節點的 use case 匹配分數（與逐一呼叫
+        _fuzzy_match_use_cases 的 match_score 相同，但不逐節點輸出日誌）
+
+        Args:
+            keywords: 關鍵字集合
+            semantic_threshold: 語義相似度閾值
+
+        Returns:
+            scores: 長度為 node_database 節點數的陣列（沒有 use case 或沒有匹配為 0）
+        """
+        scores = np.zeros(len(self.node_database), dtype=np.float64)
+        if not keywords or not self.db_use_case_rows.size:
+            return scores
+        
+        similarities = self._use_case_similarities(" ".join(keywords))[self.db_use_case_rows].astype(np.float64)
+        matched = similarities >= semantic_threshold
+        
+        # reduceat 只用於有 use case 的節點（空區段的結果無意義）
+        starts = self.db_use_case_offsets[:-1]
+        nonempty = np.flatnonzero(self.db_use_case_offsets[1:] > starts)
+        counts = np.add.reduceat(matched, starts[nonempty])
+        max_similarity = np.maximum.reduceat(np.where(matched, similarities, -np.inf), starts[nonempty])
+        avg_similarity = np.add.reduceat(np.where(matched, similarities, 0.0), starts[nonempty]) / np.maximum(counts, 1)
+        # 最高相似度 * 0.7 + 平均相似度 * 0.3
+        scores[nonempty] = np.where(counts > 0, max_similarity * 0.7 + avg_similarity * 0.3, 0.0)
+        return scores
+
+    def _encode_query(self, text: str) -> np.ndarray:
+        """編碼查詢文字（L2 正規化的 float32 向量，與索引中的 embedding 同空間）"""
+        return self.embedding_service.encode_one(text)
+
+    @staticmethod
+    def _cosine_similarity(query_embedding, node_embedding) -> float:
+        """計算 cosine similarity（兩者皆為 numpy 向量）"""
+        a = np.asarray(query_embedding, dtype=np.float32).ravel()
+        b = np.asarray(node_embedding, dtype=np.float32).ravel()
+        denom = float(np.linalg.norm(a) * np.linalg.norm(b))
+        if denom == 0.0:
+            return 0.0
+        return float(np.dot(a, b) / denom)
+
     def _filter_keywords(self, keywords: Set[str], function_categories: List[str]) -> Set[str]:
         """
         過濾關鍵字：移除類別名稱，只保留技術關鍵字
@@ -367,7 +984,15 @@ class TaxonomySearchAgent:
         extracted_keywords: Optional[Set[str]] = None,
         llm_selected_nodes: Optional[Set[str]] = None,  # === 新增參數 ===
         iterations: int = 2000,
-        top_n: int = 5
+        top_n: int = 5,
+        precompute_rewards: bool = True,
+        workers: int = 1,
+        worker_noise: float = 0.05,
+        seed: Optional[int] = None,
+        early_stopping: bool = False,
+        convergence_patience: int = 3,
+        convergence_check_every: int = 25,
+        convergence_tolerance: float = 0.01
     ) -> List[Dict]:
         """
         使用 GPT 提取的功能類別 + 關鍵字匹配進行搜索
@@ -376,8 +1001,20 @@ class TaxonomySearchAgent:
             semantic_query: 語義查詢字符串
             function_categories: GPT 提取的功能類別列表
             extracted_keywords: 提取的關鍵字集合
+            llm_selected_nodes: LLM 選擇的 mapped_nodes（用於 R_category）
             iterations: MCTS 迭代次數
             top_n: 返回前 n 個結果
+            precompute_rewards: 是否在搜索前一次性計算所有節點的獎勵表
+                （True 時 MCTS 迭代只做陣列查表；False 時每次迭代逐一計算）
+            workers: root-parallel 的樹數量（> 1 時以 process pool 執行，
+                每棵樹各跑 iterations 次後合併；需要 precompute_rewards=True）
+            worker_noise: root-parallel 時各棵樹 UCT 平均獎勵的擾動標準差（使樹彼此不同；單棵樹不使用）
+            seed: 隨機種子（指定時同一查詢的結果可重現；None 使用全域 np.random）
+            early_stopping: 是否在 top_n 葉子的訪問佔比穩定後提前停止（iterations 成為上限；
+                需要 precompute_rewards=True）
+            convergence_patience: 需連續穩定的檢查點數
+            convergence_check_every: 收斂檢查間隔（迭代次數）
+            convergence_tolerance: 檢查點之間訪問佔比的最大變化
         
         Returns:
             results: 搜索結果列表
@@ -394,120 +1031,74 @@ class TaxonomySearchAgent:
         self.llm_selected_nodes = llm_selected_nodes if llm_selected_nodes else set()
         
         # 生成查詢 embedding
-        query_embedding = self.model.encode(semantic_query, convert_to_tensor=True)
+        query_embedding = self._encode_query(semantic_query)
         print(f"   - Query text: '{semantic_query[:100]}...'")
         print(f"   - Query embedding shape: {query_embedding.shape}")
         
+        # 預先計算所有節點的獎勵（semantic / category / keyword），迭代中只查表
+        reward_table = None
+        if precompute_rewards:
+            reward_table = self._compute_reward_table(
+                query_embedding, function_categories, extracted_keywords, self.llm_selected_nodes
+            )["total"]
+            print(f"   - Precomputed reward table for {len(reward_table)} taxonomy nodes")
+        
         # ✅ 使用虛擬根節點 "Taxonomy"，將所有頂層分類（1-9）作為第二層
         root_name = "Taxonomy"
-        root = MCTSNode(name=root_name, taxonomy_data=self.mcts_taxonomy_tree[root_name])
         
         print(f"   - Using virtual root node: {root_name}")
         print(f"   - Second level nodes: {list(self.mcts_taxonomy_tree[root_name]['children'].keys())}")
-        print(f"   - Running {iterations} MCTS iterations...")
-        
-        # 對單一根節點進行 MCTS 搜索（1222_vincent 的方法）
-        for i in range(iterations):
-                # 進度輸出（但不影響 MCTS 邏輯）
-                if i % 500 == 0 and i > 0:
-                    print(f"   - Progress: {i}/{iterations} iterations")
-                
-                # MCTS 核心邏輯：每次迭代都要執行（1222_vincent 的方法）
-                node = root
-                
-                # Selection: 選擇最佳子節點，直到找到未完全展開的節點
-                while node.is_fully_expanded() and node.children:
-                    node = node.select_best_child()
-                
-                # Expansion: 如果節點未完全展開，展開一個新的子節點
-                if not node.is_fully_expanded():
-                    unexpanded = [
-                        n for n in node.taxonomy_data.get('children', {})
-                        if n not in [c.name for c in node.children]
-                    ]
-                    if unexpanded:
-                        child_name = np.random.choice(unexpanded)
-                        child_node = MCTSNode(
-                            child_name,
-                            node,
-                            node.taxonomy_data['children'][child_name]
-                        )
-                        node.children.append(child_node)
-                        node = child_node
-                
-                # 計算語義獎勵
-                semantic_reward = 0.0
-                if node.taxonomy_data.get('embedding') is not None:
-                    node_embedding = node.taxonomy_data.get('embedding')
-                    if isinstance(node_embedding, list):
-                        node_embedding = torch.tensor(node_embedding)
-                    semantic_reward = util.cos_sim(
-                        query_embedding,
-                        node_embedding
-                    ).item()
-                
-                # === 修改：計算類別匹配獎勵 (R_category) - 使用新方法 ===
-                category_reward = 0
-                if self.llm_selected_nodes and node.taxonomy_data.get('is_leaf', False):
-                    # 找到對應的 db_node
-                    path_nodes = []
-                    curr = node
-                    while curr is not None:
-                        path_nodes.append(curr.name)
-                        curr = curr.parent
-                    path_str = " -> ".join(reversed(path_nodes))
-                    
-                    # 修復：去掉 "Taxonomy -> " 前綴
-                    search_path = path_str
-                    if path_str.startswith("Taxonomy -> "):
-                        search_path = path_str[len("Taxonomy -> "):]
-                    
-                    db_node = next(
-                        (item for item in self.node_database if item["path_str"] == search_path),
-                        None
-                    )
-                    
-                    if db_node:
-                        category_reward = self._calculate_node_match_reward(db_node, self.llm_selected_nodes)
-                else:
-                    # Fallback: 如果沒有 llm_selected_nodes，使用舊方法
-                    category_reward = self._calculate_category_reward(node, function_categories)
-                
-                # ✅ 計算關鍵字匹配獎勵
-                keyword_reward = 0.0
-                if extracted_keywords and node.taxonomy_data.get('is_leaf', False):
-                    # 獲取該節點的 example_use_cases
-                    path_nodes = []
-                    curr = node
-                    while curr is not None:
-                        path_nodes.append(curr.name)
-                        curr = curr.parent
-                    path_str = " -> ".join(reversed(path_nodes))
-                    
-                    # ✅ 修復：node_database 中的 path_str 不包含 "Taxonomy ->" 前綴
-                    search_path = path_str
-                    if path_str.startswith("Taxonomy -> "):
-                        search_path = path_str[len("Taxonomy -> "):]  # 去掉 "Taxonomy -> " 前綴
-                    
-                    db_node = next(
-                        (item for item in self.node_database if item["path_str"] == search_path),
-                        None
-                    )
-                    
-                    if db_node:
-                        use_cases = db_node.get("example_use_cases", [])
-                        match_result = self._fuzzy_match_use_cases(extracted_keywords, use_cases)
-                        keyword_reward = match_result["match_score"]
-                
-                # 混合獎勵（調整權重：semantic*0.5 + categories*0.2 + keywords*0.3）
-                total_reward = 0.5 * semantic_reward + 0.2 * category_reward + 0.3 * keyword_reward
-                
-                # 回溯更新（1222_vincent 的方法）
-                temp_node = node
-                while temp_node is not None:
-                    temp_node.visits += 1
-                    temp_node.total_reward += total_reward
-                    temp_node = temp_node.parent
+        if workers > 1 and reward_table is None:
+            print("   ⚠️  Root-parallel MCTS requires precompute_rewards=True, falling back to 1 worker")
+            workers = 1
+        
+        convergence = None
+        if early_stopping and reward_table is not None:
+            convergence = ConvergenceCriterion(
+                self.tree_is_leaf,
+                top_n=top_n,
+                patience=convergence_patience,
+                check_every=convergence_check_every,
+                tolerance=convergence_tolerance
+            )
+        elif early_stopping:
+            print("   ⚠️  Early stopping requires precompute_rewards=True, running the full budget")
+        print(f"   - Running {iterations} MCTS iterations" + (f" x {workers} workers..." if workers > 1 else "..."))
+        
+        seed_sequence = self._make_seed_sequence(seed, semantic_query) if (seed is not None or workers > 1) else None
+        # 單棵樹時使用與 root-parallel 第一棵樹相同的子序列（未指定 seed 時沿用全域 np.random）
+        rng = np.random.default_rng(seed_sequence.spawn(1)[0]) if seed_sequence is not None else None
+        
+        if reward_table is not None and workers > 1:
+            # Root-parallel：多棵獨立的樹在 process pool 中執行，合併訪問次數與獎勵
+            visits, total_reward, iterations_used = self._run_root_parallel(
+                reward_table, iterations, workers, seed_sequence, convergence, noise=worker_noise
+            )
+            root = self._materialize_visited_nodes(visits, total_reward)
+        elif reward_table is not None:
+            # 陣列化 MCTS：迭代中不建立節點物件，結束後只為已訪問節點建立 MCTSNode
+            tree = self._get_search_tree()
+            tree.reset()
+            iterations_used = tree.run(reward_table, iterations, rng=rng, convergence=convergence)
+            root = self._materialize_visited_nodes(tree.visits_array(), tree.total_reward_array())
+        else:
+            root = self._run_object_mcts(
+                root_name, iterations, query_embedding, function_categories, extracted_keywords, rng=rng
+            )
+            iterations_used = iterations
+        
+        iterations_budget = iterations * workers
+        self.last_search_stats = {
+            "iterations_budget": iterations_budget,
+            "iterations_used": iterations_used,
+            "workers": workers,
+            "early_stopped": iterations_used < iterations_budget,
+            "convergence_reason": convergence.reason if convergence is not None else ""
+        }
+        if iterations_used < iterations_budget:
+            print(f"   ✅ MCTS converged after {iterations_used}/{iterations_budget} iterations ({convergence.reason})")
+        else:
+            print(f"   - MCTS used {iterations_used}/{iterations_budget} iterations")
         
         # 收集結果：從所有根節點的訪問過的葉子節點中收集
         leaf_nodes_visited = []
@@ -610,10 +1201,7 @@ class TaxonomySearchAgent:
                 search_path = path_str[len("Taxonomy -> "):]  # 去掉 "Taxonomy -> " 前綴
             
             # 嘗試精確匹配
-            db_node = next(
-                (item for item in self.node_database if item["path_str"] == search_path),
-                None
-            )
+            db_node = self.get_node_by_path(search_path)
             
             # 如果精確匹配失敗，嘗試模糊匹配（因為節點名稱可能有差異）
             if not db_node:
@@ -623,7 +1211,7 @@ class TaxonomySearchAgent:
                     # 嘗試匹配除最後一個節點外的路徑
                     parent_path = " -> ".join(path_parts[:-1])
                     # 查找所有以這個父路徑開頭的節點
-                    for item in self.node_database:
+                    for item in self._get_nodes_under_prefix(parent_path, len(path_parts)):
                         item_path_parts = item["path_str"].split(" -> ")
                         if len(item_path_parts) >= len(path_parts):
                             item_parent_path = " -> ".join(item_path_parts[:len(path_parts)-1])
@@ -641,7 +1229,7 @@ class TaxonomySearchAgent:
             if not db_node and leaf.taxonomy_data.get('mapped_nodes'):
                 mapped_nodes = leaf.taxonomy_data.get('mapped_nodes', [])
                 # 查找所有包含這些 mapped_nodes 的節點
-                for item in self.node_database:
+                for item in self._get_nodes_sharing_mapped_types(mapped_nodes):
                     item_mapped = set(item.get('mapped_nodes', []))
                     if mapped_nodes and item_mapped:
                         # 如果有交集，可能是同一個節點
@@ -670,11 +1258,8 @@ class TaxonomySearchAgent:
                 if leaf_embedding is not None:
                     # 確保 embedding 是 tensor
                     if isinstance(leaf_embedding, list):
-                        leaf_embedding = torch.tensor(leaf_embedding)
-                    semantic_score = util.cos_sim(
-                        query_embedding,
-                        leaf_embedding
-                    ).item()
+                        leaf_embedding = np.asarray(leaf_embedding, dtype=np.float32)
+                    semantic_score = self._cosine_similarity(query_embedding, leaf_embedding)
                     
                     # 調試：顯示 semantic matching 的詳細信息
                     description = db_node.get('description', '')
@@ -691,11 +1276,8 @@ class TaxonomySearchAgent:
                         print(f"   - Found embedding via db_node.combined_text")
                         # 重新計算 semantic_score
                         if isinstance(leaf_embedding, list):
-                            leaf_embedding = torch.tensor(leaf_embedding)
-                        semantic_score = util.cos_sim(
-                            query_embedding,
-                            leaf_embedding
-                        ).item()
+                            leaf_embedding = np.asarray(leaf_embedding, dtype=np.float32)
+                        semantic_score = self._cosine_similarity(query_embedding, leaf_embedding)
                     else:
                         print(f"   - Warning: No embedding for {path_str}")
                         # 調試：找出為什麼沒有 embedding
@@ -715,11 +1297,8 @@ class TaxonomySearchAgent:
                             if similar_texts:
                                 leaf_embedding = self.text_embedding_map[similar_texts[0]]
                                 if isinstance(leaf_embedding, list):
-                                    leaf_embedding = torch.tensor(leaf_embedding)
-                                semantic_score = util.cos_sim(
-                                    query_embedding,
-                                    leaf_embedding
-                                ).item()
+                                    leaf_embedding = np.asarray(leaf_embedding, dtype=np.float32)
+                                semantic_score = self._cosine_similarity(query_embedding, leaf_embedding)
                                 print(f"      Using embedding from similar text, semantic_score={semantic_score:.4f}")
                 
                 # 計算類別分數
@@ -840,11 +1419,8 @@ class TaxonomySearchAgent:
                     semantic_score = 0.0
                     if leaf_embedding is not None:
                         if isinstance(leaf_embedding, list):
-                            leaf_embedding = torch.tensor(leaf_embedding)
-                        semantic_score = util.cos_sim(
-                            query_embedding,
-                            leaf_embedding
-                        ).item()
+                            leaf_embedding = np.asarray(leaf_embedding, dtype=np.float32)
+                        semantic_score = self._cosine_similarity(query_embedding, leaf_embedding)
                     
                     avg_reward = leaf.total_reward / (leaf.visits + 1e-6)
                     
@@ -905,10 +1481,7 @@ class TaxonomySearchAgent:
             print(f"         Semantic Score: {result['semantic_score']:.4f} | Avg Reward: {result['avg_reward']:.4f}")
             
             # 顯示該節點使用的 combined_text（用於調試 embedding 質量）
-            db_node = next(
-                (item for item in self.node_database if item["path_str"] == result['path_str']),
-                None
-            )
+            db_node = self.get_node_by_path(result['path_str'])
             if db_node:
                 combined_text = db_node.get('combined_text', 'N/A')
                 description = db_node.get('description', 'N/A')
@@ -984,6 +1557,62 @@ class TaxonomySearchAgent:
         
         return results
     
+    def _run_object_mcts(
+        self,
+        root_name: str,
+        iterations: int,
+        query_embedding,
+        function_categories: List[str],
+        extracted_keywords: Optional[Set[str]],
+        rng=None
+    ) -> MCTSNode:
+        """以 MCTSNode 物件樹執行 MCTS（precompute_rewards=False 時使用，每次迭代逐一計算獎勵）"""
+        rng = rng if rng is not None else np.random
+        root = MCTSNode(name=root_name, taxonomy_data=self.mcts_taxonomy_tree[root_name])
+        
+        # 對單一根節點進行 MCTS 搜索（1222_vincent 的方法）
+        for i in range(iterations):
+            # 進度輸出（但不影響 MCTS 邏輯）
+            if i % 500 == 0 and i > 0:
+                print(f"   - Progress: {i}/{iterations} iterations")
+            
+            # MCTS 核心邏輯：每次迭代都要執行（1222_vincent 的方法）
+            node = root
+            
+            # Selection: 選擇最佳子節點，直到找到未完全展開的節點
+            while node.is_fully_expanded() and node.children:
+                node = node.select_best_child()
+            
+            # Expansion: 如果節點未完全展開，展開一個新的子節點
+            if not node.is_fully_expanded():
+                unexpanded = [
+                    n for n in node.taxonomy_data.get('children', {})
+                    if n not in [c.name for c in node.children]
+                ]
+                if unexpanded:
+                    child_name = rng.choice(unexpanded)
+                    child_node = MCTSNode(
+                        child_name,
+                        node,
+                        node.taxonomy_data['children'][child_name]
+                    )
+                    node.children.append(child_node)
+                    node = child_node
+            
+            # 計算混合獎勵
+            total_reward = self._evaluate_node_reward(
+                node, query_embedding, function_categories, extracted_keywords
+            )
+            
+            # 回溯更新（1222_vincent 的方法）
+            temp_node = node
+            while temp_node is not None:
+                temp_node.visits += 1
+                temp_node.total_reward += total_reward
+                temp_node = temp_node.parent
+        
+        return root
+    
     def _get_path_to_root(self, node: MCTSNode) -> List[MCTSNode]:
         """獲取從節點到根的路徑"""
         path = []
@@ -1016,17 +1645,7 @@ class TaxonomySearchAgent:
             return []
         
         # 提取第一層分類（例如："6 AI, ML & Automation Intelligence"）
-        def get_first_level_category(path_str: str) -> str:
-            """從路徑中提取第一層分類"""
-            parts = path_str.split(" -> ")
-            if parts:
-                first_part = parts[0]
-                # 去掉數字前綴（例如："6 AI, ML & Automation Intelligence" -> "AI, ML & Automation Intelligence"）
-                first_parts = first_part.split(' ', 1)
-                if len(first_parts) == 2 and first_parts[0].isdigit():
-                    return first_parts[1]
-                return first_part
-            return "Unknown"
+        get_first_level_category = self._first_level_category
         
         # 按第一層分類分組 MCTS 結果
         category_groups = {}
@@ -1072,9 +1691,8 @@ class TaxonomySearchAgent:
                 # ✅ 優化：預先過濾，只處理屬於該大類的節點，避免重複遍歷
                 # 先快速過濾出屬於該大類的節點
                 category_nodes = [
-                    db_node for db_node in self.node_database
-                    if get_first_level_category(db_node.get('path_str', '')) == matching_cat
-                    and db_node.get('path_str', '') not in selected_paths
+                    db_node for db_node in self.get_nodes_by_category(matching_cat)
+                    if db_node.get('path_str', '') not in selected_paths
                 ]
                 
                 if not category_nodes:
@@ -1097,9 +1715,9 @@ class TaxonomySearchAgent:
                     semantic_score = 0.0
                     if node_embedding is not None:
                         if isinstance(node_embedding, list):
-                            node_embedding = torch.tensor(node_embedding)
+                            node_embedding = np.asarray(node_embedding, dtype=np.float32)
                         # 計算與查詢的語義相似度
-                        semantic_score = util.cos_sim(query_embedding, node_embedding).item()
+                        semantic_score = self._cosine_similarity(query_embedding, node_embedding)
                     
                     # ✅ 優化：只在語義分數較高時才計算關鍵字匹配（避免不必要的計算）
                     keyword_score = 0.0
@@ -1171,23 +1789,20 @@ class TaxonomySearchAgent:
         return False
     
     def _ensure_category_coverage(self, results: List[Dict], categories: List[str], top_n: int) -> List[Dict]:
-        """確保類別覆蓋"""
-        critical_categories = ['SMS', 'Email', 'Payment', 'Database', 'API']
-        
-        for category in critical_categories:
+        """確保類別覆蓋（補入的節點以 _db_indices_by_critical_category 查找，不掃描 node_database）"""
+        for category in CRITICAL_CATEGORIES:
             if category not in categories:
                 continue
             
             has_coverage = any(self._has_category_match(r, [category]) for r in results)
             
-            if not has_coverage:
-                for db_node in self.node_database:
-                    if self._has_category_match(db_node, [category]):
-                        if not any(r['path_str'] == db_node['path_str'] for r in results):
-                            db_node_with_reward = {**db_node, 'avg_reward': 0.40}
-                            results.append(db_node_with_reward)
-                            print(f" - Category boost: Forcibly added '{db_node['path_str']}' for category '{category}'")
-                        break
+            indices = self._db_indices_by_critical_category[category]
+            if not has_coverage and indices:
+                db_node = self.node_database[indices[0]]
+                if not any(r['path_str'] == db_node['path_str'] for r in results):
+                    db_node_with_reward = {**db_node, 'avg_reward': 0.40}
+                    results.append(db_node_with_reward)
+                    print(f" - Category boost: Forcibly added '{db_node['path_str']}' for category '{category}'")
         
         # 重新排序並限制最終數量
         results.sort(key=lambda x: x.get('avg_reward', 0), reverse=True)
@@ -1197,6 +1812,9 @@ class TaxonomySearchAgent:
         """
         執行直接的關鍵字掃描（Lexical Search）
         
+        關鍵字是任意子字串，無法預先建立倒排索引，因此仍逐一檢查節點；
+        每個節點的小寫化文字已在 _db_keyword_texts 中預先組好。
+        
         Args:
             keywords: 關鍵字集合
         
@@ -1210,27 +1828,10 @@ class TaxonomySearchAgent:
         keyword_hits = []
         lower_keywords = {kw.lower() for kw in keywords}
         
-        for db_node in self.node_database:
-            # 檢查路徑和描述
-            path_str = db_node.get('path_str', '').lower()
-            description = db_node.get('description', '').lower()
-            mapped_nodes = " ".join(db_node.get('mapped_nodes', [])).lower()
-            
-            # 組合所有文本
-            text_to_check = f"{path_str} {description} {mapped_nodes}"
-            
-            # 檢查是否有任何關鍵字匹配（部分匹配）
-            found_in_text = False
-            matched_keywords = []
-            for kw in lower_keywords:
-                # 檢查關鍵字是否在文本中
-                if kw in text_to_check:
-                    found_in_text = True
-                    matched_keywords.append(kw)
-                # 也檢查關鍵字是否在節點類型中（如 "ocr" 在 "n8n-nodes-base.ocr"）
-                elif any(kw in node.lower() for node in db_node.get('mapped_nodes', [])):
-                    found_in_text = True
-                    matched_keywords.append(kw)
+        for db_node, text_to_check in zip(self.node_database, self._db_keyword_texts):
+            # 檢查是否有任何關鍵字匹配（部分匹配；文字已包含路徑、描述與節點類型，如 "ocr" 在 "n8n-nodes-base.ocr"）
+            matched_keywords = [kw for kw in lower_keywords if kw in text_to_check]
+            found_in_text = bool(matched_keywords)
             
             # 也檢查 example_use_cases（如果有的話，像原本的程式碼）
             use_cases = db_node.get("example_use_cases", [])
@@ -1282,29 +1883,14 @@ class TaxonomySearchAgent:
         # 組合所有 keywords 為一個查詢文本
         query_text = " ".join(keywords)
         
-        # ✅ 優化：緩存查詢 embedding（如果 keywords 相同，可以重用）
-        query_cache_key = query_text
-        if query_cache_key not in self.use_case_embedding_cache:
-            query_embedding = self.model.encode(query_text, convert_to_tensor=True)
-            self.use_case_embedding_cache[query_cache_key] = query_embedding
+        # ✅ 優化：use cases 已預先編碼成矩陣，直接取出該節點對應的列
+        rows = [self.use_case_rows.get(use_case) for use_case in use_cases]
+        if None not in rows:
+            similarities = self._use_case_similarities(query_text)[rows]
         else:
-            query_embedding = self.use_case_embedding_cache[query_cache_key]
-        
-        # ✅ 優化：緩存 use_case embeddings，避免重複計算
-        use_case_embeddings_list = []
-        for use_case in use_cases:
-            if use_case in self.use_case_embedding_cache:
-                use_case_embeddings_list.append(self.use_case_embedding_cache[use_case])
-            else:
-                embedding = self.model.encode(use_case, convert_to_tensor=True)
-                self.use_case_embedding_cache[use_case] = embedding
-                use_case_embeddings_list.append(embedding)
-        
-        # 將列表轉換為 tensor（stack）
-        use_case_embeddings = torch.stack(use_case_embeddings_list)
-        
-        # 計算語義相似度（餘弦相似度）
-        similarities = util.cos_sim(query_embedding, use_case_embeddings)[0]  # [0] 因為 query 只有一個
+            # 不在 taxonomy 中的 use cases：由共享服務編碼（向量已 L2 正規化，內積即餘弦相似度）
+            query_embedding = self.embedding_service.encode_one(query_text)
+            similarities = self.embedding_service.encode(use_cases) @ query_embedding
         
         # 找到匹配的 use cases（相似度 >= threshold）
         matched_cases = []
@@ -1312,7 +1898,7 @@ class TaxonomySearchAgent:
         semantic_scores = {}
         
         for i, (case, similarity) in enumerate(zip(use_cases, similarities)):
-            similarity_value = similarity.item()
+            similarity_value = float(similarity)
             semantic_scores[case] = similarity_value
             
             if similarity_value >= semantic_threshold:
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+陣列化 MCTS 樹
+
+以預先配置的 NumPy 陣列表示整棵 taxonomy 搜索樹（visits、total_reward、
+parent、first_child / next_sibling），搜索過程中不建立任何節點物件。
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class ConvergenceCriterion:
+    """
+    MCTS 提前停止條件
+
+    獎勵表是確定性的（每個葉子的平均獎勵不會隨迭代改變），因此改以 UCT 的訪問分配判斷：
+    每 check_every 次迭代檢查一次訪問次數最多的 top_n 個葉子及其訪問佔比
+    （佔所有葉子訪問次數的比例），當 top_n 集合不變、且每個葉子的佔比變化都不超過
+    tolerance 的檢查點連續出現 patience 次時，視為收斂。
+    """
+
+    __slots__ = (
+        'leaf_mask', 'top_n', 'patience', 'check_every', 'min_iterations',
+        'tolerance', 'last_ranking', 'last_shares', 'stable_checks', 'converged', 'reason'
+    )
+
+    def __init__(
+        self,
+        leaf_mask: np.ndarray,
+        top_n: int = 5,
+        patience: int = 3,
+        check_every: int = 25,
+        min_iterations: int = 50,
+        tolerance: float = 0.01
+    ):
+        """
+        Args:
+            leaf_mask: 以 node_id 為索引的葉子節點標記
+            top_n: 追蹤的葉子數量
+            patience: 需連續穩定的檢查點數（K）
+            check_every: 檢查間隔（迭代次數）
+            min_iterations: 最少迭代次數（之前不檢查）
+            tolerance: 兩個檢查點之間每個 top_n 葉子訪問佔比的最大變化
+        """
+        self.leaf_mask = np.asarray(leaf_mask, dtype=bool)
+        self.top_n = top_n
+        self.patience = patience
+        self.check_every = max(1, check_every)
+        self.min_iterations = min_iterations
+        self.tolerance = tolerance
+        self.reset()
+
+    def reset(self):
+        self.last_ranking: Optional[Tuple[int, ...]] = None
+        self.last_shares: Optional[np.ndarray] = None
+        self.stable_checks = 0
+        self.converged = False
+        self.reason = ""
+
+    def should_check(self, iteration: int) -> bool:
+        return iteration >= self.min_iterations and iteration % self.check_every == 0
+
+    def update(self, visits: np.ndarray, total_reward: np.ndarray) -> bool:
+        """
+        在檢查點更新收斂狀態
+
+        Args:
+            visits: 以 node_id 為索引的訪問次數
+            total_reward: 以 node_id 為索引的累積獎勵（保留與 MCTSTree.run 相同的介面，未使用）
+
+        Returns:
+            converged: 是否已收斂
+        """
+        visited = np.flatnonzero(self.leaf_mask & (visits > 0))
+        if len(visited) < self.top_n:
+            self.last_ranking = None
+            self.last_shares = None
+            self.stable_checks = 0
+            return False
+
+        leaf_visits = visits[visited]
+        order = np.argsort(-leaf_visits, kind='stable')[:self.top_n]
+        top = visited[order]
+        # 以節點編號排序，使佔比向量的比較不受同票時的排名順序影響
+        by_id = np.argsort(top)
+        ranking = tuple(int(n) for n in top[by_id])
+        shares = leaf_visits[order][by_id] / float(leaf_visits.sum())
+
+        if (
+            ranking == self.last_ranking
+            and float(np.max(np.abs(shares - self.last_shares))) <= self.tolerance
+        ):
+            self.stable_checks += 1
+        else:
+            self.stable_checks = 0
+        self.last_ranking = ranking
+        self.last_shares = shares
+
+        if self.stable_checks >= self.patience:
+            self.converged = True
+            self.reason = (
+                f"top-{self.top_n} visit shares stable (±{self.tolerance:g}) "
+                f"for {self.stable_checks} checkpoints"
+            )
+            return True
+        return False
+
+
+class MCTSTree:
+    """
+    陣列化的 MCTS 樹
+
+    節點以 BFS 順序編號（根節點為 0），因此同一父節點的子節點在陣列中連續：
+    children(n) = [first_child[n], first_child[n] + num_children[n])。
+
+    每個節點的統計量帶有 epoch 標記；reset() 只需遞增 epoch（O(1)），
+    標記不等於目前 epoch 的節點視為 visits = 0、total_reward = 0。
+    """
+
+    __slots__ = (
+        'parent', 'first_child', 'num_children', 'next_sibling', 'depth',
+        'visits', 'total_reward', 'stamp', 'epoch'
+    )
+
+    def __init__(self, parent: np.ndarray):
+        """
+        Args:
+            parent: 以 BFS 順序排列的父節點陣列（根節點為 -1）
+        """
+        parent = np.asarray(parent, dtype=np.int32)
+        num_nodes = len(parent)
+
+        first_child = np.full(num_nodes, -1, dtype=np.int32)
+        num_children = np.zeros(num_nodes, dtype=np.int32)
+        next_sibling = np.full(num_nodes, -1, dtype=np.int32)
+        depth = np.zeros(num_nodes, dtype=np.int32)
+
+        for node in range(1, num_nodes):
+            p = parent[node]
+            if first_child[p] == -1:
+                first_child[p] = node
+            elif node != first_child[p] + num_children[p]:
+                raise ValueError("parent 陣列必須是 BFS 順序（同一父節點的子節點需連續）")
+            else:
+                next_sibling[node - 1] = node
+            num_children[p] += 1
+            depth[node] = depth[p] + 1
+
+        self.parent = parent
+        self.first_child = first_child
+        self.num_children = num_children
+        self.next_sibling = next_sibling
+        self.depth = depth
+        self._allocate_stats()
+
+    def _allocate_stats(self):
+        num_nodes = len(self.parent)
+        self.visits = np.zeros(num_nodes, dtype=np.int64)
+        self.total_reward = np.zeros(num_nodes, dtype=np.float64)
+        self.stamp = np.zeros(num_nodes, dtype=np.int64)
+        self.epoch = 1
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def clone_structure(self) -> "MCTSTree":
+        """建立共享結構陣列、但擁有獨立統計量的新樹（供其他執行緒使用）"""
+        tree = MCTSTree.__new__(MCTSTree)
+        tree.parent = self.parent
+        tree.first_child = self.first_child
+        tree.num_children = self.num_children
+        tree.next_sibling = self.next_sibling
+        tree.depth = self.depth
+        tree._allocate_stats()
+        return tree
+
+    def reset(self):
+        """清空所有統計量（O(1)：只遞增 epoch）"""
+        self.epoch += 1
+
+    def _touch(self, node: int):
+        """將過期 epoch 的節點統計量歸零"""
+        if self.stamp[node] != self.epoch:
+            self.stamp[node] = self.epoch
+            self.visits[node] = 0
+            self.total_reward[node] = 0.0
+
+    def _child_slice(self, node: int) -> slice:
+        start = self.first_child[node]
+        return slice(start, start + self.num_children[node])
+
+    def _child_stats(self, node: int):
+        children = self._child_slice(node)
+        valid = self.stamp[children] == self.epoch
+        visits = np.where(valid, self.visits[children], 0)
+        total = np.where(valid, self.total_reward[children], 0.0)
+        return children, visits, total
+
+    def node_visits(self, node: int) -> int:
+        return int(self.visits[node]) if self.stamp[node] == self.epoch else 0
+
+    def is_fully_expanded(self, node: int) -> bool:
+        """葉子節點視為已完全展開；否則所有子節點都被訪問過才算完全展開"""
+        if self.num_children[node] == 0:
+            return True
+        _, visits, _ = self._child_stats(node)
+        return bool(np.all(visits > 0))
+
+    def select_best_child(self, node: int, c_param: float = 1.414, rng=None, noise: float = 0.0) -> int:
+        """
+        向量化 UCT：一次計算所有（已展開）子節點的分數
+
+        noise > 0 時平均獎勵加上 N(0, noise² / visits) 的擾動（訪問越多擾動越小），
+        同分時也因此隨機決定；root-parallel 的各棵樹藉此探索不同的分支。
+        """
+        children, visits, total = self._child_stats(node)
+        expanded = visits > 0
+        exploit = total / (visits + 1e-6)
+        if noise > 0:
+            exploit = exploit + rng.normal(0.0, noise, len(exploit)) / np.sqrt(np.maximum(visits, 1))
+        explore = np.sqrt(np.log(self.node_visits(node) + 1) / (visits + 1e-6))
+        scores = np.where(expanded, exploit + c_param * explore, -np.inf)
+        return children.start + int(np.argmax(scores))
+
+    def unexpanded_children(self, node: int) -> np.ndarray:
+        children, visits, _ = self._child_stats(node)
+        return np.arange(children.start, children.stop)[visits == 0]
+
+    def backpropagate(self, node: int, reward: float):
+        while node >= 0:
+            self._touch(node)
+            self.visits[node] += 1
+            self.total_reward[node] += reward
+            node = self.parent[node]
+
+    def run(
+        self,
+        rewards: np.ndarray,
+        iterations: int,
+        rng=None,
+        c_param: float = 1.414,
+        convergence: Optional[ConvergenceCriterion] = None,
+        noise: float = 0.0
+    ) -> int:
+        """
+        執行 MCTS 迭代（selection → expansion → 查表獎勵 → backpropagation）
+
+        Args:
+            rewards: 以 node_id 為索引的獎勵表
+            iterations: 迭代次數上限
+            rng: 隨機數產生器（np.random.Generator 或 np.random 模組，預設為 np.random）
+            c_param: UCT 探索係數
+            convergence: 提前停止條件（None 表示跑滿 iterations）
+            noise: selection 時平均獎勵的擾動標準差（見 select_best_child；0 表示確定性 UCT）
+
+        Returns:
+            iterations_used: 實際執行的迭代次數
+        """
+        rng = rng if rng is not None else np.random
+        if convergence is not None:
+            convergence.reset()
+        for i in range(iterations):
+            if convergence is not None and convergence.should_check(i):
+                if convergence.update(self.visits_array(), self.total_reward_array()):
+                    return i
+
+            node = 0
+
+            # Selection
+            while self.num_children[node] > 0 and self.is_fully_expanded(node):
+                node = self.select_best_child(node, c_param, rng=rng, noise=noise)
+
+            # Expansion
+            if not self.is_fully_expanded(node):
+                unexpanded = self.unexpanded_children(node)
+                if len(unexpanded):
+                    node = int(rng.choice(unexpanded))
+
+            # Reward + Backpropagation
+            self.backpropagate(node, float(rewards[node]))
+
+        return iterations
+
+    def visits_array(self) -> np.ndarray:
+        """目前 epoch 的 visits（過期節點為 0）"""
+        return np.where(self.stamp == self.epoch, self.visits, 0)
+
+    def total_reward_array(self) -> np.ndarray:
+        """目前 epoch 的 total_reward（過期節點為 0）"""
+        return np.where(self.stamp == self.epoch, self.total_reward, 0.0)
+
+
+def run_tree_worker(
+    parent: np.ndarray,
+    rewards: np.ndarray,
+    iterations: int,
+    seed_sequence: np.random.SeedSequence,
+    c_param: float = 1.414,
+    convergence: Optional[ConvergenceCriterion] = None,
+    noise: float = 0.0
+):
+    """
+    Root-parallel MCTS 的 worker（在 process pool 中執行一棵獨立的樹）
+
+    Args:
+        parent: BFS 順序的父節點陣列
+        rewards: 以 node_id 為索引的獎勵表
+        iterations: 這棵樹的迭代次數
+        seed_sequence: 這棵樹專用的 SeedSequence
+        c_param: UCT 探索係數
+        convergence: 提前停止條件（可選）
+        noise: selection 擾動標準差（見 MCTSTree.select_best_child）
+
+    Returns:
+        (visits, total_reward, iterations_used, reason): 這棵樹的統計量陣列、實際迭代次數與收斂原因
+    """
+    tree = MCTSTree(parent)
+    iterations_used = tree.run(
+        rewards, iterations, rng=np.random.default_rng(seed_sequence),
+        c_param=c_param, convergence=convergence, noise=noise
+    )
+    reason = convergence.reason if convergence is not None else ""
+    return tree.visits_array(), tree.total_reward_array(), iterations_used, reason
@@ -0,0 +1,4 @@
+"""
+HTTP 服務模組
+以 ASGI 應用程式承載單一預熱的協調器
+"""
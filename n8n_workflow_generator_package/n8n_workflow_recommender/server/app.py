@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+ASGI 應用程式
+
+以一個常駐、預熱完成的 WorkflowOrchestrator 提供 HTTP API：
+    GET  /health    健康狀態（所有元件就緒時 200，否則 503）
+    POST /generate  {"query": str} → 與 process_user_request 相同的結果
+    POST /rank      {"candidates": [{"path": [...], ...}], "top_k"?, "strategy"?, "min_score"?,
+                     "critical_node_weight"?} → {"candidates": [...]}
+    POST /fill      {"path": [...], "params"?: {...}, "workflow_name"?: str} → {"params", "workflow_json"}
+
+/generate 分成兩個階段：所有 LLM 呼叫（NLU 與 trigger / end 的 LLM 選擇）在 LLM 執行緒池中執行，
+MCTS / 評分 / JSON 生成在有上限的 CPU 執行緒池中執行、不會等待 LLM；事件迴圈只 await 兩者，
+等待 LLM 的請求不會佔用 CPU 執行緒。同時處理的請求數受 max_concurrency 限制，
+其餘請求排隊；佇列已滿或等待逾時時立即返回 503 + Retry-After（backpressure）。
+
+可直接交給任何 ASGI 伺服器，例如：
+    uvicorn --factory n8n_workflow_recommender.server.app:create_app
+未安裝 uvicorn 時可使用 serve()（內建的 asyncio 伺服器）。
+"""
+
+import asyncio
+import functools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from ..core.orchestrator import WorkflowOrchestrator
+from ..models.matrix_factorization_scorer import SCORING_STRATEGIES
+from ..utils.file_loader import load_yaml
+
+
+# config.yaml 的 server 區段預設值
+DEFAULT_SERVER_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 8000,
+    "backend": "auto",
+    "max_concurrency": 8,
+    "cpu_workers": 2,
+    "max_queue": 32,
+    "queue_timeout": 30,
+    "retry_after": 2,
+    "max_body_bytes": 1048576
+}
+
+# 伺服器實作
+SERVER_BACKENDS = ('auto', 'uvicorn', 'builtin')
+
+
+class HTTPError(Exception):
+    """以指定 HTTP 狀態碼返回給客戶端的錯誤"""
+
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+def _json_default(obj: Any) -> Any:
+    """json.dumps 無法處理的型別（numpy 分數、set 等）"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class RequestLimiter:
+    """
+    請求並行上限與排隊（backpressure）
+
+    最多 max_concurrency 個請求同時處理，其餘最多 max_queue 個排隊等待；
+    佇列已滿或等待超過 queue_timeout 秒時拋出 503，而不是無限制地累積請求。
+    以 `async with limiter as queue_seconds:` 使用。
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: Optional[float], retry_after: int):
+        """
+        Args:
+            max_concurrency: 同時處理的請求數
+            max_queue: 排隊等待的請求數上限
+            queue_timeout: 排隊的最長秒數（None 或 <= 0 表示不限）
+            retry_after: 503 回應的 Retry-After 秒數
+        """
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = queue_timeout if queue_timeout and queue_timeout > 0 else None
+        self.retry_after = max(1, int(retry_after))
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def _reject(self, message: str) -> HTTPError:
+        self.rejected += 1
+        return HTTPError(503, message, {"Retry-After": str(self.retry_after)})
+
+    async def __aenter__(self) -> float:
+        # active / waiting 在進入時同步更新，同一輪事件迴圈中同時到達的請求也會被正確計入
+        if self.active + self.waiting >= self.max_concurrency + self.max_queue:
+            raise self._reject("Server busy: request queue is full")
+
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._reject(f"Server busy: no slot within {self.queue_timeout:g}s")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return time.perf_counter() - start
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.active -= 1
+        self.completed += 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue
+        }
+
+
+class RecommenderApp:
+    """
+    推薦系統 ASGI 應用程式
+
+    整個程序共用一個 WorkflowOrchestrator；未提供時在 lifespan startup 中以
+    background 模式建立（伺服器立即接受連線，元件就緒前 /health 與其他端點返回 503）。
+    """
+
+    def __init__(
+        self,
+        orchestrator: Optional[WorkflowOrchestrator] = None,
+        config_path: Optional[str] = None,
+        openai_key: Optional[str] = None,
+        server_config: Optional[Dict] = None
+    ):
+        """
+        Args:
+            orchestrator: 已建立的協調器（可選）
+            config_path: 配置檔案路徑（可選，建立協調器與讀取 server 區段時使用）
+            openai_key: OpenAI API 密鑰（可選）
+            server_config: 覆寫 config.yaml 的 server 區段（可選）
+        """
+        if config_path is None:
+            config_path = str(Path(__file__).resolve().parent.parent / "config" / "config.yaml")
+        self.config_path = config_path
+        self.openai_key = openai_key
+        self.orchestrator = orchestrator
+
+        config = orchestrator.config if orchestrator is not None else load_yaml(config_path)
+        self.server_config = {**DEFAULT_SERVER_CONFIG, **(config.get('server') or {}), **(server_config or {})}
+
+        self.limiter = RequestLimiter(
+            self.server_config['max_concurrency'],
+            self.server_config['max_queue'],
+            self.server_config['queue_timeout'],
+            self.server_config['retry_after']
+        )
+        self.max_body_bytes = int(self.server_config['max_body_bytes'])
+        # LLM 階段的執行緒大多在等待網路，每個處理中的請求最多佔用一個
+        self._llm_executor = ThreadPoolExecutor(
+            max_workers=self.limiter.max_concurrency, thread_name_prefix="server-llm"
+        )
+        # CPU 階段（MCTS、評分、JSON 生成）受 GIL 限制，只需少量執行緒
+        self._cpu_executor = ThreadPoolExecutor(
+            max_workers=max(1, int(self.server_config['cpu_workers'])), thread_name_prefix="server-cpu"
+        )
+
+        self._routes: Dict[str, Tuple[str, Callable]] = {
+            "/health": ("GET", self._handle_health),
+            "/generate": ("POST", self._handle_generate),
+            "/rank": ("POST", self._handle_rank),
+            "/fill": ("POST", self._handle_fill)
+        }
+
+    async def __call__(self, scope: Dict, receive: Callable, send: Callable):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        headers: Dict[str, str] = {}
+        try:
+            status, payload, headers = await self._dispatch(scope, receive)
+        except HTTPError as e:
+            status, payload, headers = e.status, {"error": e.message}, e.headers
+        except Exception as e:
+            print(f"⚠️  Warning: {scope['method']} {scope['path']} failed: {type(e).__name__}: {e}")
+            status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+        await self._send_json(send, status, payload, headers)
+
+    # ------------------------------------------------------------------
+    # 生命週期
+    # ------------------------------------------------------------------
+
+    async def startup(self):
+        """建立（或開始預熱）協調器"""
+        loop = asyncio.get_running_loop()
+        if self.orchestrator is None:
+            self.orchestrator = await loop.run_in_executor(
+                self._cpu_executor,
+                functools.partial(
+                    WorkflowOrchestrator,
+                    openai_key=self.openai_key,
+                    config_path=self.config_path,
+                    startup_mode='background'
+                )
+            )
+        elif self.orchestrator.startup_mode == 'lazy' and not self.orchestrator.is_ready():
+            self.orchestrator.warm_up(background=True)
+
+    def shutdown(self):
+        """停止執行緒池（尚未開始的工作直接取消）"""
+        self._llm_executor.shutdown(wait=False, cancel_futures=True)
+        self._cpu_executor.shutdown(wait=False, cancel_futures=True)
+        if self.orchestrator is not None and self.orchestrator.components.is_ready('generator'):
+            self.orchestrator.generator.llm_fanout.shutdown()
+
+    async def _lifespan(self, receive: Callable, send: Callable):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": f"{type(e).__name__}: {e}"})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # ------------------------------------------------------------------
+    # 請求處理
+    # ------------------------------------------------------------------
+
+    async def _dispatch(self, scope: Dict, receive: Callable) -> Tuple[int, Dict, Dict[str, str]]:
+        route = self._routes.get(scope["path"])
+        if route is None:
+            raise HTTPError(404, f"Not found: {scope['path']}")
+        method, handler = route
+        if scope["method"] != method:
+            raise HTTPError(405, f"Method not allowed: {scope['method']}", {"Allow": method})
+
+        payload: Dict = {}
+        if method == "POST":
+            body = await self._read_body(receive)
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError as e:
+                raise HTTPError(400, f"Invalid JSON body: {e}")
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "Request body must be a JSON object")
+        return await handler(payload)
+
+    async def _read_body(self, receive: Callable) -> bytes:
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise HTTPError(400, "Client disconnected")
+            body.extend(message.get("body", b""))
+            if len(body) > self.max_body_bytes:
+                raise HTTPError(413, f"Request body exceeds {self.max_body_bytes} bytes")
+            if not message.get("more_body", False):
+                return bytes(body)
+
+    @staticmethod
+    async def _send_json(send: Callable, status: int, payload: Dict, headers: Dict[str, str]):
+        body = json.dumps(payload, ensure_ascii=False, default=_json_default).encode("utf-8")
+        raw_headers = [
+            (b"content-type", b"application/json; charset=utf-8"),
+            (b"content-length", str(len(body)).encode("latin-1"))
+        ]
+        raw_headers.extend((k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items())
+        await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def _require_ready(self) -> WorkflowOrchestrator:
+        """返回已就緒的協調器；仍在啟動或元件建立失敗時拋出 503"""
+        if self.orchestrator is None:
+            raise HTTPError(503, "Server is starting", {"Retry-After": str(self.limiter.retry_after)})
+        if not self.orchestrator.is_ready():
+            health = self.orchestrator.get_health()
+            failed = [name for name, c in health["components"].items() if c["status"] == "failed"]
+            if failed:
+                raise HTTPError(503, f"Components failed to load: {', '.join(failed)}")
+            raise HTTPError(503, "Components are warming up", {"Retry-After": str(self.limiter.retry_after)})
+        return self.orchestrator
+
+    async def _run(self, executor: ThreadPoolExecutor, fn: Callable, *args, **kwargs) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+    async def _handle_health(self, payload: Dict) -> Tuple[int, Dict, Dict[str, str]]:
+        if self.orchestrator is None:
+            health = {"status": "starting", "ready": False, "components": {}}
+        else:
+            health = self.orchestrator.get_health()
+        health["server"] = self.limiter.stats()
+        return (200 if health["ready"] else 503), health, {}
+
+    async def _handle_generate(self, payload: Dict) -> Tuple[int, Dict, Dict[str, str]]:
+        query = payload.get("query")
+        if not isinstance(query, str) or not query.strip():
+            raise HTTPError(400, "'query' must be a non-empty string")
+        orchestrator = self._require_ready()
+
+        async with self.limiter as queue_seconds:
+            start = time.perf_counter()
+            nlu_result = await self._run(self._llm_executor, orchestrator.analyze_request, query)
+            nlu_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            result = await self._run(self._cpu_executor, orchestrator.complete_request, query, nlu_result)
+            generate_seconds = time.perf_counter() - start
+
+        timing = (
+            f"queue;dur={queue_seconds * 1000:.1f}, nlu;dur={nlu_seconds * 1000:.1f}, "
+            f"generate;dur={generate_seconds * 1000:.1f}"
+        )
+        return (422 if "error" in result else 200), result, {"Server-Timing": timing}
+
+    async def _handle_rank(self, payload: Dict) -> Tuple[int, Dict, Dict[str, str]]:
+        candidates = payload.get("candidates")
+        if not isinstance(candidates, list) or not all(
+            isinstance(c, dict) and _is_node_chain(c.get("path")) for c in candidates
+        ):
+            raise HTTPError(400, "'candidates' must be a list of objects with a 'path' list of node types")
+        strategy = payload.get("strategy", "average")
+        if strategy not in SCORING_STRATEGIES:
+            raise HTTPError(400, f"'strategy' must be one of {list(SCORING_STRATEGIES)}")
+        orchestrator = self._require_ready()
+        top_k = payload.get("top_k", orchestrator.ranking_top_k)
+        try:
+            min_score = float(payload.get("min_score", 0.0))
+            critical_node_weight = float(payload.get("critical_node_weight", 0.5))
+            top_k = None if top_k is None else int(top_k)
+        except (TypeError, ValueError):
+            raise HTTPError(400, "'min_score', 'critical_node_weight' and 'top_k' must be numbers")
+
+        async with self.limiter:
+            ranked = await self._run(
+                self._cpu_executor,
+                orchestrator.scorer.rank_candidates,
+                candidates,
+                strategy=strategy,
+                min_score=min_score,
+                critical_node_weight=critical_node_weight,
+                top_k=top_k
+            )
+        return 200, {"candidates": ranked}, {}
+
+    async def _handle_fill(self, payload: Dict) -> Tuple[int, Dict, Dict[str, str]]:
+        path = payload.get("path")
+        if not _is_node_chain(path):
+            raise HTTPError(400, "'path' must be a non-empty list of node types")
+        params = payload.get("params", {})
+        workflow_name = payload.get("workflow_name", "Generated Workflow")
+        if not isinstance(params, dict) or not isinstance(workflow_name, str):
+            raise HTTPError(400, "'params' must be an object and 'workflow_name' a string")
+        orchestrator = self._require_ready()
+
+        async with self.limiter:
+            filled = await self._run(self._cpu_executor, orchestrator.fill_workflow, path, params, workflow_name)
+        return 200, filled, {}
+
+
+def _is_node_chain(path: Any) -> bool:
+    """是否為非空的節點類型列表"""
+    return isinstance(path, list) and bool(path) and all(isinstance(node, str) for node in path)
+
+
+def create_app(
+    config_path: Optional[str] = None,
+    openai_key: Optional[str] = None,
+    orchestrator: Optional[WorkflowOrchestrator] = None
+) -> RecommenderApp:
+    """
+    建立 ASGI 應用程式（可作為 uvicorn --factory 的入口）
+
+    Args:
+        config_path: 配置檔案路徑（可選）
+        openai_key: OpenAI API 密鑰（可選，預設讀取 config.yaml）
+        orchestrator: 已建立的協調器（可選）
+
+    Returns:
+        app: ASGI 應用程式
+    """
+    return RecommenderApp(orchestrator=orchestrator, config_path=config_path, openai_key=openai_key)
+
+
+def serve(
+    app: RecommenderApp,
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    backend: Optional[str] = None
+):
+    """
+    啟動 HTTP 服務（阻塞直到中斷）
+
+    Args:
+        app: RecommenderApp
+        host / port: 監聽位址（預設讀取 config.yaml 的 server 區段）
+        backend: auto（已安裝 uvicorn 時使用 uvicorn，否則使用內建伺服器）| uvicorn | builtin
+    """
+    host = host or app.server_config['host']
+    port = int(port or app.server_config['port'])
+    backend = backend or app.server_config['backend']
+    if backend not in SERVER_BACKENDS:
+        raise ValueError(f"未知的 server.backend: {backend}")
+
+    if backend in ('auto', 'uvicorn'):
+        try:
+            import uvicorn
+        except ImportError:
+            if backend == 'uvicorn':
+                raise
+            uvicorn = None
+        if uvicorn is not None:
+            uvicorn.run(app, host=host, port=port, lifespan="on")
+            return
+
+    from .builtin_server import BuiltinServer
+    try:
+        asyncio.run(BuiltinServer(app, host, port, max_body_bytes=app.max_body_bytes).serve())
+    except KeyboardInterrupt:
+        pass
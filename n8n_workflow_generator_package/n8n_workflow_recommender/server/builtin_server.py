@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+內建 HTTP 伺服器
+
+以 asyncio 實作、不依賴第三方套件的最小 HTTP/1.1 伺服器，用來執行 ASGI 應用程式
+（未安裝 uvicorn 時使用）。支援 keep-alive、Content-Length 請求主體與 ASGI lifespan；
+不支援 chunked 請求主體、TLS 與 HTTP/2，回應主體會先完整緩衝再送出。
+"""
+
+import asyncio
+from email.utils import formatdate
+from http import HTTPStatus
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+
+# 請求行 + headers 的最大長度
+MAX_HEADER_BYTES = 64 * 1024
+
+# keep-alive 連線閒置多久後關閉（秒）
+KEEP_ALIVE_TIMEOUT = 5.0
+
+# 由伺服器決定的回應 headers（忽略應用程式提供的值）
+_HOP_BY_HOP_HEADERS = {b"content-length", b"connection", b"transfer-encoding", b"keep-alive"}
+
+
+class _BadRequest(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class BuiltinServer:
+    """
+    最小 HTTP/1.1 伺服器
+
+    每個連線一個 asyncio task，同一連線上的請求依序處理；
+    請求的並行上限與排隊由應用程式本身（RequestLimiter）負責。
+    """
+
+    def __init__(self, app: Callable, host: str = "127.0.0.1", port: int = 8000, max_body_bytes: int = 1048576):
+        """
+        Args:
+            app: ASGI 應用程式
+            host / port: 監聽位址
+            max_body_bytes: 請求主體上限（超過時返回 413 並關閉連線）
+        """
+        self.app = app
+        self.host = host
+        self.port = port
+        self.max_body_bytes = max_body_bytes
+        self._lifespan_task: Optional[asyncio.Task] = None
+        self._lifespan_receive: Optional[asyncio.Queue] = None
+        self._lifespan_send: Optional[asyncio.Queue] = None
+
+    async def serve(self):
+        """執行 lifespan startup 後開始監聽，直到被取消（Ctrl+C）"""
+        await self._start_lifespan()
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES)
+        print(f"🚀 Serving on http://{self.host}:{self.port} (built-in server)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self._stop_lifespan()
+            print("👋 Server stopped")
+
+    # ------------------------------------------------------------------
+    # ASGI lifespan
+    # ------------------------------------------------------------------
+
+    async def _lifespan_event(self, message: Dict) -> Optional[Dict]:
+        """送出 lifespan 事件並等待回覆（應用程式不支援 lifespan 時返回 None）"""
+        await self._lifespan_receive.put(message)
+        reply = asyncio.ensure_future(self._lifespan_send.get())
+        await asyncio.wait([reply, self._lifespan_task], return_when=asyncio.FIRST_COMPLETED)
+        if reply.done():
+            return reply.result()
+        reply.cancel()
+        return None
+
+    async def _start_lifespan(self):
+        self._lifespan_receive = asyncio.Queue()
+        self._lifespan_send = asyncio.Queue()
+
+        async def run():
+            try:
+                await self.app({"type": "lifespan", "asgi": {"version": "3.0"}},
+                               self._lifespan_receive.get, self._lifespan_send.put)
+            except Exception as e:
+                print(f"⚠️  Warning: ASGI lifespan not supported: {e}")
+
+        self._lifespan_task = asyncio.create_task(run())
+        reply = await self._lifespan_event({"type": "lifespan.startup"})
+        if reply is not None and reply["type"] == "lifespan.startup.failed":
+            raise RuntimeError(f"Application startup failed: {reply.get('message', '')}")
+
+    async def _stop_lifespan(self):
+        if self._lifespan_task is None or self._lifespan_task.done():
+            return
+        await self._lifespan_event({"type": "lifespan.shutdown"})
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info("peername")
+        client = tuple(peer[:2]) if isinstance(peer, tuple) else None
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._write_response(writer, 431, [], b"", keep_alive=False)
+                    break
+
+                try:
+                    method, target, version, headers = self._parse_head(head)
+                    body = await self._read_body(reader, writer, headers)
+                except _BadRequest as e:
+                    await self._write_response(writer, e.status, [], e.message.encode("utf-8"), keep_alive=False)
+                    break
+
+                connection = self._header(headers, b"connection").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                status, response_headers, response_body = await self._run_app(
+                    method, target, version, headers, body, client
+                )
+                await self._write_response(writer, status, response_headers, response_body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # 伺服器關閉時取消仍開啟的連線（正常結束，避免 asyncio 輸出 callback 錯誤）
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> str:
+        for key, value in headers:
+            if key == name:
+                return value.decode("latin-1").strip()
+        return ""
+
+    @staticmethod
+    def _parse_head(head: bytes) -> Tuple[str, str, str, List[Tuple[bytes, bytes]]]:
+        lines = head[:-4].split(b"\r\n")
+        parts = lines[0].decode("latin-1").split(" ")
+        if len(parts) != 3 or parts[2] not in ("HTTP/1.0", "HTTP/1.1"):
+            raise _BadRequest(400, "Malformed request line")
+        headers = []
+        for line in lines[1:]:
+            name, sep, value = line.partition(b":")
+            if not sep or not name.strip():
+                raise _BadRequest(400, "Malformed header")
+            headers.append((name.strip().lower(), value.strip()))
+        return parts[0], parts[1], parts[2], headers
+
+    async def _read_body(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        headers: List[Tuple[bytes, bytes]]
+    ) -> bytes:
+        if self._header(headers, b"transfer-encoding"):
+            raise _BadRequest(411, "Chunked request bodies are not supported; send Content-Length")
+        try:
+            length = int(self._header(headers, b"content-length") or 0)
+        except ValueError:
+            raise _BadRequest(400, "Invalid Content-Length")
+        if length < 0:
+            raise _BadRequest(400, "Invalid Content-Length")
+        if length > self.max_body_bytes:
+            raise _BadRequest(413, f"Request body exceeds {self.max_body_bytes} bytes")
+        if length and self._header(headers, b"expect").lower() == "100-continue":
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            await writer.drain()
+        return await reader.readexactly(length) if length else b""
+
+    async def _run_app(
+        self,
+        method: str,
+        target: str,
+        version: str,
+        headers: List[Tuple[bytes, bytes]],
+        body: bytes,
+        client: Optional[Tuple]
+    ) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+        path, _, query = target.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": version[len("HTTP/"):],
+            "method": method.upper(),
+            "scheme": "http",
+            "path": unquote(path),
+            "raw_path": path.encode("latin-1"),
+            "query_string": query.encode("latin-1"),
+            "root_path": "",
+            "headers": headers,
+            "client": client,
+            "server": (self.host, self.port)
+        }
+        response = {"status": 500, "headers": [], "body": bytearray(), "started": False}
+        finished = asyncio.Event()
+        body_sent = False
+
+        async def receive() -> Dict:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: Dict):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+                response["started"] = True
+            elif message["type"] == "http.response.body":
+                response["body"].extend(message.get("body", b""))
+
+        try:
+            await self.app(scope, receive, send)
+        except Exception as e:
+            print(f"⚠️  Warning: Unhandled error in ASGI application: {type(e).__name__}: {e}")
+            if not response["started"]:
+                return 500, [], b"Internal Server Error"
+        finally:
+            finished.set()
+        return response["status"], response["headers"], bytes(response["body"])
+
+    @staticmethod
+    async def _write_response(
+        writer: asyncio.StreamWriter,
+        status: int,
+        headers: List[Tuple[bytes, bytes]],
+        body: bytes,
+        keep_alive: bool
+    ):
+        try:
+            reason = HTTPStatus(status).phrase
+        except ValueError:
+            reason = ""
+        lines = [f"HTTP/1.1 {status} {reason}".encode("latin-1")]
+        lines.extend(
+            bytes(name) + b": " + bytes(value)
+            for name, value in headers if bytes(name).lower() not in _HOP_BY_HOP_HEADERS
+        )
+        lines.append(b"date: " + formatdate(usegmt=True).encode("latin-1"))
+        lines.append(b"content-length: " + str(len(body)).encode("latin-1"))
+        lines.append(b"connection: " + (b"keep-alive" if keep_alive else b"close"))
+        writer.write(b"\r\n".join(lines) + b"\r\n\r\n" + body)
+        await writer.drain()
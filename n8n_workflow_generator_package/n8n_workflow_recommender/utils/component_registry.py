@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+元件登錄表
+
+依名稱登錄元件的建立函數，第一次使用（或背景預熱）時才建立，
+並記錄每個元件的狀態與載入時間，供 readiness / health 檢查使用。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+# 元件狀態
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class LazyComponent:
+    """
+    延遲建立的元件
+
+    多個執行緒同時 get() 時只有一個會執行建立函數，其餘等待同一個結果；
+    建立失敗時記錄錯誤並拋出，下一次 get() 會重試。
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        """
+        Args:
+            name: 元件名稱
+            factory: 建立函數（無參數，返回元件）
+        """
+        self.name = name
+        self.factory = factory
+        self.status = PENDING
+        self.load_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self._value: Any = None
+        self._lock = threading.Lock()
+        self._settled = threading.Event()
+
+    def get(self) -> Any:
+        """取得元件（尚未建立時在呼叫端執行緒中建立）"""
+        if self.status == READY:
+            return self._value
+
+        with self._lock:
+            if self.status == READY:
+                return self._value
+
+            self.status = LOADING
+            self.error = None
+            self._settled.clear()
+            start = time.perf_counter()
+            try:
+                value = self.factory()
+            except Exception as e:
+                self.load_seconds = time.perf_counter() - start
+                self.error = f"{type(e).__name__}: {e}"
+                self.status = FAILED
+                self._settled.set()
+                raise
+
+            self.load_seconds = time.perf_counter() - start
+            self._value = value
+            self.status = READY
+            self._settled.set()
+            return value
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待元件建立完成（成功或失敗），返回是否已就緒"""
+        self._settled.wait(timeout)
+        return self.status == READY
+
+    def to_dict(self) -> Dict:
+        return {
+            "status": self.status,
+            "load_seconds": round(self.load_seconds, 4) if self.load_seconds is not None else None,
+            "error": self.error
+        }
+
+
+class ComponentRegistry:
+    """
+    元件登錄表
+
+    元件依登錄順序預熱；元件的建立函數可以再 get() 其他元件（依賴會先被建立），
+    但依賴關係不可形成循環。
+    """
+
+    def __init__(self):
+        self._components: "OrderedDict[str, LazyComponent]" = OrderedDict()
+        self._created_at = time.monotonic()
+        self._warmup_thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """
+        登錄元件
+
+        Args:
+            name: 元件名稱
+            factory: 建立函數（無參數，返回元件）
+        """
+        self._components[name] = LazyComponent(name, factory)
+
+    def get(self, name: str) -> Any:
+        """取得元件（第一次使用時建立）"""
+        return self._components[name].get()
+
+    def is_ready(self, name: Optional[str] = None) -> bool:
+        """指定元件（或所有元件）是否都已建立完成"""
+        if name is not None:
+            return self._components[name].status == READY
+        return all(c.status == READY for c in self._components.values())
+
+    def warm_up(
+        self,
+        names: Optional[Iterable[str]] = None,
+        background: bool = False,
+        on_complete: Optional[Callable[[], None]] = None
+    ) -> Optional[threading.Thread]:
+        """
+        依序建立元件
+
+        Args:
+            names: 要建立的元件（預設為全部，依登錄順序）
+            background: 是否在背景 daemon 執行緒中建立（失敗只記錄，不拋出）
+            on_complete: 背景預熱結束後呼叫（可選）
+
+        Returns:
+            thread: 背景預熱執行緒（前景模式返回 None，建立失敗時直接拋出）
+        """
+        names = list(names) if names is not None else list(self._components)
+        if not background:
+            for name in names:
+                self.get(name)
+            return None
+
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"⚠️  Warning: Failed to warm up component '{name}': {e}")
+            if on_complete is not None:
+                on_complete()
+
+        self._warmup_thread = threading.Thread(target=run, name="component-warmup", daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待所有元件建立完成
+
+        沒有背景預熱在執行時，從未使用過的元件不會自行建立，此時直接返回 False。
+
+        Args:
+            timeout: 最長等待秒數（None 表示不限）
+
+        Returns:
+            ready: 所有元件是否都已就緒
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for component in self._components.values():
+            warming_up = self._warmup_thread is not None and self._warmup_thread.is_alive()
+            if component.status == PENDING and not warming_up:
+                return False
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not component.wait(remaining):
+                return False
+        return True
+
+    def status(self) -> Dict:
+        """
+        取得健康狀態
+
+        Returns:
+            status: {
+                "status": "ready" | "starting" | "failed",
+                "ready": bool,
+                "uptime_seconds": float,
+                "components": {name: {"status", "load_seconds", "error"}}
+            }
+        """
+        components = {name: c.to_dict() for name, c in self._components.items()}
+        statuses = [c["status"] for c in components.values()]
+        if statuses and all(s == READY for s in statuses):
+            overall = READY
+        elif FAILED in statuses:
+            overall = FAILED
+        else:
+            overall = "starting"
+        return {
+            "status": overall,
+            "ready": overall == READY,
+            "uptime_seconds": round(time.monotonic() - self._created_at, 3),
+            "components": components
+        }
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+並行工具
+
+以共用的執行緒池並行發出互相獨立的 LLM 呼叫（OpenAI client 可跨執行緒共用），
+每個呼叫有各自的逾時；逾時或失敗時取消並改用呼叫端提供的備用結果。
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Optional
+
+
+class LLMFanOut:
+    """
+    LLM 呼叫扇出執行器
+
+    max_workers <= 0 時停用並行：submit() 會在呼叫端執行緒中立即執行，
+    因此呼叫端不需要區分並行 / 循序兩種寫法。
+    """
+
+    def __init__(self, max_workers: int = 4, call_timeout: Optional[float] = 60.0):
+        """
+        Args:
+            max_workers: 執行緒數量（<= 0 表示循序執行）
+            call_timeout: 每個呼叫的逾時秒數（從 submit 起算，None 表示不限）
+        """
+        self.max_workers = max(0, int(max_workers))
+        self.call_timeout = call_timeout if call_timeout and call_timeout > 0 else None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_workers > 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-fanout")
+            return self._executor
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        提交一個呼叫
+
+        Returns:
+            future: 呼叫結果（循序模式下為已完成的 Future）
+        """
+        if not self.enabled:
+            future = Future()
+            future.submitted_at = time.monotonic()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        future = self._get_executor().submit(fn, *args, **kwargs)
+        future.submitted_at = time.monotonic()
+        return future
+
+    def result(self, future: Future, name: str, fallback: Callable[[], Any]) -> Any:
+        """
+        取得呼叫結果；逾時或失敗時取消呼叫並返回 fallback()
+
+        Args:
+            future: submit() 返回的 Future
+            name: 呼叫名稱（用於日誌）
+            fallback: 產生備用結果的函數
+
+        Returns:
+            result: 呼叫結果或備用結果
+        """
+        timeout = None
+        if self.call_timeout is not None:
+            elapsed = time.monotonic() - getattr(future, 'submitted_at', time.monotonic())
+            timeout = max(0.0, self.call_timeout - elapsed)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            print(f"   ⚠️  LLM call '{name}' timed out after {self.call_timeout:g}s, using fallback")
+        except Exception as e:
+            print(f"   ⚠️  LLM call '{name}' failed: {e}, using fallback")
+        return fallback()
+
+    @staticmethod
+    def resolved(value: Any) -> Future:
+        """包裝成已完成的 Future（例如先前階段已取得的 LLM 結果），result() 會立即返回"""
+        future = Future()
+        future.submitted_at = time.monotonic()
+        future.set_result(value)
+        return future
+
+    @staticmethod
+    def cancel(future: Optional[Future]):
+        """取消尚未開始的呼叫（已開始的呼叫會在背景完成，結果被丟棄）"""
+        if future is not None:
+            future.cancel()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Embedding 服務
+
+進程內共享的 SentenceTransformer 模型註冊表（以模型名稱 + device 為鍵），
+提供批次 encode、以位元組上限控制的 LRU 文字→向量快取，以及命中/未命中統計。
+MCTS 搜索、trigger / end 節點選擇與參數評估共用同一份模型與快取。
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+DEFAULT_MODEL_NAME = "paraphrase-multilingual-mpnet-base-v2"
+
+# LRU 快取預設上限：64 MB（768 維 float32 約 3 KB / 筆，約 2 萬筆）
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+_registry: Dict[Tuple[str, str], "EmbeddingService"] = {}
+_registry_lock = threading.Lock()
+
+
+def resolve_device(device: Optional[str] = None) -> str:
+    """
+    解析 device（未指定時有 GPU 用 cuda，否則用 cpu）
+
+    Args:
+        device: 指定的 device（可選）
+
+    Returns:
+        device: 解析後的 device 名稱
+    """
+    if device:
+        return device
+    try:
+        import torch
+        return 'cuda' if torch.cuda.is_available() else 'cpu'
+    except ImportError:
+        return 'cpu'
+
+
+class EmbeddingService:
+    """
+    共享 Embedding 服務
+
+    encode() 回傳 L2 正規化的 float32 向量，因此 cosine similarity 只需內積。
+    快取中的向量為唯讀陣列，呼叫端不應修改。
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        device: Optional[str] = None,
+        cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES
+    ):
+        """
+        Args:
+            model_name: SentenceTransformer 模型名稱
+            device: 模型 device（預設自動選擇）
+            cache_max_bytes: LRU 快取的位元組上限（0 表示停用快取）
+        """
+        self.model_name = model_name
+        self.device = resolve_device(device)
+        self.cache_max_bytes = int(cache_max_bytes)
+
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._cache_bytes = 0
+        self._cache_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def model(self):
+        """SentenceTransformer 模型（第一次使用時才載入）"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    print(f"   📦 Loading embedding model: {self.model_name} ({self.device})")
+                    self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    def set_cache_limit(self, cache_max_bytes: int):
+        """調整 LRU 快取上限（超出的舊項目會立即淘汰）"""
+        with self._cache_lock:
+            self.cache_max_bytes = int(cache_max_bytes)
+            self._evict_locked()
+
+    def _evict_locked(self):
+        while self._cache and self._cache_bytes > self.cache_max_bytes:
+            _, vector = self._cache.popitem(last=False)
+            self._cache_bytes -= vector.nbytes
+            self.evictions += 1
+
+    def _cache_put_locked(self, text: str, vector: np.ndarray):
+        if self.cache_max_bytes <= 0 or vector.nbytes > self.cache_max_bytes:
+            return
+        old = self._cache.pop(text, None)
+        if old is not None:
+            self._cache_bytes -= old.nbytes
+        self._cache[text] = vector
+        self._cache_bytes += vector.nbytes
+        self._evict_locked()
+
+    def _encode_batch(self, texts: List[str], batch_size: int, show_progress_bar: bool) -> np.ndarray:
+        embeddings = self.model.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=show_progress_bar
+        )
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim == 1:
+            embeddings = embeddings.reshape(len(texts), -1)
+        return embeddings
+
+    def encode(
+        self,
+        texts: Sequence[str],
+        batch_size: int = 32,
+        use_cache: bool = True,
+        show_progress_bar: bool = False
+    ) -> np.ndarray:
+        """
+        批次編碼文字（只對快取未命中的文字呼叫模型，且同一批內重複文字只編碼一次）
+
+        Args:
+            texts: 文字列表
+            batch_size: 模型批次大小
+            use_cache: 是否讀寫 LRU 快取（大量一次性文字，例如建立索引時可關閉）
+            show_progress_bar: 是否顯示進度條
+
+        Returns:
+            embeddings: (N, dim) 的 L2 正規化 float32 矩陣
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        if not use_cache:
+            return self._encode_batch(texts, batch_size, show_progress_bar)
+
+        found: Dict[str, np.ndarray] = {}
+        missing: List[str] = []
+        with self._cache_lock:
+            for text in texts:
+                if text in found:
+                    continue
+                vector = self._cache.get(text)
+                if vector is not None:
+                    self._cache.move_to_end(text)
+                    found[text] = vector
+                    self.hits += 1
+                elif text not in missing:
+                    missing.append(text)
+            self.misses += len(missing)
+
+        if missing:
+            embeddings = self._encode_batch(missing, batch_size, show_progress_bar)
+            with self._cache_lock:
+                for text, vector in zip(missing, embeddings):
+                    vector = vector.copy()
+                    vector.setflags(write=False)
+                    found[text] = vector
+                    self._cache_put_locked(text, vector)
+
+        return np.stack([found[text] for text in texts])
+
+    def encode_one(self, text: str) -> np.ndarray:
+        """編碼單一文字（L2 正規化 float32 向量）"""
+        return self.encode([text])[0]
+
+    def clear_cache(self):
+        """清空 LRU 快取（統計數據保留）"""
+        with self._cache_lock:
+            self._cache.clear()
+            self._cache_bytes = 0
+
+    def get_stats(self) -> Dict:
+        """
+        取得快取統計
+
+        Returns:
+            stats: hits、misses、hit_rate、entries、bytes 等
+        """
+        with self._cache_lock:
+            total = self.hits + self.misses
+            return {
+                "model_name": self.model_name,
+                "device": self.device,
+                "model_loaded": self._model is not None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._cache),
+                "bytes": self._cache_bytes,
+                "max_bytes": self.cache_max_bytes
+            }
+
+
+def get_embedding_service(
+    model_name: str = DEFAULT_MODEL_NAME,
+    device: Optional[str] = None,
+    cache_max_bytes: Optional[int] = None
+) -> EmbeddingService:
+    """
+    從進程內註冊表取得（或建立）共享的 EmbeddingService
+
+    Args:
+        model_name: SentenceTransformer 模型名稱
+        device: 模型 device（預設自動選擇）
+        cache_max_bytes: LRU 快取上限（指定時會套用到已存在的服務）
+
+    Returns:
+        service: 共享的 EmbeddingService
+    """
+    key = (model_name, resolve_device(device))
+    with _registry_lock:
+        service = _registry.get(key)
+        if service is None:
+            service = EmbeddingService(
+                model_name,
+                device=key[1],
+                cache_max_bytes=cache_max_bytes if cache_max_bytes is not None else DEFAULT_CACHE_MAX_BYTES
+            )
+            _registry[key] = service
+            return service
+
+    if cache_max_bytes is not None and cache_max_bytes != service.cache_max_bytes:
+        service.set_cache_limit(cache_max_bytes)
+    return service
@@ -6,9 +6,11 @@
 """
 
 import json
+import os
+import tempfile
 import yaml
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, BinaryIO, Callable, Dict, Optional
 
 
 def load_json(file_path: str) -> Dict:
@@ -46,6 +48,64 @@ def save_json(data: Dict, file_path: str, indent: int = 2):
         json.dump(data, f, ensure_ascii=False, indent=indent)
 
 
+def _read_umask() -> int:
+    # os.umask 只能以「設定再還原」的方式讀取，因此只在 import 時讀一次（避免與其他執行緒建立檔案競爭）
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+_UMASK = _read_umask()
+
+
+def atomic_write_bytes(target: Path, write_fn: Callable[[BinaryIO], Any]):
+    """
+    原子寫入二進位檔：先寫入同目錄的暫存檔再 rename，避免其他 process 讀到寫一半的檔案
+    
+    mkstemp 建立的暫存檔權限固定為 0600；rename 前改為既有檔案的權限，
+    或與 open() 相同的 0666 & ~umask，讓其他帳號執行的服務仍可讀取離線建立的檔案。
+    
+    Args:
+        target: 輸出檔案路徑（所在目錄必須已存在）
+        write_fn: 接收已開啟的二進位檔案物件並寫入內容的函式
+    """
+    target = Path(target)
+    try:
+        mode = target.stat().st_mode & 0o7777
+    except OSError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp_path = tempfile.mkstemp(dir=str(target.parent), prefix=f".{target.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write_fn(f)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def resolve_config_path(path_str: str, base_dir: Path) -> Path:
+    """
+    解析 config.yaml 中的路徑
+    
+    config 中的相對路徑以 "../" 開頭（相對於 n8n_workflow_recommender/），
+    這裡統一轉為相對於打包目錄根目錄的路徑。
+    
+    Args:
+        path_str: 配置中的路徑字串
+        base_dir: 打包目錄根目錄
+    
+    Returns:
+        path: 解析後的絕對路徑
+    """
+    if path_str.startswith('../'):
+        path_str = path_str[3:]
+    path = Path(path_str)
+    return path if path.is_absolute() else Path(base_dir) / path
+
+
 def load_yaml(file_path: str) -> Dict:
     """
     載入 YAML 檔案
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: cycle-breaking fallback ordering in DomainKnowledgeGraph._find_path_for_nodes.
+
+For random core-node sets of increasing size, compares:
+  - legacy:    NetworkX subgraph copy + repeated is_directed_acyclic_graph / find_cycle /
+               remove_edge until acyclic, then topological_sort (the previous fallback)
+  - condensed: group by the SCC condensation precomputed at load time, then order each
+               group on the induced subgraph (DomainKnowledgeGraph.order_by_condensation)
+
+and reports time per call plus the number of induced edges each ordering points
+backwards (lower is better; the legacy loop removes whole cycles edge by edge).
+
+Usage:
+    python scripts/benchmark_path_fallback.py --kg data/adapted_knowledge_graph.json --sizes 20 50 100 200 377
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from n8n_workflow_recommender.generation.workflow_composer import DomainKnowledgeGraph
+from n8n_workflow_recommender.utils.file_loader import load_json
+
+
+def legacy_order(graph, core: List[str]) -> List[str]:
+    import networkx as nx
+
+    H = nx.DiGraph(graph.subgraph(core))
+    while not nx.is_directed_acyclic_graph(H) and len(H.edges()) > 0:
+        try:
+            cycle = nx.find_cycle(H)
+            H.remove_edge(cycle[0][0], cycle[0][1])
+        except nx.NetworkXNoCycle:
+            break
+    return list(nx.topological_sort(H))
+
+
+def backward_edges(domain_graph: DomainKnowledgeGraph, order: List[str]) -> int:
+    position = {n: i for i, n in enumerate(order)}
+    count = 0
+    for u in order:
+        for v in domain_graph.csr.successors(u):
+            if v in position and v != u and position[v] < position[u]:
+                count += 1
+    return count
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--kg", type=str, default="data/adapted_knowledge_graph.json")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[20, 50, 100, 200, 377])
+    ap.add_argument("--samples", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--skip-legacy", action="store_true", help="only time the precomputed ordering")
+    args = ap.parse_args()
+
+    kg = load_json(args.kg)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        domain_graph = DomainKnowledgeGraph(kg.get("triples", []), kg.get("ontology", {}))
+        load_s = time.perf_counter() - start
+    num_sccs = int(domain_graph.scc_component.max()) + 1
+    print(f"graph: {len(domain_graph.csr)} nodes, {domain_graph.csr.num_edges} edges, "
+          f"{num_sccs} SCCs, load+condensation {load_s * 1000:.1f} ms")
+
+    nx_graph = None if args.skip_legacy else domain_graph.to_networkx()
+    rng = random.Random(args.seed)
+    nodes = list(domain_graph.csr.nodes)
+
+    print(f"{'size':>5} {'legacy(ms)':>11} {'condensed(ms)':>14} {'legacy back':>12} {'condensed back':>15}")
+    for size in args.sizes:
+        size = min(size, len(nodes))
+        legacy_ms = condensed_ms = 0.0
+        legacy_back = condensed_back = 0
+        for _ in range(args.samples):
+            core = rng.sample(nodes, size)
+
+            start = time.perf_counter()
+            order = domain_graph.csr.names(domain_graph.order_by_condensation(core))
+            condensed_ms += (time.perf_counter() - start) * 1000
+            condensed_back += backward_edges(domain_graph, order)
+
+            if nx_graph is not None:
+                start = time.perf_counter()
+                order = legacy_order(nx_graph, core)
+                legacy_ms += (time.perf_counter() - start) * 1000
+                legacy_back += backward_edges(domain_graph, order)
+
+        n = args.samples
+        legacy_cols = (
+            f"{legacy_ms / n:>11.2f}" if nx_graph is not None else f"{'-':>11}",
+            f"{legacy_back / n:>12.1f}" if nx_graph is not None else f"{'-':>12}",
+        )
+        print(f"{size:>5} {legacy_cols[0]} {condensed_ms / n:>14.3f} {legacy_cols[1]} {condensed_back / n:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
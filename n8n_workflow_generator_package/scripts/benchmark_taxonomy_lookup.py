@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: TaxonomySearchAgent node_database lookups vs. taxonomy size.
+
+Replicates the top-level categories of a taxonomy JSON N times, builds an agent
+for each scale and reports:
+  - path lookup time: get_node_by_path() vs. the old linear next(...) scan
+  - category lookup time: get_nodes_by_category() vs. filtering node_database
+  - category coverage lookup: the critical-category index used by
+    _ensure_category_coverage() vs. the old first-match scan
+  - search_by_keywords() time per call (still a linear substring scan)
+  - end-to-end search_with_categories() time per query
+
+Usage:
+    python scripts/benchmark_taxonomy_lookup.py --taxonomy data/taxonomy_full_with_examples.json --scales 1 2 4 8
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from n8n_workflow_recommender.search.mcts_search_agent import CRITICAL_CATEGORIES, TaxonomySearchAgent
+
+
+def _taxonomy_root(raw: Dict):
+    for key in ("Taxonomy", "Taxonomy_n8n"):
+        if key in raw:
+            return key, raw[key]
+    return None, raw
+
+
+def replicate_taxonomy(raw: Dict, scale: int) -> Dict:
+    """Duplicate every top-level category `scale` times under distinct names."""
+    root_key, root = _taxonomy_root(raw)
+    replicated = {}
+    for copy_idx in range(scale):
+        for key, content in root.items():
+            if copy_idx == 0:
+                replicated[key] = content
+                continue
+            new_content = copy.deepcopy(content)
+            if isinstance(new_content, dict) and "name" in new_content:
+                new_content["name"] = f"{new_content['name']} #{copy_idx}"
+            replicated[f"{key} #{copy_idx}"] = new_content
+    return {root_key: replicated} if root_key else replicated
+
+
+def _time_per_call(fn, items: List, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            fn(item)
+    return (time.perf_counter() - start) / (repeat * max(len(items), 1))
+
+
+def benchmark_scale(agent: TaxonomySearchAgent, query: Dict, repeat: int) -> Dict:
+    paths = [item["path_str"] for item in agent.node_database]
+    categories = sorted(agent._db_indices_by_category)
+
+    def linear_path(path_str):
+        return next((item for item in agent.node_database if item["path_str"] == path_str), None)
+
+    def linear_category(category):
+        return [
+            item for item in agent.node_database
+            if agent._first_level_category(item.get("path_str", "")) == category
+        ]
+
+    def linear_coverage(category):
+        return next((item for item in agent.node_database if agent._has_category_match(item, [category])), None)
+
+    def indexed_coverage(category):
+        indices = agent._db_indices_by_critical_category[category]
+        return agent.node_database[indices[0]] if indices else None
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            agent.search_by_keywords(set(query["keywords"]))
+        keyword_ms = (time.perf_counter() - start) / repeat * 1000
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            agent.search_with_categories(
+                query["text"], query["categories"], set(query["keywords"]),
+                llm_selected_nodes=set(query["llm_nodes"]),
+                iterations=query["iterations"], top_n=5
+            )
+        search_ms = (time.perf_counter() - start) / repeat * 1000
+
+    return {
+        "leaves": len(agent.node_database),
+        "path_dict_us": _time_per_call(agent.get_node_by_path, paths, repeat) * 1e6,
+        "path_scan_us": _time_per_call(linear_path, paths, repeat) * 1e6,
+        "category_dict_us": _time_per_call(agent.get_nodes_by_category, categories, repeat) * 1e6,
+        "category_scan_us": _time_per_call(linear_category, categories, repeat) * 1e6,
+        "coverage_index_us": _time_per_call(indexed_coverage, CRITICAL_CATEGORIES, repeat) * 1e6,
+        "coverage_scan_us": _time_per_call(linear_coverage, CRITICAL_CATEGORIES, repeat) * 1e6,
+        "keyword_ms": keyword_ms,
+        "search_ms": search_ms,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--taxonomy", type=str, default="data/taxonomy_full_with_examples.json")
+    ap.add_argument("--scales", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--iterations", type=int, default=300)
+    ap.add_argument("--query", type=str, default="Send a Gmail email and add an event to Google Calendar")
+    args = ap.parse_args()
+
+    with open(args.taxonomy, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+
+    query = {
+        "text": args.query,
+        "categories": ["Productivity & Collaboration", "Communication"],
+        "keywords": ["gmail", "email", "calendar"],
+        "llm_nodes": ["n8n-nodes-base.gmail", "n8n-nodes-base.googleCalendar"],
+        "iterations": args.iterations,
+    }
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for scale in args.scales:
+            taxonomy_path = Path(tmp_dir) / f"taxonomy_x{scale}.json"
+            with open(taxonomy_path, "w", encoding="utf-8") as f:
+                json.dump(replicate_taxonomy(raw, scale), f, ensure_ascii=False)
+            with contextlib.redirect_stdout(io.StringIO()):
+                agent = TaxonomySearchAgent(str(taxonomy_path), embedding_cache_dir=str(Path(tmp_dir) / "cache"))
+            rows.append((scale, benchmark_scale(agent, query, args.repeat)))
+
+    print(f"{'scale':>5} {'leaves':>7} {'path dict(us)':>14} {'path scan(us)':>14} "
+          f"{'cat dict(us)':>13} {'cat scan(us)':>13} {'cover idx(us)':>14} {'cover scan(us)':>15} "
+          f"{'keywords(ms)':>13} {'search(ms)':>11}")
+    for scale, r in rows:
+        print(f"{scale:>5} {r['leaves']:>7} {r['path_dict_us']:>14.2f} {r['path_scan_us']:>14.2f} "
+              f"{r['category_dict_us']:>13.2f} {r['category_scan_us']:>13.2f} "
+              f"{r['coverage_index_us']:>14.2f} {r['coverage_scan_us']:>15.2f} "
+              f"{r['keyword_ms']:>13.1f} {r['search_ms']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Build (or refresh) the knowledge-graph reachability / hop-distance index offline.
+
+The index is written next to the knowledge graph JSON and is validated against
+a hash of the graph at startup, so running this script is optional: the
+workflow system rebuilds a stale or missing index automatically.
+
+Usage:
+    python scripts/build_reachability_index.py --kg data/adapted_knowledge_graph.json --max-hops 10
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from n8n_workflow_recommender.generation.csr_graph import CSRGraph
+from n8n_workflow_recommender.generation.reachability_index import ReachabilityIndex
+from n8n_workflow_recommender.utils.file_loader import load_json
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--kg", type=str, default="data/adapted_knowledge_graph.json")
+    ap.add_argument("--output", type=str, default=None,
+                    help="index path (default: <kg>.reachability.npz next to the graph)")
+    ap.add_argument("--max-hops", type=int, default=10)
+    args = ap.parse_args()
+
+    kg_path = Path(args.kg)
+    output = Path(args.output) if args.output else kg_path.with_suffix(".reachability.npz")
+
+    csr = CSRGraph.from_triples(load_json(str(kg_path)).get("triples", []))
+
+    start = time.perf_counter()
+    index = ReachabilityIndex.build(csr, max_hops=args.max_hops)
+    index.save(str(output))
+    elapsed = time.perf_counter() - start
+
+    reachable_pairs = int(np.unpackbits(index.reach_bits, axis=1, count=index.num_nodes).sum())
+    print(f"nodes={index.num_nodes} edges={csr.num_edges} max_hops={index.max_hops}")
+    print(f"reachable pairs={reachable_pairs} build+save={elapsed:.2f}s")
+    print(f"written: {output} ({output.stat().st_size / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
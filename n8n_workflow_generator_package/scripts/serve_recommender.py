@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Serve the workflow recommender over HTTP.
+
+One orchestrator is created per process and warmed up in the background; requests are
+admitted by a bounded queue (503 + Retry-After when full). Uses uvicorn when it is
+installed, otherwise the built-in asyncio server.
+
+Endpoints: GET /health, POST /generate, POST /rank, POST /fill
+(see n8n_workflow_recommender/server/app.py for request/response formats).
+
+Server defaults come from the server section of config.yaml.
+
+Usage:
+    python scripts/serve_recommender.py
+    python scripts/serve_recommender.py --host 0.0.0.0 --port 8080 --max-concurrency 16
+    curl -s localhost:8000/generate -d '{"query": "send new gmail emails to slack"}'
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from n8n_workflow_recommender.server.app import SERVER_BACKENDS, RecommenderApp, serve
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--config", type=str, default=None, help="config.yaml path (default: package config)")
+    ap.add_argument("--host", type=str, default=None)
+    ap.add_argument("--port", type=int, default=None)
+    ap.add_argument("--backend", choices=SERVER_BACKENDS, default=None)
+    ap.add_argument("--max-concurrency", type=int, default=None, help="requests processed at once")
+    ap.add_argument("--max-queue", type=int, default=None, help="requests allowed to wait for a slot")
+    ap.add_argument("--cpu-workers", type=int, default=None, help="threads for search/ranking/JSON stages")
+    args = ap.parse_args()
+
+    overrides = {
+        key: value for key, value in {
+            "max_concurrency": args.max_concurrency,
+            "max_queue": args.max_queue,
+            "cpu_workers": args.cpu_workers,
+        }.items() if value is not None
+    }
+    app = RecommenderApp(config_path=args.config, server_config=overrides)
+    serve(app, host=args.host, port=args.port, backend=args.backend)
+
+
+if __name__ == "__main__":
+    main()
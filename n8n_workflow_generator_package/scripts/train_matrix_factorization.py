@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Train (or incrementally update) the type-to-type matrix factorization model from n8n templates.
+
+Transition counts are accumulated from the templates as sparse COO triples and P/Q are
+fitted with vectorized ALS (multi-threaded row solves) or mini-batch SGD. By default the
+run warm-starts from the model already in --model-dir: templates seen in a previous run
+are skipped, node-type indices are kept, and the existing factors are the starting point.
+The result is written to --output-dir (default models/matrix_factorization_retrained);
+writing into --model-dir, which replaces the model the scorer loads, requires --overwrite.
+
+Outputs (the files MatrixFactorizationScorer reads, plus the training report):
+    type_type_mapping.json, type_type_P.npy, type_type_Q.npy, type_type_prediction_matrix.npy,
+    loss_history_with_validation.json, type_type_model_parameters.json,
+    type_type_transition_counts.npz (accumulated counts for the next incremental run)
+
+Hyper-parameter defaults come from model.matrix_factorization in config.yaml.
+
+Usage:
+    python scripts/train_matrix_factorization.py --templates n8n_templates/training_data
+    python scripts/train_matrix_factorization.py --templates new_templates/ --iterations 10 --overwrite
+    python scripts/train_matrix_factorization.py --no-warm-start --method sgd --output-dir /tmp/mf
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from n8n_workflow_recommender.models.mf_trainer import (
+    TRAINING_METHODS,
+    MatrixFactorizationTrainer,
+    train_from_templates,
+)
+from n8n_workflow_recommender.utils.file_loader import load_yaml
+
+
+def main():
+    base_dir = Path(__file__).parent.parent
+    config = load_yaml(str(base_dir / "n8n_workflow_recommender" / "config" / "config.yaml"))
+    mf_config = config.get("model", {}).get("matrix_factorization", {})
+    training = mf_config.get("training", {})
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--templates", type=str, nargs="+", default=["n8n_templates/training_data"],
+                    help="template directories or files")
+    ap.add_argument("--model-dir", type=str, default="models/matrix_factorization",
+                    help="existing model (warm-start source)")
+    ap.add_argument("--output-dir", type=str, default=None,
+                    help="output directory (default: models/matrix_factorization_retrained, "
+                         "or --model-dir with --overwrite)")
+    ap.add_argument("--overwrite", action="store_true",
+                    help="allow writing into --model-dir (replaces the model the scorer loads)")
+    ap.add_argument("--no-warm-start", action="store_true", help="train from scratch")
+    ap.add_argument("--method", choices=TRAINING_METHODS, default=training.get("method", "als"))
+    ap.add_argument("--num-factors", type=int, default=mf_config.get("num_factors", 8))
+    ap.add_argument("--learning-rate", type=float, default=mf_config.get("learning_rate", 0.005))
+    ap.add_argument("--regularization", type=float, default=mf_config.get("regularization", 0.2))
+    ap.add_argument("--iterations", type=int, default=training.get("iterations", 50))
+    ap.add_argument("--zero-weight", type=float, default=training.get("zero_weight", 0.05))
+    ap.add_argument("--val-fraction", type=float, default=training.get("val_fraction", 0.1))
+    ap.add_argument("--patience", type=int, default=training.get("patience", 5))
+    ap.add_argument("--max-step", type=float, default=training.get("max_step", 0.5),
+                    help="SGD per-row update norm cap (0 = no cap)")
+    ap.add_argument("--n-jobs", type=int, default=training.get("n_jobs") or None,
+                    help="ALS solver threads (default: all cores)")
+    ap.add_argument("--connection-types", type=str, nargs="*",
+                    default=training.get("connection_types", ["main"]),
+                    help="connection kinds to count (none = all)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--skip-prediction-matrix", action="store_true",
+                    help="do not write the dense P @ Q.T (use factorized scoring mode)")
+    args = ap.parse_args()
+
+    output_dir = args.output_dir or (args.model_dir if args.overwrite else "models/matrix_factorization_retrained")
+    if Path(output_dir).resolve() == Path(args.model_dir).resolve() and not args.overwrite:
+        ap.error(f"--output-dir is the existing model directory ({args.model_dir}); pass --overwrite to replace it")
+
+    trainer = MatrixFactorizationTrainer(
+        num_factors=args.num_factors,
+        learning_rate=args.learning_rate,
+        regularization=args.regularization,
+        method=args.method,
+        iterations=args.iterations,
+        zero_weight=args.zero_weight,
+        val_fraction=args.val_fraction,
+        patience=args.patience,
+        max_step=args.max_step,
+        n_jobs=args.n_jobs,
+        seed=args.seed,
+    )
+
+    start = time.perf_counter()
+    result = train_from_templates(
+        args.templates,
+        args.model_dir,
+        output_dir=output_dir,
+        trainer=trainer,
+        warm_start=not args.no_warm_start,
+        connection_types=args.connection_types,
+        write_prediction_matrix=not args.skip_prediction_matrix,
+    )
+    elapsed = time.perf_counter() - start
+
+    print(f"node types={len(result['node_types'])} train entries={result['num_train']} "
+          f"val entries={result['num_val']}")
+    print(f"iterations={result['total_iterations']} best={result['best_iteration']} "
+          f"val MAE={result['val_metrics']['mae']:.4f} total {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# 讓測試可以直接 import n8n_workflow_recommender（從打包目錄根目錄執行 pytest）
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from n8n_workflow_recommender.models.chain_recommender import CRITICAL_NODE_TYPES  # noqa: E402
+
+# 合成 MF 模型的節點類型：關鍵節點 + 一般節點
+MF_NUM_TYPES = 40
+MF_NODE_TYPES = list(CRITICAL_NODE_TYPES) + [
+    f"n8n-nodes-base.type{i}" for i in range(MF_NUM_TYPES - len(CRITICAL_NODE_TYPES))
+]
+
+
+@pytest.fixture(scope="session")
+def mf_model_dir(tmp_path_factory):
+    """小型合成 MF 模型目錄（P / Q / 預測矩陣 / 映射），分數分布跨越 [0, 1] 兩側以驗證修剪"""
+    rng = np.random.default_rng(0)
+    model_dir = tmp_path_factory.mktemp("mf_model")
+    P = rng.normal(0.4, 0.5, size=(MF_NUM_TYPES, 4)) / 2
+    Q = rng.normal(0.4, 0.5, size=(MF_NUM_TYPES, 4)) / 2
+    np.save(model_dir / "type_type_P.npy", P)
+    np.save(model_dir / "type_type_Q.npy", Q)
+    np.save(model_dir / "type_type_prediction_matrix.npy", P @ Q.T)
+    (model_dir / "type_type_mapping.json").write_text(json.dumps({
+        "node_types": MF_NODE_TYPES,
+        "node_type_to_index": {t: i for i, t in enumerate(MF_NODE_TYPES)},
+        "index_to_node_type": {str(i): t for i, t in enumerate(MF_NODE_TYPES)},
+    }), encoding="utf-8")
+    return model_dir
@@ -0,0 +1,119 @@
+"""A* 候選路徑搜索與窮舉的比較"""
+
+import contextlib
+import io
+import random
+
+import pytest
+
+from n8n_workflow_recommender.generation.beam_composer import BeamSearchWorkflowComposer
+from n8n_workflow_recommender.generation.workflow_composer import (
+    DomainKnowledgeGraph, ModuleAwareWorkflowComposer
+)
+from n8n_workflow_recommender.models.chain_recommender import CRITICAL_NODE_TYPES
+
+TOP_K = 5
+MAX_PATH_NODES = 6
+
+
+class RandomTransitionScorer:
+    """固定的隨機 MF 分數（包含 [0, 1] 以外的值，驗證邊成本的修剪）"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.scores = {}
+
+    def get_transition_score(self, source: str, target: str) -> float:
+        return self.scores.setdefault((source, target), self.rng.uniform(-0.2, 1.2))
+
+
+def _random_graph(seed: int, tmp_path):
+    rng = random.Random(seed)
+    nodes = ["start"] + list(CRITICAL_NODE_TYPES) + [f"n8n-nodes-base.node{i}" for i in range(5)]
+    triples = []
+    for i, u in enumerate(nodes):
+        for v in nodes[i + 1:]:
+            if rng.random() < 0.3:
+                triples.append((u, "connects_to", v))
+    # 少量逆向邊形成環
+    for _ in range(3):
+        u, v = rng.sample(nodes[1:], 2)
+        triples.append((u, "connects_to", v))
+    with contextlib.redirect_stdout(io.StringIO()):
+        graph = DomainKnowledgeGraph(
+            triples, ontology={},
+            reachability_index_path=str(tmp_path / f"graph{seed}.reachability.npz"), reachability_max_hops=4
+        )
+    return graph, nodes, RandomTransitionScorer(rng)
+
+
+def _composer(cls, graph, scorer, **kwargs):
+    return cls(
+        graph, search_agent=None, ontology={}, transition_scorer=scorer,
+        max_path_nodes=MAX_PATH_NODES, length_cost=0.1, mf_weight=0.5, miss_penalty=2.0, **kwargs
+    )
+
+
+def _exhaustive_costs(composer, nodes, start):
+    """枚舉所有從 start 到潛在終點、長度不超過 max_path_nodes 的簡單路徑成本"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        space = composer._prepare_search_space(nodes, start)
+    if space is None:
+        return None
+    successors, ends, required = space['successors'], space['potential_ends'], space['required_bits']
+    costs = []
+
+    def walk(path, cost):
+        node = path[-1]
+        if node in ends:
+            missing = sum(1 for n in required if n not in path)
+            costs.append(cost + missing * composer.miss_penalty)
+        if len(path) >= composer.max_path_nodes:
+            return
+        for neigh in successors[node]:
+            if neigh not in path:
+                walk(path + [neigh], cost + composer._edge_cost(node, neigh))
+
+    walk([start], 0.0)
+    return sorted(costs)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_astar_returns_the_cheapest_paths(seed, tmp_path):
+    graph, nodes, scorer = _random_graph(seed, tmp_path)
+    composer = _composer(ModuleAwareWorkflowComposer, graph, scorer)
+    expected = _exhaustive_costs(composer, nodes, "start")
+    if not expected:
+        pytest.skip("no path from start to an end node")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        candidates = composer._astar_in_subgraph(nodes, "start", top_k=TOP_K)
+    assert not composer.last_search_stats['truncated']
+    costs = [c['cost'] for c in candidates]
+    assert costs == pytest.approx(expected[:TOP_K])
+
+    # beam search 是啟發式：最佳候選不可能比最佳解便宜
+    beam = _composer(BeamSearchWorkflowComposer, graph, scorer, beam_width=2, max_depth=MAX_PATH_NODES)
+    with contextlib.redirect_stdout(io.StringIO()):
+        beam_candidates = beam._beam_search_in_subgraph(nodes, "start", top_k=TOP_K)
+    assert min(c['cost'] for c in beam_candidates) >= expected[0] - 1e-9
+
+
+@pytest.mark.parametrize("cls", [ModuleAwareWorkflowComposer, BeamSearchWorkflowComposer])
+def test_topological_fallback_when_no_path_fits_the_length_limit(cls):
+    # 唯一的終點在 MAX_PATH_NODES 之外：搜索找不到完整路徑，改用子圖拓撲序備案
+    chain = ["start"] + list(CRITICAL_NODE_TYPES) + ["n8n-nodes-base.node0", "n8n-nodes-base.noOp"]
+    assert len(chain) > MAX_PATH_NODES
+    with contextlib.redirect_stdout(io.StringIO()):
+        graph = DomainKnowledgeGraph(
+            [(u, "connects_to", v) for u, v in zip(chain, chain[1:])], ontology={}
+        )
+    composer = _composer(cls, graph, None)
+    assert _exhaustive_costs(composer, chain, "start") == []
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        candidates = composer._find_candidate_paths(chain, "start", top_k=TOP_K)
+
+    assert len(candidates) == 1
+    assert candidates[0]['path'] == chain
+    assert candidates[0]['cost'] == float('inf')
@@ -0,0 +1,119 @@
+"""ChainRecommender 向量化排序與逐條評分的原始實作一致（含同分與 top_k 邊界）"""
+
+import contextlib
+import io
+import logging
+
+import numpy as np
+import pytest
+
+from n8n_workflow_recommender.models.chain_recommender import CRITICAL_NODE_TYPES, ChainRecommender
+from n8n_workflow_recommender.models.matrix_factorization_scorer import SCORING_STRATEGIES
+
+from conftest import MF_NODE_TYPES
+
+NUM_TRIALS = 200
+SCORE_TOLERANCE = 1e-12
+
+
+@pytest.fixture(scope="module")
+def recommender(mf_model_dir):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return ChainRecommender(str(mf_model_dir), log_level=logging.WARNING)
+
+
+def _baseline_rank(recommender, candidates_list, strategy, min_score, critical_node_weight):
+    """向量化之前的逐條評分與排序（list.sort 為穩定排序，同分保留輸入順序）"""
+    scored_candidates = []
+    for candidate in candidates_list:
+        chain_path = candidate.get('path', [])
+        if not chain_path:
+            continue
+        mf_score = recommender.scorer.score_chain(chain_path, strategy=strategy)
+        if mf_score < min_score:
+            continue
+        critical_nodes_in_path = [n for n in chain_path if n in CRITICAL_NODE_TYPES]
+        coverage_count = candidate.get('metadata', {}).get('coverage_count', len(critical_nodes_in_path))
+        coverage_score = min(1.0, coverage_count / len(CRITICAL_NODE_TYPES))
+        if coverage_count == 0:
+            combined_score = mf_score * 0.5
+        else:
+            combined_score = (1 - critical_node_weight) * mf_score + critical_node_weight * coverage_score
+        candidate_copy = candidate.copy()
+        candidate_copy['mf_score'] = mf_score
+        candidate_copy['coverage_count'] = coverage_count
+        candidate_copy['coverage_score'] = coverage_score
+        candidate_copy['final_combined_score'] = combined_score
+        scored_candidates.append(candidate_copy)
+    scored_candidates.sort(key=lambda x: x['final_combined_score'], reverse=True)
+    return scored_candidates
+
+
+def _random_candidates(rng):
+    """隨機候選：含空路徑、未知節點、metadata 覆蓋數，以及重複路徑造成的同分"""
+    candidates = []
+    for _ in range(rng.integers(1, 30)):
+        roll = rng.random()
+        if candidates and roll < 0.3:
+            # 重複既有路徑 → 完全同分，檢查同分時保留輸入順序
+            path = list(candidates[rng.integers(0, len(candidates))]['path'])
+        elif roll < 0.35:
+            path = []
+        else:
+            path = [MF_NODE_TYPES[i] for i in rng.integers(0, len(MF_NODE_TYPES), size=rng.integers(1, 7))]
+            if rng.random() < 0.1:
+                path[rng.integers(0, len(path))] = "n8n-nodes-base.unknown"
+        candidate = {'id': len(candidates), 'path': path}
+        if rng.random() < 0.2:
+            candidate['metadata'] = {'coverage_count': int(rng.integers(0, 7))}
+        candidates.append(candidate)
+    return candidates
+
+
+def _assert_same_ranking(actual, expected):
+    assert [c['id'] for c in actual] == [c['id'] for c in expected]
+    for got, want in zip(actual, expected):
+        assert got['path'] == want['path']
+        assert got['coverage_count'] == want['coverage_count']
+        assert type(got['coverage_count']) is type(want['coverage_count'])
+        for key in ('mf_score', 'coverage_score', 'final_combined_score'):
+            assert got[key] == pytest.approx(want[key], abs=SCORE_TOLERANCE)
+
+
+def test_rank_candidates_matches_baseline(recommender):
+    rng = np.random.default_rng(42)
+    for _ in range(NUM_TRIALS):
+        candidates = _random_candidates(rng)
+        strategy = SCORING_STRATEGIES[rng.integers(0, len(SCORING_STRATEGIES))]
+        min_score = float(rng.choice([0.0, 0.2, 0.4]))
+        weight = float(rng.choice([0.0, 0.5, 0.8]))
+        expected = _baseline_rank(recommender, candidates, strategy, min_score, weight)
+
+        actual = recommender.rank_candidates(candidates, strategy, min_score, weight)
+        _assert_same_ranking(actual, expected)
+
+        # top_k 小於、等於、大於候選數時都等同完整排序後截斷
+        for top_k in {0, 1, int(rng.integers(1, len(candidates) + 1)), len(expected),
+                      len(candidates), len(candidates) + 3}:
+            actual = recommender.rank_candidates(candidates, strategy, min_score, weight, top_k=top_k)
+            _assert_same_ranking(actual, expected[:top_k])
+
+
+def test_top_k_boundary_ties_keep_input_order(recommender):
+    best = [CRITICAL_NODE_TYPES[0], CRITICAL_NODE_TYPES[1]]
+    tied = [MF_NODE_TYPES[-1], CRITICAL_NODE_TYPES[2]]
+    candidates = [{'id': i, 'path': list(path)} for i, path in enumerate([tied, best, tied, tied, tied])]
+    expected = _baseline_rank(recommender, candidates, 'average', -np.inf, 0.5)
+    assert len({c['final_combined_score'] for c in expected[1:]}) == 1
+
+    for top_k in range(len(candidates) + 2):
+        actual = recommender.rank_candidates(candidates, min_score=-np.inf, top_k=top_k)
+        _assert_same_ranking(actual, expected[:top_k])
+
+
+def test_rank_candidates_batch_matches_single_calls(recommender):
+    rng = np.random.default_rng(7)
+    groups = [_random_candidates(rng) for _ in range(10)] + [[]]
+    batch = recommender.rank_candidates_batch(groups, top_k=5)
+    for candidates, ranked in zip(groups, batch):
+        _assert_same_ranking(ranked, recommender.rank_candidates(candidates, top_k=5))
@@ -0,0 +1,56 @@
+"""DomainKnowledgeGraph.order_by_condensation 的子集排序"""
+
+import contextlib
+import io
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from n8n_workflow_recommender.generation.workflow_composer import DomainKnowledgeGraph
+
+# 兩個互相連接的環（a-b-c-d 與 c-e），外加上下游節點
+EDGES = [
+    ("start", "a"), ("a", "b"), ("b", "c"), ("c", "d"), ("d", "a"),
+    ("a", "c"), ("d", "b"), ("c", "e"), ("e", "c"), ("e", "end"), ("start", "d"),
+]
+
+
+@pytest.fixture(scope="module")
+def graph():
+    with contextlib.redirect_stdout(io.StringIO()):
+        return DomainKnowledgeGraph([(h, "connects_to", t) for h, t in EDGES], ontology={})
+
+
+def _backward_edges(graph, order):
+    position = {v: i for i, v in enumerate(order)}
+    return [
+        (u, v) for u in order for v in graph.csr.successor_ids(u).tolist()
+        if v in position and v != u and position[v] < position[u]
+    ]
+
+
+def _subsets(graph):
+    names = list(graph.csr.nodes)
+    for size in range(2, len(names) + 1):
+        yield from combinations(names, size)
+
+
+def test_acyclic_subsets_have_no_backward_edges(graph):
+    for subset in _subsets(graph):
+        ids = graph.csr.ids(subset)
+        if graph.csr.topological_sort(ids) is None:
+            continue
+        order = graph.order_by_condensation(subset).tolist()
+        assert sorted(order) == sorted(ids.tolist())
+        assert _backward_edges(graph, order) == [], subset
+
+
+def test_backward_edges_stay_inside_induced_cycles(graph):
+    csr = graph.csr
+    for subset in _subsets(graph):
+        order = graph.order_by_condensation(subset).tolist()
+        allowed = csr.mask(subset)
+        for u, v in _backward_edges(graph, order):
+            # 逆向邊 u -> v 必須在導出子圖的環上（v 可以在子集內走回 u）
+            assert csr.reachable(np.array([v]), allowed=allowed)[u], (subset, csr.nodes[u], csr.nodes[v])
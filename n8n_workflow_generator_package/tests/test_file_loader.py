@@ -0,0 +1,32 @@
+"""檔案工具"""
+
+import os
+import stat
+
+from n8n_workflow_recommender.utils import file_loader
+from n8n_workflow_recommender.utils.file_loader import atomic_write_bytes
+
+
+def _mode(path) -> int:
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_atomic_write_uses_umask_like_open(tmp_path):
+    target = tmp_path / "artifact.npz"
+    atomic_write_bytes(target, lambda f: f.write(b"data"))
+
+    assert target.read_bytes() == b"data"
+    assert _mode(target) == 0o666 & ~file_loader._UMASK
+    # 暫存檔不會留下
+    assert os.listdir(tmp_path) == ["artifact.npz"]
+
+
+def test_atomic_write_keeps_existing_mode(tmp_path):
+    target = tmp_path / "snapshot.pkl"
+    target.write_bytes(b"old")
+    os.chmod(target, 0o640)
+
+    atomic_write_bytes(target, lambda f: f.write(b"new"))
+
+    assert target.read_bytes() == b"new"
+    assert _mode(target) == 0o640
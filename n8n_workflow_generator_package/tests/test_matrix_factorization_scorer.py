@@ -0,0 +1,74 @@
+"""MatrixFactorizationScorer 的批次評分與 top-K 快取等價性"""
+
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from n8n_workflow_recommender.models.matrix_factorization_scorer import (
+    SCORING_STRATEGIES, MatrixFactorizationScorer
+)
+
+from conftest import MF_NODE_TYPES, MF_NUM_TYPES as NUM_TYPES
+
+TOP_K_CACHE = 8
+# factorized 模式即時計算內積（文件中標示為近似），與 dense 預測矩陣只比較到容差
+FACTORIZED_TOLERANCE = 1e-9
+
+
+def _scorer(mf_model_dir, mode):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return MatrixFactorizationScorer(str(mf_model_dir), mode=mode, top_k_cache=TOP_K_CACHE)
+
+
+def _random_chains(seed: int, count: int = 200):
+    rng = np.random.default_rng(seed)
+    chains = [[], [MF_NODE_TYPES[0]]]
+    for _ in range(count):
+        chain = [MF_NODE_TYPES[i] for i in rng.integers(0, NUM_TYPES, size=rng.integers(2, 9))]
+        if rng.random() < 0.2:
+            chain[rng.integers(0, len(chain))] = "n8n-nodes-base.unknown"
+        chains.append(chain)
+    return chains
+
+
+@pytest.mark.parametrize("mode", ["dense", "factorized"])
+def test_batch_scores_match_score_chain(mf_model_dir, mode):
+    scorer = _scorer(mf_model_dir, mode)
+    chains = _random_chains(1)
+    batch = scorer.score_chains(chains)
+
+    assert set(batch) == set(SCORING_STRATEGIES)
+    for strategy in SCORING_STRATEGIES:
+        expected = [scorer.score_chain(chain, strategy) for chain in chains]
+        assert batch[strategy].tolist() == pytest.approx(expected, rel=1e-12, abs=1e-12), strategy
+
+
+@pytest.mark.parametrize("strategy", SCORING_STRATEGIES)
+def test_factorized_scores_approximate_dense(mf_model_dir, strategy):
+    chains = _random_chains(2)
+    dense = _scorer(mf_model_dir, "dense").score_chains(chains, [strategy])[strategy]
+    factorized = _scorer(mf_model_dir, "factorized").score_chains(chains, [strategy])[strategy]
+    assert factorized.tolist() == pytest.approx(dense.tolist(), abs=FACTORIZED_TOLERANCE)
+
+
+@pytest.mark.parametrize("mode", ["dense", "factorized"])
+def test_cached_top_k_matches_full_sort(mf_model_dir, mode):
+    scorer = _scorer(mf_model_dir, mode)
+    raw = np.load(mf_model_dir / "type_type_P.npy") @ np.load(mf_model_dir / "type_type_Q.npy").T
+    tolerance = 1e-12 if mode == "dense" else FACTORIZED_TOLERANCE
+
+    for source_idx, source_type in enumerate(scorer.node_types):
+        order = np.argsort(-raw[source_idx], kind="stable")
+        for top_k in (1, 5, TOP_K_CACHE, TOP_K_CACHE + 3):
+            result = scorer.get_top_transitions(source_type, top_k)
+            expected = order[:top_k]
+            assert [t for t, _ in result] == [scorer.node_types[i] for i in expected]
+            assert [s for _, s in result] == pytest.approx(
+                np.clip(raw[source_idx, expected], 0.0, 1.0).tolist(), abs=tolerance
+            )
+
+    batch = scorer.get_top_transitions_batch(scorer.node_types, top_k=5)
+    for source_type in scorer.node_types:
+        assert batch[source_type] == scorer.get_top_transitions(source_type, 5)
@@ -0,0 +1,70 @@
+"""陣列化 MCTS 樹"""
+
+import numpy as np
+
+from n8n_workflow_recommender.search.mcts_tree import ConvergenceCriterion, MCTSTree, run_tree_worker
+
+
+def _two_level_tree(branches: int = 4, leaves_per_branch: int = 6):
+    """根節點 → branches 個分類 → 每個分類 leaves_per_branch 個葉子（BFS 順序）"""
+    parent = [-1] + [0] * branches
+    for b in range(branches):
+        parent += [1 + b] * leaves_per_branch
+    parent = np.array(parent, dtype=np.int32)
+    leaf_mask = np.zeros(len(parent), dtype=bool)
+    leaf_mask[1 + branches:] = True
+    rewards = np.zeros(len(parent))
+    rewards[leaf_mask] = np.linspace(0.1, 0.9, int(leaf_mask.sum()))
+    return parent, leaf_mask, rewards
+
+
+def test_early_stopping_waits_for_visit_shares_to_settle():
+    parent, leaf_mask, rewards = _two_level_tree()
+    tree = MCTSTree(parent)
+    criterion = ConvergenceCriterion(leaf_mask, top_n=3, patience=3, check_every=25, tolerance=0.01)
+
+    used = tree.run(rewards, 5000, rng=np.random.default_rng(0), convergence=criterion)
+
+    # 獎勵是確定性的：平均獎勵排名在所有葉子都被訪問後就不變（最早可停止的檢查點），
+    # 訪問佔比則需要更久才會穩定
+    earliest = criterion.min_iterations + criterion.patience * criterion.check_every
+    assert criterion.converged and "visit shares" in criterion.reason
+    assert earliest < used < 5000
+    visits = tree.visits_array()
+    top = np.flatnonzero(leaf_mask)[np.argsort(-visits[leaf_mask], kind='stable')[:3]]
+    assert set(top.tolist()) == set(criterion.last_ranking)
+
+
+def test_unstable_shares_do_not_converge():
+    parent, leaf_mask, _ = _two_level_tree()
+    criterion = ConvergenceCriterion(leaf_mask, top_n=3, patience=2, check_every=1, min_iterations=0)
+    visits = np.zeros(len(parent), dtype=np.int64)
+    leaves = np.flatnonzero(leaf_mask)
+    visits[leaves] = 10
+    visits[leaves[:3]] = 50
+    for step in range(5):
+        # top-3 集合不變，但佔比每個檢查點都大幅移動
+        visits[leaves[step % 3]] += 100
+        assert not criterion.update(visits, np.zeros(len(parent)))
+
+
+def _worker_visits(parent, rewards, seeds, noise):
+    return [run_tree_worker(parent, rewards, 300, seed, noise=noise)[0] for seed in seeds]
+
+
+def test_root_parallel_workers_explore_different_trees():
+    parent, _, rewards = _two_level_tree()
+    seeds = np.random.SeedSequence(0).spawn(4)
+
+    # 確定性獎勵 + 確定性 UCT：不同種子只影響 expansion 順序，各棵樹完全相同
+    plain = _worker_visits(parent, rewards, seeds, noise=0.0)
+    assert all(np.array_equal(plain[0], v) for v in plain[1:])
+
+    noisy = _worker_visits(parent, rewards, seeds, noise=0.05)
+    for i in range(len(noisy)):
+        for j in range(i + 1, len(noisy)):
+            assert not np.array_equal(noisy[i], noisy[j])
+
+    # 同一個種子仍可重現
+    again = _worker_visits(parent, rewards, np.random.SeedSequence(0).spawn(4), noise=0.05)
+    assert all(np.array_equal(a, b) for a, b in zip(noisy, again))
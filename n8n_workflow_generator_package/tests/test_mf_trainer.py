@@ -0,0 +1,87 @@
+"""MatrixFactorizationTrainer 的 SGD 訓練與 TransitionCounter"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from n8n_workflow_recommender.models.mf_trainer import MatrixFactorizationTrainer, TransitionCounter
+from n8n_workflow_recommender.utils.file_loader import load_yaml
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+TEMPLATES_DIR = BASE_DIR / "n8n_templates" / "training_data"
+
+
+@pytest.fixture(scope="module")
+def transitions():
+    if not TEMPLATES_DIR.is_dir():
+        pytest.skip("n8n_templates/training_data not available")
+    counter = TransitionCounter(connection_types=('main',))
+    counter.add_templates([str(TEMPLATES_DIR)])
+    rows, cols, vals = counter.to_coo()
+    return rows, cols, vals, counter.num_types
+
+
+def _default_trainer(**overrides) -> MatrixFactorizationTrainer:
+    """以 config.yaml 的 model.matrix_factorization 建立訓練器"""
+    config = load_yaml(str(BASE_DIR / "n8n_workflow_recommender" / "config" / "config.yaml"))
+    mf_config = config["model"]["matrix_factorization"]
+    training = mf_config.get("training", {})
+    kwargs = dict(
+        num_factors=mf_config.get("num_factors", 8),
+        learning_rate=mf_config.get("learning_rate", 0.005),
+        regularization=mf_config.get("regularization", 0.2),
+        method="sgd",
+        iterations=training.get("iterations", 50),
+        zero_weight=training.get("zero_weight", 0.05),
+        val_fraction=training.get("val_fraction", 0.1),
+        patience=training.get("patience", 5),
+        max_step=training.get("max_step", 0.5),
+    )
+    kwargs.update(overrides)
+    return MatrixFactorizationTrainer(**kwargs)
+
+
+def test_sgd_reduces_validation_loss_with_default_config(transitions):
+    rows, cols, vals, num_types = transitions
+    result = _default_trainer().fit(rows, cols, vals, num_types)
+
+    val_losses = [h["val_loss"] for h in result["loss_history"]]
+    best = min(val_losses)
+    assert best < 0.6 * val_losses[0]
+    assert result["best_iteration"] > 0
+    assert np.isfinite(result["P"]).all() and np.isfinite(result["Q"]).all()
+
+
+def test_sgd_divergence_rolls_back_to_best_factors(transitions):
+    rows, cols, vals, num_types = transitions
+    result = _default_trainer(learning_rate=0.5, max_step=0).fit(rows, cols, vals, num_types)
+
+    assert np.isfinite(result["P"]).all() and np.isfinite(result["Q"]).all()
+    assert all(np.isfinite(h["train_loss"]) for h in result["loss_history"])
+    assert result["total_iterations"] < 50
+
+
+def _write_template(path: Path, source_type: str, target_type: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        "nodes": [{"name": "A", "type": source_type}, {"name": "B", "type": target_type}],
+        "connections": {"A": {"main": [[{"node": "B", "type": "main", "index": 0}]]}},
+    }), encoding="utf-8")
+
+
+def test_same_named_templates_in_different_directories_are_all_counted(tmp_path):
+    _write_template(tmp_path / "first" / "workflow.json", "n8n-nodes-base.webhook", "n8n-nodes-base.slack")
+    _write_template(tmp_path / "second" / "workflow.json", "n8n-nodes-base.cron", "n8n-nodes-base.gmail")
+
+    counter = TransitionCounter()
+    assert counter.add_templates([str(tmp_path / "first"), str(tmp_path / "second")]) == (2, 2)
+
+    # warm start：重新載入後，同樣的檔案不會重複計數，但同名的新模板仍會計入
+    counter.save(str(tmp_path / "counts.npz"))
+    reloaded = TransitionCounter.load(str(tmp_path / "counts.npz"))
+    assert reloaded.add_templates([str(tmp_path / "first"), str(tmp_path / "second")]) == (0, 0)
+    _write_template(tmp_path / "third" / "workflow.json", "n8n-nodes-base.webhook", "n8n-nodes-base.gmail")
+    assert reloaded.add_templates([str(tmp_path / "third")]) == (1, 1)
+    assert reloaded.to_coo()[2].sum() == 3
@@ -0,0 +1,137 @@
+"""NLU 結果快取：TTL 過期、最久未使用淘汰與 namespace 統計"""
+
+import pytest
+
+from n8n_workflow_recommender.nlu.nlu_cache import NLUCache
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def make_cache(tmp_path, clock):
+    caches = []
+
+    def make(**kwargs):
+        cache = NLUCache(str(tmp_path / "nlu_cache.sqlite"), clock=clock, **kwargs)
+        caches.append(cache)
+        return cache
+
+    yield make
+    for cache in caches:
+        cache.close()
+
+
+def test_entries_expire_after_ttl(make_cache, clock):
+    cache = make_cache(ttl_seconds=60)
+    cache.put("k", {"intent": "email"}, namespace="analyze")
+
+    clock.advance(60)
+    assert cache.get("k", namespace="analyze") == {"intent": "email"}
+
+    clock.advance(1)
+    assert cache.get("k", namespace="analyze") is None
+    stats = cache.get_stats()
+    assert stats["entries"] == 0
+    assert stats["by_namespace"]["analyze"]["expired"] == 1
+    assert stats["by_namespace"]["analyze"]["misses"] == 1
+
+
+def test_hits_do_not_extend_ttl(make_cache, clock):
+    cache = make_cache(ttl_seconds=60)
+    cache.put("k", 1)
+    results = []
+    for _ in range(3):
+        clock.advance(30)
+        results.append(cache.get("k"))
+    # TTL 從寫入時起算，讀取只更新最近使用時間
+    assert results == [1, 1, None]
+    assert cache.get_stats()["by_namespace"]["default"]["expired"] == 1
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_purge_expired(make_cache, clock):
+    cache = make_cache(ttl_seconds=60)
+    cache.put("old", 1)
+    clock.advance(45)
+    cache.put("new", 2)
+    clock.advance(30)
+
+    assert cache.purge_expired() == 1
+    assert cache.get("old") is None
+    assert cache.get("new") == 2
+
+
+def test_no_ttl_never_expires(make_cache, clock):
+    cache = make_cache(ttl_seconds=None)
+    cache.put("k", "v")
+    clock.advance(10 ** 9)
+    assert cache.purge_expired() == 0
+    assert cache.get("k") == "v"
+
+
+def test_evicts_least_recently_used(make_cache, clock):
+    cache = make_cache(max_entries=3)
+    for key in ("a", "b", "c"):
+        cache.put(key, key)
+        clock.advance(1)
+
+    # 讀取 a 使 b 成為最久未使用
+    assert cache.get("a") == "a"
+    clock.advance(1)
+    cache.put("d", "d", namespace="keywords")
+
+    assert cache.get_stats()["entries"] == 3
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in ("a", "c", "d")] == ["a", "c", "d"]
+    # 淘汰計入觸發淘汰的寫入所屬的 namespace
+    assert cache.get_stats()["by_namespace"]["keywords"]["evictions"] == 1
+
+
+def test_entries_persist_across_instances(make_cache, clock):
+    make_cache().put("k", ["gmail", "sheets"], namespace="keywords")
+    reopened = make_cache()
+    assert reopened.get("k", namespace="keywords") == ["gmail", "sheets"]
+
+
+def test_stats_are_kept_per_namespace(make_cache):
+    cache = make_cache()
+    cache.put("a1", 1, namespace="analyze")
+    cache.put("k1", 2, namespace="keywords")
+    cache.put("k2", 3, namespace="keywords")
+
+    cache.get("a1", namespace="analyze")
+    cache.get("missing", namespace="analyze")
+    cache.get("k1", namespace="keywords")
+    cache.get("k2", namespace="keywords")
+    cache.get("k1", namespace="keywords")
+
+    stats = cache.get_stats()
+    analyze = stats["by_namespace"]["analyze"]
+    keywords = stats["by_namespace"]["keywords"]
+    assert (analyze["hits"], analyze["misses"], analyze["writes"]) == (1, 1, 1)
+    assert analyze["hit_rate"] == pytest.approx(0.5)
+    assert (keywords["hits"], keywords["misses"], keywords["writes"]) == (3, 0, 2)
+    assert keywords["hit_rate"] == pytest.approx(1.0)
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (3, 4, 1)
+    assert stats["hit_rate"] == pytest.approx(0.8)
+
+
+def test_make_key_normalizes_query():
+    key = NLUCache.make_key("analyze", "  Send  an EMAIL ", "gpt-4o-mini", "t", "c")
+    assert key == NLUCache.make_key("analyze", "send an email", "gpt-4o-mini", "t", "c")
+    assert key != NLUCache.make_key("keywords", "send an email", "gpt-4o-mini", "t", "c")
+    assert key != NLUCache.make_key("analyze", "send an email", "gpt-4o", "t", "c")
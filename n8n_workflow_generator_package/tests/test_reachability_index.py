@@ -0,0 +1,88 @@
+"""ReachabilityIndex 與逐節點 BFS 的一致性、索引失效條件"""
+
+import contextlib
+import io
+import random
+from collections import deque
+
+import numpy as np
+import pytest
+
+from n8n_workflow_recommender.generation.csr_graph import CSRGraph
+from n8n_workflow_recommender.generation.reachability_index import (
+    UNREACHABLE, ReachabilityIndex, compute_graph_key
+)
+
+MAX_HOPS = 3
+
+
+def _random_graph(seed: int, num_nodes: int = 30, num_edges: int = 60) -> CSRGraph:
+    rng = random.Random(seed)
+    triples = [(f"n{i}", "connects_to", f"n{i + 1}") for i in range(0, num_nodes - 1, 3)]
+    for _ in range(num_edges):
+        triples.append((f"n{rng.randrange(num_nodes)}", "connects_to", f"n{rng.randrange(num_nodes)}"))
+    return CSRGraph.from_triples(triples)
+
+
+def _bfs_hops(csr: CSRGraph, source: int) -> dict:
+    hops = {source: 0}
+    queue = deque([source])
+    while queue:
+        u = queue.popleft()
+        for v in csr.successor_ids(u).tolist():
+            if v not in hops:
+                hops[v] = hops[u] + 1
+                queue.append(v)
+    return hops
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_build_matches_plain_bfs(seed):
+    csr = _random_graph(seed)
+    index = ReachabilityIndex.build(csr, max_hops=MAX_HOPS)
+
+    for source in range(len(csr)):
+        hops = _bfs_hops(csr, source)
+        reach = index.to_mask(index.reach_bits[source])
+        assert set(np.flatnonzero(reach).tolist()) == set(hops)
+        expected = np.full(len(csr), UNREACHABLE)
+        for node, h in hops.items():
+            if h <= MAX_HOPS:
+                expected[node] = h
+        assert index.dist[source].tolist() == expected.tolist()
+
+    targets = [0, len(csr) - 1]
+    hops_to_any = index.hops_to_any(targets)
+    for source in range(len(csr)):
+        hops = _bfs_hops(csr, source)
+        best = min((hops[t] for t in targets if t in hops), default=None)
+        if best is None:
+            assert hops_to_any[source] == UNREACHABLE
+        else:
+            assert hops_to_any[source] == min(best, MAX_HOPS + 1)
+
+
+def test_load_round_trip_and_rebuild_on_graph_change(tmp_path):
+    path = tmp_path / "graph.reachability.npz"
+    csr = _random_graph(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        built = ReachabilityIndex.load_or_build(str(path), csr, max_hops=MAX_HOPS)
+
+    loaded = ReachabilityIndex.load(str(path), compute_graph_key(csr, MAX_HOPS))
+    assert loaded is not None
+    assert np.array_equal(loaded.reach_bits, built.reach_bits)
+    assert np.array_equal(loaded.dist, built.dist)
+
+    # 邊或 max_hops 變動時索引鍵不同，舊檔案不會被採用
+    changed = CSRGraph.from_triples(
+        [(csr.nodes[u], "connects_to", csr.nodes[v]) for u in range(len(csr)) for v in csr.successor_ids(u).tolist()]
+        + [(csr.nodes[-1], "connects_to", csr.nodes[0])]
+    )
+    assert ReachabilityIndex.load(str(path), compute_graph_key(changed, MAX_HOPS)) is None
+    assert ReachabilityIndex.load(str(path), compute_graph_key(csr, MAX_HOPS + 1)) is None
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        rebuilt = ReachabilityIndex.load_or_build(str(path), changed, max_hops=MAX_HOPS)
+    assert rebuilt.key == compute_graph_key(changed, MAX_HOPS)
+    assert rebuilt.to_mask(rebuilt.reach_bits[changed.node_index[csr.nodes[-1]]])[changed.node_index[csr.nodes[0]]]
+    assert ReachabilityIndex.load(str(path), rebuilt.key) is not None
@@ -0,0 +1,146 @@
+"""HTTP 服務的並行上限與排隊（backpressure）"""
+
+import asyncio
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("openai")  # app 經由 orchestrator 匯入 IntentAnalyzer
+
+from n8n_workflow_recommender.server.app import HTTPError, RecommenderApp, RequestLimiter  # noqa: E402
+
+
+def test_rejects_when_slots_and_queue_are_full():
+    async def scenario():
+        limiter = RequestLimiter(max_concurrency=1, max_queue=0, queue_timeout=None, retry_after=3)
+        async with limiter:
+            with pytest.raises(HTTPError) as excinfo:
+                async with limiter:
+                    pass
+        return limiter, excinfo.value
+
+    limiter, error = asyncio.run(scenario())
+    assert error.status == 503
+    assert error.headers == {"Retry-After": "3"}
+    assert limiter.stats()["rejected"] == 1
+    assert limiter.stats()["completed"] == 1
+
+
+def test_rejects_after_queue_timeout():
+    async def scenario():
+        limiter = RequestLimiter(max_concurrency=1, max_queue=1, queue_timeout=0.05, retry_after=1)
+        async with limiter:
+            with pytest.raises(HTTPError) as excinfo:
+                async with limiter:
+                    pass
+        return limiter, excinfo.value
+
+    limiter, error = asyncio.run(scenario())
+    assert error.status == 503
+    assert limiter.stats()["waiting"] == 0
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_slot_is_freed_when_handler_raises():
+    async def scenario():
+        limiter = RequestLimiter(max_concurrency=1, max_queue=0, queue_timeout=None, retry_after=1)
+        with pytest.raises(RuntimeError):
+            async with limiter:
+                raise RuntimeError("handler failed")
+        assert limiter.active == 0
+        # 同一個 slot 可以再次取得
+        async with limiter:
+            assert limiter.active == 1
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert limiter.stats()["active"] == 0
+    assert limiter.stats()["rejected"] == 0
+
+
+class FakeScorer:
+    def __init__(self):
+        self.release = threading.Event()
+        self.fail = False
+
+    def rank_candidates(self, candidates, **kwargs):
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("scoring failed")
+        return candidates
+
+
+class FakeComponents:
+    def is_ready(self, name):
+        return False
+
+
+class FakeOrchestrator:
+    config = {}
+    ranking_top_k = None
+
+    def __init__(self):
+        self.scorer = FakeScorer()
+        self.components = FakeComponents()
+
+    def is_ready(self):
+        return True
+
+
+async def _post(app, path, payload):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": json.dumps(payload).encode("utf-8"), "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app({"type": "http", "method": "POST", "path": path}, receive, send)
+    start, body = messages
+    headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in start["headers"]}
+    return start["status"], headers, json.loads(body["body"])
+
+
+def test_app_returns_503_when_full_and_recovers_after_handler_error():
+    orchestrator = FakeOrchestrator()
+    app = RecommenderApp(
+        orchestrator=orchestrator,
+        server_config={"max_concurrency": 1, "max_queue": 0, "retry_after": 4}
+    )
+    payload = {"candidates": [{"path": ["n8n-nodes-base.manualTrigger", "n8n-nodes-base.set"]}]}
+
+    async def scenario():
+        first = asyncio.ensure_future(_post(app, "/rank", payload))
+        while app.limiter.active == 0:
+            await asyncio.sleep(0.01)
+
+        # 唯一的 slot 被佔用且不允許排隊：下一個請求立即被拒絕
+        busy = await _post(app, "/rank", payload)
+        orchestrator.scorer.release.set()
+        ok = await first
+
+        # 處理函數拋出例外後 slot 仍會釋放
+        orchestrator.scorer.fail = True
+        failed = await _post(app, "/rank", payload)
+        orchestrator.scorer.fail = False
+        recovered = await _post(app, "/rank", payload)
+        return busy, ok, failed, recovered
+
+    try:
+        busy, ok, failed, recovered = asyncio.run(scenario())
+    finally:
+        app.shutdown()
+
+    status, headers, body = busy
+    assert status == 503
+    assert headers["retry-after"] == "4"
+    assert "busy" in body["error"]
+
+    assert ok[0] == 200 and ok[2]["candidates"] == payload["candidates"]
+    assert failed[0] == 500
+    assert recovered[0] == 200
+    assert app.limiter.stats() == {
+        "active": 0, "waiting": 0, "completed": 3, "rejected": 1, "max_concurrency": 1, "max_queue": 0
+    }
@@ -0,0 +1,36 @@
+"""Orchestrator 快照的失效條件"""
+
+import pickle
+
+from n8n_workflow_recommender.core import snapshot
+from n8n_workflow_recommender.generation.csr_graph import CSRGraph
+
+SOURCES = {"knowledge_graph": "abc"}
+
+
+def _components():
+    return {"graph": CSRGraph.from_triples([("a", "connects_to", "b")]), "names": ["a", "b"]}
+
+
+def test_header_records_modules_of_pickled_classes(tmp_path):
+    path = tmp_path / "snapshot.pkl"
+    snapshot.write_snapshot(path, SOURCES, _components())
+
+    with open(path, "rb") as f:
+        header = pickle.load(f)
+    assert list(header["code_hashes"]) == ["n8n_workflow_recommender.generation.csr_graph"]
+
+    restored = snapshot.read_snapshot(path, SOURCES)
+    assert restored["graph"].nodes == ["a", "b"]
+
+
+def test_code_change_invalidates_snapshot(tmp_path, monkeypatch):
+    path = tmp_path / "snapshot.pkl"
+    snapshot.write_snapshot(path, SOURCES, _components())
+
+    compute = snapshot.compute_code_hashes
+    monkeypatch.setattr(
+        snapshot, "compute_code_hashes",
+        lambda modules: {module: "edited" for module in compute(modules)}
+    )
+    assert snapshot.read_snapshot(path, SOURCES) is None